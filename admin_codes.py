@@ -0,0 +1,169 @@
+"""
+행정동 코드 표 (admin_areas) + 동 이름 별칭 (admin_aliases)
+
+지도(GeoJSON 의 adm_nm "서울특별시 노원구 월계1동")와 DB 의 동 이름을 화면을 그릴 때마다
+정규식으로 맞추던 것을, 빌드 시점에 만든 코드 표와 정수 코드(adm_cd) 조인으로 바꾼다.
+
+- admin_areas  : adm_cd (7자리 행정동 코드) -> adm_cd2 (10자리), gu_code (시군구 코드), 정식 gu / dong 이름
+- admin_aliases: (gu, 별칭) -> adm_cd  주소 파서나 법정동 표기로 나오는 이름 ("월계동", "성수동가")
+  별칭 하나가 여러 행정동을 가리키면 (월계동 -> 월계1/2/3동) 모호하므로 코드로 바꾸지 않음
+- stores.adm_cd: 매장이 속한 행정동 코드 (ingest / db_granular 는 배정된 폴리곤의 코드를 바로 기록)
+- API 는 매장 행과 동별 통계에 adm_cd 를 함께 보내고, 지도는 feature.properties.adm_cd 로 바로 찾음
+
+코드 표의 원본은 static/seoul_map.geojson (geo_cache 경유) 이고, 원본이 바뀌면 sync() 가 표를 다시 채운다.
+테이블 정의(DDL)는 migrations.py 의 6 단계에 있다.
+
+python admin_codes.py         : 코드 표 갱신 + 매장의 adm_cd 채우기
+python admin_codes.py --check : 매장의 (gu, dong) 과 adm_cd 가 코드 표와 맞는지 확인
+"""
+import re
+import sys
+
+import db_pool
+import geo_cache
+
+# "성수1가1동" -> 어간 "성수", 'N가' 포함 여부 (뒤쪽 숫자 / 가 / 동 제거)
+STEM_RE = re.compile(r'^(.+?)[0-9·.]*(가)?[0-9·.]*동$')
+# 주소 파서와 같은 숫자 제거 규칙 (db_3.DONG_NUMBER_RE)
+NUMBER_RE = re.compile(r'[0-9·.]+')
+
+AREA_COLUMNS = ('adm_cd', 'adm_cd2', 'gu_code', 'gu', 'dong', 'adm_nm')
+
+_lookup = (None, None)  # (원본 sha256, {(gu, 이름): 속성 dict})
+
+
+def aliases(dong):
+    """정식 동 이름 -> 별칭 집합 (정식 이름은 제외)
+
+    "월계1동" -> {"월계동"}, "성수1가1동" -> {"성수가동", "성수동", "성수가", "성수동가"}
+    """
+    names = {NUMBER_RE.sub('', dong)}
+    match = STEM_RE.match(dong)
+    if match:
+        stem = match.group(1)
+        names.add(stem + '동')
+        if match.group(2):  # 법정동이 'N가' 로 나뉜 곳 (종로1가, 성수동1가)
+            names.update({stem + '가', stem + '동가'})
+    names.discard(dong)
+    names.discard('')
+    return names
+
+
+def area_rows():
+    """admin_areas 에 들어갈 행 (adm_cd 순)"""
+    features = geo_cache.load('dong').features
+    return sorted(tuple(f[c] for c in AREA_COLUMNS) for f in features)
+
+
+def alias_rows():
+    """admin_aliases 에 들어갈 (gu, alias, adm_cd) 행 (다른 동의 정식 이름과 같은 별칭은 제외)"""
+    features = geo_cache.load('dong').features
+    canonical = {(f['gu'], f['dong']) for f in features}
+    rows = set()
+    for f in features:
+        for alias in aliases(f['dong']):
+            if (f['gu'], alias) not in canonical:
+                rows.add((f['gu'], alias, f['adm_cd']))
+    return sorted(rows)
+
+
+def lookup():
+    """{(gu, 정식 이름 또는 하나의 동만 가리키는 별칭): 속성 dict} (원본이 바뀌면 다시 만듦)"""
+    global _lookup
+    layer = geo_cache.load('dong')
+    if _lookup[0] == layer.sha256:
+        return _lookup[1]
+    by_code = {f['adm_cd']: f for f in layer.features}
+    table = {(f['gu'], f['dong']): f for f in layer.features}
+    targets = {}
+    for gu, alias, code in alias_rows():
+        targets.setdefault((gu, alias), []).append(code)
+    for key, codes in targets.items():
+        if len(codes) == 1:
+            table[key] = by_code[codes[0]]
+    _lookup = (layer.sha256, table)
+    return table
+
+
+def resolve(gu, dong):
+    """(gu, dong) -> 행정동 속성 dict (adm_cd, gu, dong ...) 또는 None"""
+    return lookup().get((gu, dong))
+
+
+# ----------------------------------------------------------------------------
+# DB
+# ----------------------------------------------------------------------------
+
+def sync(conn):
+    """코드 표를 현재 GeoJSON 과 맞춤 (호출한 쪽 트랜잭션 안에서), 바뀌었으면 True"""
+    areas, alias = area_rows(), alias_rows()
+    current_areas = [tuple(row) for row in conn.execute(
+        f"SELECT {', '.join(AREA_COLUMNS)} FROM admin_areas ORDER BY adm_cd")]
+    current_aliases = [tuple(row) for row in conn.execute(
+        "SELECT gu, alias, adm_cd FROM admin_aliases ORDER BY gu, alias, adm_cd")]
+    if current_areas == areas and current_aliases == alias:
+        return False
+    conn.execute("DELETE FROM admin_areas")
+    conn.execute("DELETE FROM admin_aliases")
+    conn.executemany(f"INSERT INTO admin_areas ({', '.join(AREA_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", areas)
+    conn.executemany("INSERT INTO admin_aliases (gu, alias, adm_cd) VALUES (?, ?, ?)", alias)
+    return True
+
+
+def _expected(gu, dong):
+    # 매장의 (gu, dong) 으로 정해지는 (gu, dong, adm_cd) - 별칭이면 정식 이름으로
+    area = resolve(gu, dong)
+    return (area['gu'], area['dong'], area['adm_cd']) if area else (gu, dong, None)
+
+
+def resolve_stores(conn):
+    """adm_cd 가 비었거나 이름과 맞지 않는 매장을 고치고 (별칭이면 정식 이름으로) 고친 매장 수 반환
+
+    호출한 쪽 트랜잭션 안에서 (gu/dong 이 바뀌면 집계 트리거가 함께 고침)
+    """
+    updates = []
+    for row in conn.execute("SELECT id, gu, dong, adm_cd FROM stores"):
+        expected = _expected(row['gu'], row['dong'])
+        if expected != (row['gu'], row['dong'], row['adm_cd']):
+            updates.append((*expected, row['id']))
+    conn.executemany("UPDATE stores SET gu = ?, dong = ?, adm_cd = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def check_stores(conn):
+    """(store_name, gu, dong, adm_cd, 기대하는 값) 목록 - 비어 있으면 일치"""
+    diffs = []
+    for row in conn.execute("SELECT store_name, gu, dong, adm_cd FROM stores ORDER BY id"):
+        expected = _expected(row['gu'], row['dong'])
+        if expected != (row['gu'], row['dong'], row['adm_cd']):
+            diffs.append((row['store_name'], row['gu'], row['dong'], row['adm_cd'], expected))
+    return diffs
+
+
+if __name__ == '__main__':
+    import migrations
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    if '--check' in sys.argv:
+        diffs = check_stores(conn)
+        for name, gu, dong, code, expected in diffs[:20]:
+            print(f"MISMATCH {name}: ({gu}, {dong}, {code}) expected {expected}")
+        unmatched = conn.execute("SELECT COUNT(*) FROM stores WHERE adm_cd IS NULL").fetchone()[0]
+        print(f"{unmatched} stores without adm_cd. Code check: {'OK' if not diffs else f'{len(diffs)} mismatches'}")
+        conn.close()
+        sys.exit(1 if diffs else 0)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        changed = sync(conn)
+        fixed = resolve_stores(conn)
+        if fixed:
+            db_pool.bump_generation(conn, 'stores')
+            db_pool.bump_generation(conn, 'store_locations')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"admin_areas {'updated' if changed else 'unchanged'}, {fixed} stores updated.")
+    conn.close()
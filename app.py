@@ -1,75 +1,175 @@
-from flask import Flask, render_template, jsonify, request
-import sqlite3
+from flask import Flask, Response, render_template, jsonify, request, abort
+import os
+import db_pool
+import geo_assets
+import http_cache
+import log_analytics
+import log_writer
+import metrics
+import migrations
+import store_cache
+import store_columnar
+import store_spatial
+import store_stats
+import user_visits
+import vector_tiles
+import visit_sync
+import visit_writer
 
 app = Flask(__name__)
 
+# 요청별 지연 시간 / SQLite 쿼리 수·시간 / 응답 행 수·바이트 집계 (GET /metrics, metrics.py)
+metrics.init_flask(app)
+metrics.register_gauges('starmap_log_writer', 'log_writer 큐 / 기록 통계', 'stat', log_writer.stats)
+metrics.register_gauges('starmap_visit_writer', 'visit_writer 큐 / 기록 통계', 'stat', visit_writer.stats)
+
+# 시작할 때 아직 적용되지 않은 스키마 마이그레이션 적용 (PK, 유니크 코드, 인덱스 등)
+migrations.migrate()
+
+# ETag + 미리 압축해서 내보내는 정적 GeoJSON (서버 시작 시 한 번 압축)
+STATIC_GEOJSON = ('seoul_map.geojson', 'seoul_gu_map.geojson')
+MAX_LOG_BATCH = 500
+for _name in STATIC_GEOJSON:
+    http_cache.load_static(os.path.join(app.static_folder, _name))
+store_cache.preload()  # 서빙 번들(bundle.py)이 있으면 매장 스냅샷을 미리 채움
+
 def query_db(query, args=(), one=False):
-    conn = sqlite3.connect('starbucks.db')
-    conn.row_factory = sqlite3.Row
-    cur = conn.execute(query, args)
-    rv = cur.fetchall()
-    conn.commit()
-    conn.close()
-    return (rv[0] if rv else None) if one else rv
+    # 스레드별 읽기 전용 연결 재사용 (SELECT 전용, commit 없음)
+    return db_pool.query(query, args, one)
+
+def cached_response(cached, mimetype='application/json'):
+    # If-None-Match 가 맞으면 304, 아니면 Accept-Encoding 에 맞는 압축본을 그대로 응답
+    status, body, headers = http_cache.select(
+        cached, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'))
+    if isinstance(body, memoryview):
+        # 서빙 번들의 mmap 영역: bytes 로 복사하지 않고 WSGI 서버가 그대로 소켓에 씀
+        # (Werkzeug 는 bytes 가 아닌 본문을 iterable 로 보므로 리스트로 감쌈, Content-Length 는 자동)
+        body = [body]
+    return app.response_class(body, status=status, headers=headers, mimetype=mimetype)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/static/<name>.geojson')
+def serve_geojson(name):
+    filename = f'{name}.geojson'
+    if filename not in STATIC_GEOJSON:
+        abort(404)
+    cached = http_cache.load_static(os.path.join(app.static_folder, filename))
+    return cached_response(cached, 'application/geo+json')
+
 # 아래 부분 삭제!
 # @app.route('/seoul_map.geojson')
 # def serve_geojson():
 #     return send_from_directory('.', 'seoul_map.geojson')
 
+@app.route('/api/geo/<layer>')
+def get_geo(layer):
+    # 줌 레벨에 맞게 단순화/양자화된 지도 (geo_build.py 로 미리 생성)
+    zoom = request.args.get('zoom', type=float)
+    fmt = request.args.get('format', 'geojson')
+    resolved = geo_assets.resolve(layer, zoom, fmt)
+    if resolved is None:
+        abort(404)
+    path, mimetype = resolved
+    return cached_response(http_cache.load_static(path), mimetype)
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.mvt')
+def get_tile(z, x, y):
+    # 화면에 보이는 타일만: 구/동 경계(+통계) + 매장 점 (vector_tiles.py, tiles.mbtiles 에 캐시)
+    cached = vector_tiles.get_tile(z, x, y)
+    if cached is None:
+        abort(404)
+    return cached_response(cached, vector_tiles.MEDIA_TYPE)
+
+@app.route('/tiles/tiles.json')
+def get_tilejson():
+    return jsonify(vector_tiles.tilejson(request.host_url.rstrip('/') + '/tiles/{z}/{x}/{y}.mvt'))
+
 @app.route('/api/gu-stats')
 def get_gu_stats():
     try:
-        # sgg (Sub-Governmental Code) is useful for matching if GeoJSON uses codes, 
-        # but current GeoJSON mostly uses names. We'll stick to names but cleaner query.
-        results = query_db("""
-            SELECT 
-                gu,
-                COUNT(*) as total_stores,
-                SUM(CASE WHEN visited = 1 THEN 1 ELSE 0 END) as visited_stores
-            FROM stores
-            GROUP BY gu
-            ORDER BY gu
-        """)
-        return jsonify([dict(row) for row in results])
+        # stores 가 바뀔 때마다 트리거가 갱신하는 집계 테이블에서 바로 읽음 (store_stats.py)
+        return jsonify([dict(row) for row in store_stats.gu_stats()])
     except Exception as e:
         print(f"Error in gu-stats: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/gu-stats/<gu_name>')
+def get_gu_dong_stats(gu_name):
+    try:
+        results = store_stats.dong_stats(gu_name)
+        if not results:
+            return jsonify({"error": f"unknown gu: {gu_name}"}), 404
+        return jsonify([dict(row) for row in results])
+    except Exception as e:
+        print(f"Error in gu-stats/{gu_name}: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/dong-stats')
 def get_dong_stats():
     try:
         gu_name = request.args.get('gu')
         dong_name = request.args.get('dong')
-        
-        args = []
-        where_clause = []
-        
-        query = "SELECT * FROM stores"
-        
-        if gu_name:
-            where_clause.append("gu = ?")
-            args.append(gu_name)
-            
-        if dong_name:
-            where_clause.append("dong = ?")
-            args.append(dong_name)
-            
-        if where_clause:
-            query += " WHERE " + " AND ".join(where_clause)
-            
-        query += " ORDER BY gu, dong, store_name"
-        
-        results = query_db(query, args)
-        return jsonify([dict(row) for row in results])
+
+        fmt = request.args.get('format', 'json')
+        if fmt != 'json':
+            # 컬럼형 응답: fields= 로 필요한 컬럼만, limit= / cursor= 로 페이지 단위 (store_columnar.py)
+            try:
+                params = store_columnar.validate(fmt, request.args.get('fields'), request.args.get('cursor'),
+                                                 request.args.get('limit', type=int))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return cached_response(store_columnar.get_page(gu_name, dong_name, *params),
+                                   store_columnar.MEDIA_TYPES[fmt])
+        if any(name in request.args for name in ('fields', 'cursor', 'limit')):
+            return jsonify({"error": "fields / cursor / limit require format=columnar"}), 400
+
+        # 필터 조합별로 미리 직렬화된 JSON 을 그대로 응답 (stores 가 바뀔 때만 다시 조회)
+        snapshot = store_cache.get_stores(gu_name, dong_name)
+        metrics.add_rows(snapshot.count)
+        return cached_response(snapshot.http)
     except Exception as e:
         print(f"Error in dong-stats: {e}")
         return jsonify({"error": str(e)}), 500
 
+def spatial_args(names):
+    # 좌표 쿼리 파라미터를 float 로 읽음 (없거나 숫자가 아니면 None)
+    values = [request.args.get(name, type=float) for name in names]
+    return None if any(v is None for v in values) else values
+
+@app.route('/api/stores/bbox')
+def get_stores_in_bbox():
+    # 지도 화면(viewport) 안의 매장만 조회 (stores_rtree 공간 인덱스)
+    bbox = spatial_args(('min_lat', 'min_lng', 'max_lat', 'max_lng'))
+    if bbox is None:
+        return jsonify({"error": "min_lat, min_lng, max_lat, max_lng are required"}), 400
+    min_lat, min_lng, max_lat, max_lng = bbox
+    if min_lat > max_lat or min_lng > max_lng:
+        return jsonify({"error": "min must not be greater than max"}), 400
+    limit = min(request.args.get('limit', store_spatial.MAX_BBOX_RESULTS, type=int), store_spatial.MAX_BBOX_RESULTS)
+    rows, truncated = store_spatial.in_bbox(min_lat, min_lng, max_lat, max_lng, max(limit, 1))
+    return jsonify({"stores": [dict(row) for row in rows], "truncated": truncated})
+
+@app.route('/api/stores/nearest')
+def get_nearest_stores():
+    # (lat, lng) 에서 가까운 k 개 매장 + 거리(m), radius(m) 를 주면 그 안에서만
+    point = spatial_args(('lat', 'lng'))
+    if point is None:
+        return jsonify({"error": "lat, lng are required"}), 400
+    lat, lng = point
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({"error": "lat/lng out of range"}), 400
+    k = min(max(request.args.get('k', 10, type=int), 1), store_spatial.MAX_NEAREST)
+    radius = request.args.get('radius', type=float)
+    results = store_spatial.nearest(lat, lng, k, radius)
+    return jsonify([dict(row, distance_m=round(distance, 1)) for row, distance in results])
+
 @app.route('/api/toggle', methods=['POST'])
 def toggle_visit():
     # Deprecated for anonymous users (Frontend handles localStorage)
@@ -78,13 +178,15 @@ def toggle_visit():
     store_name = data.get('store_name')
     action = data.get('action') # 'check' or 'uncheck'
 
-    conn = sqlite3.connect('starbucks.db')
-    cur = conn.cursor()
     visited_val = 1 if action == 'check' else 0
-    cur.execute("UPDATE stores SET visited = ? WHERE store_name = ?", (visited_val, store_name))
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "success"})
+    # 연달아 누른 토글은 visit_writer 가 트랜잭션 하나로 모아서 기록 (commit 된 뒤 응답)
+    try:
+        result = visit_writer.set_visit(visited_val, store_name=store_name)
+    except visit_writer.QueueFull:
+        return jsonify({"status": "busy"}), 503
+    if result is None:
+        return jsonify({"error": f"unknown store_name: {store_name}"}), 404
+    return jsonify({"status": "success", **result})
 
 @app.route('/api/log', methods=['POST'])
 def log_action():
@@ -95,30 +197,115 @@ def log_action():
         target = data.get('target')
         ip_addr = request.remote_addr
 
-        conn = sqlite3.connect('starbucks.db')
-        cur = conn.cursor()
-        cur.execute("INSERT INTO action_logs (user_uuid, action, target, ip_address) VALUES (?, ?, ?, ?)",
-                    (user_uuid, action, target, ip_addr))
-        conn.commit()
-        conn.close()
+        # 큐에 넣기만 하고 바로 응답 (기록은 log_writer 백그라운드 스레드가 모아서 처리)
+        if not log_writer.submit(user_uuid, action, target, ip_addr):
+            return jsonify({"status": "dropped"}), 503
         return jsonify({"status": "logged"})
     except Exception as e:
         print(f"Log Error: {e}")
         return jsonify({"status": "error"}), 500
 
+@app.route('/api/log/batch', methods=['POST'])
+def log_actions_batch():
+    # {"uuid": "...", "events": [{"action": ..., "target": ...}, ...]} 여러 이벤트를 한 번에
+    try:
+        data = request.json
+        events = data.get('events')
+        if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+            return jsonify({"status": "error", "error": "events must be a list of objects"}), 400
+        if len(events) > MAX_LOG_BATCH:
+            return jsonify({"status": "error", "error": f"at most {MAX_LOG_BATCH} events per batch"}), 413
+
+        accepted, dropped = log_writer.submit_many(events, request.remote_addr, data.get('uuid'))
+        status = 503 if dropped and not accepted else 200
+        return jsonify({"status": "logged", "accepted": accepted, "dropped": dropped}), status
+    except Exception as e:
+        print(f"Log Error: {e}")
+        return jsonify({"status": "error"}), 500
+
+def analytics_range():
+    # ?start=2026-02-01&end=2026-02-07 (UTC, end 포함), 없으면 오늘까지 최근 ?days=7 일
+    return log_analytics.day_range(request.args.get('start'), request.args.get('end'),
+                                   request.args.get('days', 7, type=int))
+
+@app.route('/api/analytics/daily')
+def get_analytics_daily():
+    # 날짜별 이벤트 수 / 사용자 수 / action 별 이벤트 수 (롤업 테이블만 읽음)
+    try:
+        return jsonify(log_analytics.daily(*analytics_range()))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/analytics/top')
+def get_analytics_top():
+    # ?action=CLICK_GU : 기간 동안 가장 많이 나온 target (예: 가장 많이 본 구)
+    action = request.args.get('action')
+    if not action:
+        return jsonify({"error": "action is required"}), 400
+    try:
+        return jsonify(log_analytics.top_targets(action, *analytics_range(), request.args.get('limit', 10, type=int)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/analytics/timeseries')
+def get_analytics_timeseries():
+    # ?granularity=hour|day&action=...&target=... 시간/날짜별 이벤트 수
+    try:
+        return jsonify(log_analytics.timeseries(*analytics_range(), request.args.get('granularity', 'day'),
+                                                request.args.get('action'), request.args.get('target')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route('/api/update-visit', methods=['POST'])
 def update_visit():
     try:
         data = request.json
         store_code = data.get('store_code')
         visited = 1 if data.get('visited') else 0
-        
-        query_db("UPDATE stores SET visited = ? WHERE store_code = ?", (visited, store_code))
-        
-        return jsonify({"status": "success"})
+        user_uuid = data.get('uuid')
+
+        # uuid 가 있으면 사용자별 방문 기록 (user_visits.py) - 다른 사용자의 방문 상태는 건드리지 않음
+        # 짧은 시간 안에 들어온 변경은 visit_writer 가 트랜잭션 하나로 모아서 기록 (commit 된 뒤 응답)
+        result = visit_writer.set_visit(visited, store_code=store_code, uuid=user_uuid)
+        if result is None:
+            return jsonify({"error": f"unknown store_code: {store_code}"}), 404
+        return jsonify({"status": "success", **result})
+    except visit_writer.QueueFull:
+        return jsonify({"status": "busy"}), 503
     except Exception as e:
         print(f"Error in update-visit: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/visits/changes')
+def get_visit_changes():
+    # ?since=N : 버전 N 이후 바뀐 방문 상태만 (처음이면 since=0 또는 생략)
+    # ?uuid=... 를 주면 그 사용자의 방문 기록 기준
+    since = max(request.args.get('since', 0, type=int), 0)
+    user_uuid = request.args.get('uuid')
+    if user_uuid:
+        return jsonify(user_visits.changes_since(user_uuid, since))
+    return jsonify(visit_sync.changes_since(since))
+
+@app.route('/api/visits/bulk', methods=['POST'])
+def bulk_update_visits():
+    # {"store_names": [...], "store_codes": [...], "replace": false} localStorage 방문 목록을 한 번에 반영
+    data = request.json or {}
+    names = data.get('store_names') or []
+    codes = data.get('store_codes') or []
+    if not (isinstance(names, list) and all(isinstance(n, str) for n in names)
+            and isinstance(codes, list) and all(isinstance(c, int) for c in codes)):
+        return jsonify({"error": "store_names must be strings and store_codes integers"}), 400
+    try:
+        if data.get('uuid'):
+            return jsonify(user_visits.apply_visits(data['uuid'], names, codes, bool(data.get('replace'))))
+        return jsonify(visit_sync.apply_visits(names, codes, bool(data.get('replace'))))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+
+@app.route('/api/users/<user_uuid>/progress')
+def get_user_progress(user_uuid):
+    # 사용자별 구 진행률 (?gu=강남구 를 주면 그 구의 동별 진행률)
+    return jsonify(user_visits.progress(user_uuid, request.args.get('gu')))
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
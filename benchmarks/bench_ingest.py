@@ -0,0 +1,110 @@
+"""
+적재 스크립트 벤치마크: 합성 매장 수를 늘려가며 주소 파싱 / 폴리곤 배정 / ingest / db_granular 시간 측정
+
+크기마다 (synthetic.py 로 CSV 생성, starbucks.db 복사본 사용 - 원본은 건드리지 않음)
+- extract_locations : db_3.extract_locations 로 주소 -> 구/동 (pandas 벡터 연산)
+- assign            : DongIndex.assign 으로 좌표 -> 행정동 폴리곤 (STRtree + prepared geometry)
+- ingest            : ingest.run 전체 (CSV 읽기 + 파싱 + 배정 + 스테이징 + 반영), 매장이 합성 데이터로 바뀜
+- ingest_rerun      : 같은 파일을 다시 적재 (바뀐 것이 없는 증분 경로)
+- db_granular       : db_granular.update_db_with_granular_dongs (DB 전체 재배정)
+- ingest_no_paren   : 괄호 있는 주소가 하나도 없는 CSV 를 작은 청크로 적재
+                      (청크마다 extract_locations 를 부르므로 괄호 없는 청크가 생겨도 적재가 끝나야 함)
+
+실행 (프로젝트 루트에서):
+    python benchmarks/bench_ingest.py                           # 600, 5000, 50000
+    python benchmarks/bench_ingest.py --sizes 600 500000 --workers 0
+    python benchmarks/bench_ingest.py --json ingest.json        # 기본: benchmarks/results/ingest-<커밋>.json
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import time
+
+from common import median_ms, save, use_temp_db
+
+_tmp = use_temp_db('starmap-ingest-')
+
+import db_granular  # noqa: E402
+import ingest  # noqa: E402
+import synthetic  # noqa: E402
+from db_3 import extract_locations  # noqa: E402
+
+NO_PAREN_CHUNK_ROWS = 100
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def quiet(fn, *args, **kwargs):
+    # ingest / db_granular 의 진행 출력은 벤치마크 표를 가리므로 버림
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def bench_size(rows, workers, repeat):
+    df = synthetic.store_rows(rows)
+    coords = df[df['lat'].notna()]
+    lngs, lats = coords['lng'].tolist(), coords['lat'].tolist()
+    gus = extract_locations(coords['address'])['gu'].where(lambda gu: gu.str.endswith('구'), None).tolist()
+    index = db_granular.DongIndex.load()
+    # 큰 크기는 한 번만 (첫 ingest 는 DB 를 바꾸므로 크기와 상관없이 한 번)
+    repeat = repeat if rows <= 50000 else 1
+
+    results = []
+
+    def add(case, count, times):
+        ms = median_ms(times)
+        results.append({'case': case, 'rows': rows, 'median_ms': ms,
+                        'rows_per_s': round(count / (ms / 1000)) if ms else None})
+
+    add('extract_locations', len(df), timed(lambda: extract_locations(df['address']), repeat))
+    add('assign', len(lngs), timed(lambda: index.assign(lngs, lats, gus), repeat))
+
+    path = synthetic.write_csv(os.path.join(_tmp, f'stores_{rows}.csv'), rows)
+    add('ingest', len(df), timed(lambda: quiet(ingest.run, [path], workers=workers), 1))
+    # 다시 적재 / 재배정은 DB 를 바꾸지 않으므로 반복 측정
+    add('ingest_rerun', len(df), timed(lambda: quiet(ingest.run, [path], workers=workers), repeat))
+    add('db_granular', len(df), timed(lambda: quiet(db_granular.update_db_with_granular_dongs), repeat))
+    os.remove(path)
+
+    path = synthetic.write_csv(os.path.join(_tmp, f'stores_{rows}_no_paren.csv'), rows, styles=('token',))
+    add('ingest_no_paren', len(df), timed(lambda: quiet(ingest.run, [path], workers=workers,
+                                                        chunk_rows=NO_PAREN_CHUNK_ROWS), 1))
+    os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[600, 5000, 50000],
+                        help=f'합성 매장 수 (기본 600 5000 50000, 최대 규모는 {synthetic.SIZES[-1]})')
+    parser.add_argument('--workers', type=int, default=None, help='ingest 배정 프로세스 수 (기본: ingest 기본값)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='결과를 저장할 JSON 파일 경로')
+    args = parser.parse_args()
+    workers = ingest.default_workers() if args.workers is None else args.workers
+
+    results = []
+    try:
+        print(f"{'case':<20}{'rows':>9}{'median ms':>12}{'rows/s':>12}")
+        for rows in args.sizes:
+            for row in bench_size(rows, workers, args.repeat):
+                results.append(row)
+                print(f"{row['case']:<20}{row['rows']:>9}{row['median_ms']:>12.1f}{row['rows_per_s'] or 0:>12}")
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    save('ingest', {'sizes': args.sizes, 'workers': workers, 'repeat': args.repeat}, results, args.json)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+매장 목록 응답 형식 비교: 직렬화 시간과 크기 (원본 / gzip)
+
+- rows json        : 기존 /api/stores 응답 (행 dict 배열)
+- pydantic         : 예전 FastAPI 경로 (response_model=List[Store] 로 행마다 검증 후 직렬화)
+- columnar         : format=columnar (전체 컬럼)
+- columnar fields  : format=columnar&fields=id,lat,lng,gu,dong,visited (지도 표시용)
+- columnar page    : 위 fields + limit=500 첫 페이지
+- msgpack          : format=msgpack (msgpack 이 설치된 경우만)
+
+--scale 1 10 50 : 실제 매장 목록을 N 배로 복제해서 (전국 규모 이상) 측정
+
+실행 (프로젝트 루트에서):
+    python benchmarks/bench_store_payloads.py --scale 1 10 50 --json payloads.json
+"""
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'starmap-modern', 'backend')
+
+# 원본 DB 는 건드리지 않도록 복사본을 쓰고, 모듈을 import 하기 전에 경로를 지정
+_tmp = tempfile.mkdtemp(prefix='starmap-payloads-')
+os.environ['STARMAP_DB'] = os.path.join(_tmp, 'starbucks.db')
+shutil.copy(os.path.join(ROOT_DIR, 'starbucks.db'), os.environ['STARMAP_DB'])
+sys.path[:0] = [ROOT_DIR, BACKEND_DIR]
+
+import migrations  # noqa: E402
+import store_cache  # noqa: E402
+import store_columnar  # noqa: E402
+
+MAP_FIELDS = ('id', 'lat', 'lng', 'gu', 'dong', 'visited')
+
+
+def load_store_model():
+    """FastAPI backend 의 Store 모델 (프로젝트 루트에도 main.py 가 있어서 파일 경로로 불러옴)"""
+    try:
+        spec = importlib.util.spec_from_file_location('backend_main', os.path.join(BACKEND_DIR, 'main.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except ImportError:  # fastapi 가 없으면 pydantic 비교는 건너뜀
+        return None
+    return module.Store
+
+
+def synthetic_rows(rows, scale):
+    """매장 목록을 scale 배로 복제 (id / 이름 / 코드는 겹치지 않게), 정렬 순서 유지"""
+    out = []
+    for copy in range(scale):
+        for row in rows:
+            out.append(dict(row, id=row['id'] + copy * 1000000, store_name=f"{row['store_name']}#{copy}",
+                            store_code=row['store_code'] + copy * 1000000))
+    out.sort(key=lambda row: (row['gu'] or '', row['dong'] or '', row['store_name']))
+    return out
+
+
+def measure(encode, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), body
+
+
+def encoders(rows, store_model=None):
+    table = store_columnar.build_table(rows)
+    cases = [
+        ('rows json', lambda: json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')),
+    ]
+    if store_model is not None:
+        from typing import List
+        from pydantic import TypeAdapter
+        adapter = TypeAdapter(List[store_model])
+        cases.append(('pydantic', lambda: adapter.dump_json(adapter.validate_python(rows))))
+    cases += [
+        ('columnar', lambda: store_columnar.encode(store_columnar.page_payload(table))),
+        ('columnar fields', lambda: store_columnar.encode(store_columnar.page_payload(table, MAP_FIELDS))),
+        ('columnar page', lambda: store_columnar.encode(store_columnar.page_payload(table, MAP_FIELDS, None, 500))),
+    ]
+    if store_columnar.msgpack is not None:
+        cases.append(('msgpack', lambda: store_columnar.encode(store_columnar.page_payload(table), 'msgpack')))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='결과를 저장할 JSON 파일 경로')
+    args = parser.parse_args()
+
+    try:
+        migrations.migrate()
+        base_rows = [dict(row) for row in store_cache.select_rows()]
+        store_model = load_store_model()
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    results = []
+    for scale in args.scale:
+        rows = synthetic_rows(base_rows, scale)
+        print(f"\n{len(rows)} stores (x{scale})")
+        print(f"{'format':<18}{'encode ms':>11}{'KB':>10}{'gzip KB':>10}{'vs rows':>9}")
+        baseline = None
+        for name, encode in encoders(rows, store_model):
+            ms, body = measure(encode, args.repeat)
+            gz = len(gzip.compress(body, compresslevel=6))
+            baseline = baseline or len(body)
+            print(f"{name:<18}{ms:>11.2f}{len(body) / 1024:>10.1f}{gz / 1024:>10.1f}{len(body) / baseline:>8.0%}")
+            results.append({'scale': scale, 'stores': len(rows), 'format': name, 'encode_ms': round(ms, 3),
+                            'bytes': len(body), 'gzip_bytes': gz})
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'store_payloads', 'results': results}, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+벤치마크 스크립트 공통 도구: 임시 DB, 지연 시간 통계, 결과 JSON 저장 / 비교용 메타데이터
+
+결과 파일 형식 (compare.py 가 읽음):
+    {"benchmark": 이름, "env": {git 커밋, 파이썬, sqlite, CPU ...}, "params": {...},
+     "results": [{키 필드..., 측정값...}, ...]}
+
+측정값은 이름으로 구분 (compare.py): *_ms / *_s 는 작을수록, rps / *_per_s 는 클수록 좋음
+그 밖의 필드는 같은 측정끼리 짝을 맞추는 키로 쓰임
+"""
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'starmap-modern', 'backend')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def use_temp_db(prefix):
+    """starbucks.db 복사본과 폴리곤 캐시 디렉터리를 임시 폴더에 만들고 환경 변수로 지정 (임시 폴더 경로 반환)
+
+    프로젝트 모듈은 import 할 때 경로를 읽으므로 import 하기 전에 불러야 함
+    """
+    tmp = tempfile.mkdtemp(prefix=prefix)
+    os.environ['STARMAP_DB'] = os.path.join(tmp, 'starbucks.db')
+    os.environ['STARMAP_TILES'] = os.path.join(tmp, 'tiles.mbtiles')
+    os.environ.setdefault('STARMAP_GEO_CACHE', os.path.join(tmp, 'geo_cache'))
+    shutil.copy(os.path.join(ROOT_DIR, 'starbucks.db'), os.environ['STARMAP_DB'])
+    for path in (ROOT_DIR, BACKEND_DIR):
+        if path not in sys.path:
+            sys.path.append(path)
+    return tmp
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def latency_summary(latencies_ms, seconds):
+    """요청별 지연 시간(ms) 목록 -> requests / rps / p50 / p99 / max"""
+    return {
+        'requests': len(latencies_ms),
+        'rps': round(len(latencies_ms) / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'max_ms': round(max(latencies_ms, default=0.0), 3),
+    }
+
+
+def median_ms(times_s):
+    return round(statistics.median(times_s) * 1000, 3)
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT_DIR, capture_output=True, text=True,
+                              timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def environment():
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD') or None,
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def save(benchmark, params, results, path=None):
+    """결과를 JSON 으로 저장하고 경로 반환 (path 가 없으면 results/<benchmark>-<커밋>.json)"""
+    env = environment()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = (env['commit'] or 'nogit') + ('-dirty' if env['dirty'] else '')
+        path = os.path.join(RESULTS_DIR, f'{benchmark}-{suffix}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'benchmark': benchmark, 'env': env, 'params': params, 'results': results},
+                  f, indent=2, ensure_ascii=False)
+    print(f"\nSaved {len(results)} results -> {path}")
+    return path
@@ -0,0 +1,85 @@
+"""
+두 벤치마크 결과 JSON 비교 (커밋 사이 성능 회귀 확인)
+
+같은 키 필드 (backend, endpoint, clients, case, rows ...) 를 가진 측정끼리 짝을 맞추고
+측정값이 THRESHOLD 보다 나빠졌으면 '!' 로 표시 (하나라도 있으면 종료 코드 1)
+
+- *_ms, *_s       : 작을수록 좋음
+- rps, *_per_s    : 클수록 좋음
+- requests, errors, locked, lost, commits: 참고용 (키로도 측정값으로도 쓰지 않음)
+
+실행 (프로젝트 루트에서):
+    python benchmarks/compare.py benchmarks/results/http-abc1234.json benchmarks/results/http-def5678.json
+    python benchmarks/compare.py old.json new.json --threshold 0.2 --metrics p99_ms rps
+"""
+import argparse
+import json
+import sys
+
+THRESHOLD = 0.10
+INFO_FIELDS = {'requests', 'errors', 'max_ms', 'locked', 'lost', 'commits'}  # 한 번 튀는 값 / 개수라 회귀 판단에 쓰지 않음
+
+
+def is_metric(field):
+    return field.endswith(('_ms', '_s')) or field == 'rps'
+
+
+def higher_is_better(field):
+    return field == 'rps' or field.endswith('_per_s')
+
+
+def key_of(row):
+    return tuple(sorted((k, v) for k, v in row.items() if not is_metric(k) and k not in INFO_FIELDS))
+
+
+def compare(old, new, threshold=THRESHOLD, metrics=None):
+    """(키, 측정값 이름, 이전, 이후, 변화율, 회귀 여부) 목록"""
+    before = {key_of(row): row for row in old['results']}
+    rows = []
+    for row in new['results']:
+        base = before.get(key_of(row))
+        if base is None:
+            continue
+        for field, value in row.items():
+            if not is_metric(field) or field in INFO_FIELDS or (metrics and field not in metrics):
+                continue
+            prev = base.get(field)
+            if not prev or value is None:
+                continue
+            change = (value - prev) / prev
+            worse = -change if higher_is_better(field) else change
+            rows.append((key_of(row), field, prev, value, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='회귀로 볼 변화율 (기본 0.10 = 10%%)')
+    parser.add_argument('--metrics', nargs='+', help='비교할 측정값만 (기본: 전부)')
+    args = parser.parse_args()
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    if old.get('benchmark') != new.get('benchmark'):
+        sys.exit(f"different benchmarks: {old.get('benchmark')} vs {new.get('benchmark')}")
+    for label, data in (('old', old), ('new', new)):
+        env = data.get('env', {})
+        print(f"{label}: {env.get('commit')}{' (dirty)' if env.get('dirty') else ''} {env.get('date')} "
+              f"python {env.get('python')} sqlite {env.get('sqlite')} cpus {env.get('cpus')}")
+
+    rows = compare(old, new, args.threshold, args.metrics)
+    print(f"\n{'':<2}{'case':<44}{'metric':<12}{'old':>11}{'new':>11}{'change':>9}")
+    for key, field, prev, value, change, regressed in rows:
+        label = ' '.join(str(v) for _, v in key)
+        print(f"{'!' if regressed else ' ':<2}{label:<44}{field:<12}{prev:>11}{value:>11}{change:>+9.1%}")
+    regressions = sum(r[5] for r in rows)
+    print(f"\n{len(rows)} metrics compared, {regressions} regressions (threshold {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
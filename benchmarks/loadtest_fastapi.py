@@ -0,0 +1,156 @@
+"""
+FastAPI 백엔드 부하 테스트: 동시 클라이언트 수를 늘려가며 지연 시간(p50/p99)이 유지되는지 확인
+
+uvicorn 을 별도 프로세스로 띄우고 (starbucks.db 복사본 사용, 원본은 건드리지 않음)
+클라이언트 N 명이 DURATION 초 동안 요청을 반복한다.
+
+요청 비율: GET /api/dong-stats?gu=... 70%, GET /api/gu-stats 20%, POST /api/update-visit 10%
+--lock-hold 0.2 : 다른 연결이 매초 0.2초씩 쓰기 락을 잡음 (ingest 스크립트 실행 중 상황 흉내)
+
+실행 (프로젝트 루트에서, httpx 필요):
+    python benchmarks/loadtest_fastapi.py --clients 1 10 50 100 200 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'starmap-modern', 'backend')
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port):
+    env = dict(os.environ, STARMAP_DB=db_path)
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError('server did not start')
+
+
+def lock_holder(db_path, hold, stop):
+    """매초 hold 초 동안 쓰기 락을 잡았다 놓음"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    while not stop.is_set():
+        conn.execute('BEGIN IMMEDIATE')
+        time.sleep(hold)
+        conn.execute('COMMIT')
+        stop.wait(max(0.0, 1.0 - hold))
+    conn.close()
+
+
+async def client_loop(client, base, gus, codes, deadline, latencies, errors):
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        r = rng.random()
+        start = time.perf_counter()
+        try:
+            if r < 0.7:
+                resp = await client.get(f'{base}/api/dong-stats', params={'gu': rng.choice(gus)})
+            elif r < 0.9:
+                resp = await client.get(f'{base}/api/gu-stats')
+            else:
+                resp = await client.post(f'{base}/api/update-visit',
+                                         json={'store_code': rng.choice(codes), 'visited': rng.random() < 0.5})
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_level(base, clients, duration, gus, codes):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(client_loop(client, base, gus, codes, deadline, latencies, errors)
+                               for _ in range(clients)))
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50, 100, 200])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--lock-hold', type=float, default=0.0)
+    parser.add_argument('--json', help='결과를 저장할 JSON 파일 경로')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='starmap-load-')
+    db_path = os.path.join(tmp, 'starbucks.db')
+    shutil.copy(os.path.join(ROOT_DIR, 'starbucks.db'), db_path)
+
+    port = free_port()
+    proc = start_server(db_path, port)
+    base = f'http://127.0.0.1:{port}'
+    stop = threading.Event()
+    try:
+        stores = httpx.get(f'{base}/api/stores', timeout=30).json()
+        gus = sorted({s['gu'] for s in stores})
+        codes = [s['store_code'] for s in stores]
+
+        if args.lock_hold:
+            threading.Thread(target=lock_holder, args=(db_path, args.lock_hold, stop), daemon=True).start()
+
+        results = []
+        print(f"{'clients':>8}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for clients in args.clients:
+            row = asyncio.run(run_level(base, clients, args.duration, gus, codes))
+            results.append(row)
+            print(f"{row['clients']:>8}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10}"
+                  f"{row['p50_ms']:>10}{row['p99_ms']:>10}")
+    finally:
+        stop.set()
+        proc.terminate()
+        proc.wait(10)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'loadtest_fastapi', 'lock_hold': args.lock_hold, 'results': results}, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
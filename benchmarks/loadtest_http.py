@@ -0,0 +1,192 @@
+"""
+Flask (app.py) vs FastAPI (starmap-modern/backend/main.py) 프로세스 내 부하 테스트
+
+서버를 띄우지 않고 같은 프로세스 안에서 두 앱을 직접 호출한다 (네트워크 / uvicorn 비용 제외,
+앱 코드 + DB 접근만 비교). starbucks.db 복사본을 쓰므로 원본은 건드리지 않음.
+
+- Flask  : 클라이언트마다 스레드 하나 + app.test_client() (스레드 WSGI 서버와 같은 모양)
+- FastAPI: 클라이언트마다 코루틴 하나 + httpx.ASGITransport (이벤트 루프 하나, DB 작업은 async_db 스레드 풀)
+
+엔드포인트별로 동시 클라이언트 수를 바꿔가며 DURATION 초씩 반복하고 처리량과 p50 / p99 를 기록:
+- dong-stats   : GET /api/dong-stats?gu=<무작위 구>
+- gu-stats     : GET /api/gu-stats
+- update-visit : POST /api/update-visit (사용자 USERS 명 중 무작위, 사용자별 방문 기록)
+- log          : POST /api/log (log_writer 큐에 넣기만 함, 큐가 차면 503 -> errors)
+
+--stores 50000 : synthetic.py 의 합성 매장으로 DB 를 먼저 바꿔서 (ingest.run) 큰 규모에서 측정
+
+실행 (프로젝트 루트에서, httpx 필요):
+    python benchmarks/loadtest_http.py --clients 1 8 32 --duration 2
+    python benchmarks/loadtest_http.py --stores 50000 --backends fastapi --endpoints dong-stats gu-stats
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import os
+import random
+import shutil
+import threading
+import time
+
+import httpx
+
+from common import BACKEND_DIR, latency_summary, save, use_temp_db
+
+_tmp = use_temp_db('starmap-http-')
+
+import db_pool  # noqa: E402
+import log_writer  # noqa: E402
+
+ENDPOINTS = ('dong-stats', 'gu-stats', 'update-visit', 'log')
+BACKENDS = ('flask', 'fastapi')
+USERS = 1000
+WARMUP = 20  # 측정 전에 엔드포인트마다 보내는 요청 수 (캐시 채우기)
+
+_loop = asyncio.new_event_loop()
+
+
+def load_backend():
+    """FastAPI backend 모듈 (프로젝트 루트에도 main.py 가 있어서 파일 경로로 불러옴)"""
+    spec = importlib.util.spec_from_file_location('backend_main', os.path.join(BACKEND_DIR, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def request_maker(endpoint, gus, codes, rng):
+    """endpoint -> () -> (method, url, json body 또는 None) 을 만드는 함수"""
+    users = [f'bench-user-{i:04d}' for i in range(USERS)]
+    if endpoint == 'dong-stats':
+        return lambda: ('GET', f'/api/dong-stats?gu={rng.choice(gus)}', None)
+    if endpoint == 'gu-stats':
+        return lambda: ('GET', '/api/gu-stats', None)
+    if endpoint == 'update-visit':
+        return lambda: ('POST', '/api/update-visit', {'uuid': rng.choice(users), 'store_code': rng.choice(codes),
+                                                      'visited': rng.random() < 0.5})
+    return lambda: ('POST', '/api/log', {'uuid': rng.choice(users), 'action': 'view_store',
+                                         'target': str(rng.choice(codes))})
+
+
+# ----------------------------------------------------------------------------
+# Flask: 스레드
+# ----------------------------------------------------------------------------
+
+def run_flask(app, make, clients, duration):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        client = app.test_client()
+        mine, failed = [], 0
+        while time.monotonic() < deadline:
+            method, url, body = make()
+            start = time.perf_counter()
+            resp = client.open(url, method=method, json=body)
+            mine.append((time.perf_counter() - start) * 1000)
+            failed += resp.status_code >= 400
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, sum(errors), time.perf_counter() - start
+
+
+# ----------------------------------------------------------------------------
+# FastAPI: 코루틴
+# ----------------------------------------------------------------------------
+
+async def _run_fastapi(app, make, clients, duration):
+    latencies, errors = [], [0]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=30) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker():
+            while time.monotonic() < deadline:
+                method, url, body = make()
+                start = time.perf_counter()
+                resp = await client.request(method, url, json=body)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors[0] += resp.status_code >= 400
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def run_fastapi(app, make, clients, duration):
+    # async_db 의 세마포어는 처음 쓴 이벤트 루프에 묶이므로 모든 측정을 같은 루프에서 (서버와 같은 조건)
+    return _loop.run_until_complete(_run_fastapi(app, make, clients, duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--stores', type=int, help='합성 매장 수 (없으면 starbucks.db 의 매장 그대로)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='결과를 저장할 JSON 파일 경로')
+    args = parser.parse_args()
+
+    results = []
+    backend = None
+    try:
+        if args.stores:
+            import ingest
+            import synthetic
+            path = synthetic.write_csv(os.path.join(_tmp, 'stores.csv'), args.stores, args.seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                ingest.run([path])
+
+        import app as flask_module
+        runners = {'flask': (run_flask, flask_module.app)}
+        if 'fastapi' in args.backends:
+            backend = load_backend()
+            runners['fastapi'] = (run_fastapi, backend.app)
+
+        conn = db_pool.connect()
+        gus = [row[0] for row in conn.execute("SELECT DISTINCT gu FROM stores ORDER BY gu")]
+        codes = [row[0] for row in conn.execute("SELECT store_code FROM stores")]
+        store_count = len(codes)
+        conn.close()
+
+        print(f"{store_count} stores")
+        print(f"{'backend':<9}{'endpoint':<14}{'clients':>8}{'requests':>10}{'errors':>8}"
+              f"{'rps':>10}{'p50 ms':>9}{'p99 ms':>9}")
+        for name in args.backends:
+            run, app = runners[name]
+            for endpoint in args.endpoints:
+                make = request_maker(endpoint, gus, codes, random.Random(args.seed))
+                for _ in range(WARMUP):  # 첫 호출 비용 (캐시 빌드, 연결 생성) 을 측정에서 제외
+                    run(app, make, 1, 0.001)
+                for clients in args.clients:
+                    latencies, errors, seconds = run(app, make, clients, args.duration)
+                    row = {'backend': name, 'endpoint': endpoint, 'clients': clients, 'stores': store_count,
+                           'errors': errors, **latency_summary(latencies, seconds)}
+                    results.append(row)
+                    print(f"{name:<9}{endpoint:<14}{clients:>8}{row['requests']:>10}{errors:>8}"
+                          f"{row['rps']:>10}{row['p50_ms']:>9}{row['p99_ms']:>9}")
+    finally:
+        log_writer.shutdown()
+        if backend is not None:
+            backend.async_db.shutdown()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    save('http', {'clients': args.clients, 'duration': args.duration, 'stores': args.stores, 'seed': args.seed},
+         results, args.json)
+    return results
+
+
+if __name__ == '__main__':
+    main()
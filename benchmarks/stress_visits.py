@@ -0,0 +1,167 @@
+"""
+/api/update-visit 쓰기 스트레스 테스트: 요청마다 commit (direct) vs visit_writer 로 모아서 commit (coalesced)
+
+gunicorn 처럼 워커 프로세스 PROCESSES 개를 fork 하고, 각 워커 안에서 클라이언트 스레드가
+app.test_client() 로 DURATION 초 동안 방문 체크 / 해제를 쉬지 않고 보낸다 (starbucks.db 복사본 사용).
+
+- 클라이언트마다 사용자 uuid 가 따로 있고 BURST 개 매장을 연달아 체크 -> 해제 (같은 매장을 다시 누르는 경우 포함)
+- direct   : STARMAP_VISIT_COALESCE=0 과 같음, 요청 스레드가 트랜잭션 + commit 을 한 건씩
+- coalesced: visit_writer 스레드가 WINDOW 동안 모인 변경을 트랜잭션 하나로
+- 두 방식 모두 visit_writer.SYNCHRONOUS (기본 FULL, 응답한 쓰기는 디스크에 남음)
+- errors: 4xx/5xx 응답 수, locked: 그중 database is locked
+- lost  : 끝난 뒤 DB 의 user_visits 와 클라이언트가 마지막으로 응답받은 값이 다른 (사용자, 매장) 수 (0 이어야 함)
+
+실행 (프로젝트 루트에서):
+    python benchmarks/stress_visits.py                                   # clients 1 8 32, processes 1 4
+    python benchmarks/stress_visits.py --clients 64 --processes 8 --duration 5
+    python benchmarks/stress_visits.py --synchronous NORMAL --modes direct coalesced
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import random
+import shutil
+import threading
+import time
+
+from common import latency_summary, save, use_temp_db
+
+_tmp = use_temp_db('starmap-visits-')
+
+import db_pool  # noqa: E402
+import visit_writer  # noqa: E402
+
+MODES = ('direct', 'coalesced')
+BURST = 12  # 한 번에 연달아 체크하는 매장 수 ("여러 매장을 연달아 체크" 하는 사용자)
+
+
+def client(app, uuid, codes, deadline, rng, out):
+    c = app.test_client()
+    latencies, errors, locked, last = [], 0, 0, {}
+    while time.monotonic() < deadline:
+        burst = [rng.choice(codes) for _ in range(BURST)]
+        for visited in (True, False):
+            for code in burst:
+                if time.monotonic() >= deadline:
+                    break
+                start = time.perf_counter()
+                resp = c.post('/api/update-visit', json={'uuid': uuid, 'store_code': code, 'visited': visited})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if resp.status_code >= 400:
+                    errors += 1
+                    locked += 'locked' in resp.get_data(as_text=True)
+                else:
+                    last[code] = visited
+    out.append((latencies, errors, locked, uuid, last))
+
+
+def worker(mode, synchronous, prefix, threads, codes, duration, seed, results):
+    # fork 된 워커 프로세스 안 (visit_writer / db_pool 연결은 pid 가 바뀌면 새로 만듦)
+    visit_writer.COALESCE = mode == 'coalesced'
+    visit_writer.SYNCHRONOUS = synchronous
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as flask_module
+    out = []
+    deadline = time.monotonic() + duration
+    ts = [threading.Thread(target=client, args=(flask_module.app, f'{prefix}-{i}', codes, deadline,
+                                                random.Random(seed + i), out))
+          for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    visit_writer.shutdown()
+    results.put((out, visit_writer.stats() if visit_writer.COALESCE else {}))
+
+
+def count_lost(acked):
+    """클라이언트가 마지막으로 응답받은 방문 여부와 DB 가 다른 (사용자, 매장) 수"""
+    conn = db_pool.connect(readonly=True)
+    lost = 0
+    for uuid, last in acked:
+        stored = {row[0] for row in conn.execute("""
+            SELECT s.store_code FROM user_visits v JOIN users u ON u.id = v.user_id JOIN stores s ON s.id = v.store_id
+            WHERE u.uuid = ?
+        """, (uuid,))}
+        lost += sum((code in stored) != visited for code, visited in last.items())
+    conn.close()
+    return lost
+
+
+def run(mode, synchronous, clients, processes, codes, duration, seed):
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    procs = []
+    for p in range(processes):
+        threads = clients // processes + (p < clients % processes)
+        prefix = f'stress-{mode}-{clients}-{processes}-{p}'
+        procs.append(ctx.Process(target=worker, args=(mode, synchronous, prefix, threads, codes, duration,
+                                                      seed + p * 1000, results)))
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    outs = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    seconds = time.perf_counter() - start
+
+    latencies, errors, locked, acked, batches, written = [], 0, 0, [], 0, 0
+    for out, stats in outs:
+        batches += stats.get('batches', 0)
+        written += stats.get('written', 0)
+        for lat, err, lock, uuid, last in out:
+            latencies += lat
+            errors += err
+            locked += lock
+            acked.append((uuid, last))
+    row = {'mode': mode, 'clients': clients, 'processes': processes, 'errors': errors, 'locked': locked,
+           'lost': count_lost(acked), **latency_summary(latencies, seconds)}
+    row['commits'] = batches if mode == 'coalesced' else row['requests'] - errors
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 4], help='워커 프로세스 수 (gunicorn -w)')
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--synchronous', choices=('FULL', 'NORMAL'), default=visit_writer.SYNCHRONOUS)
+    parser.add_argument('--stores', type=int, default=200, help='클라이언트가 체크하는 매장 수')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='결과를 저장할 JSON 파일 경로')
+    args = parser.parse_args()
+
+    results = []
+    try:
+        # 부모에서 한 번 마이그레이션 (워커들이 동시에 스키마를 바꾸지 않도록)
+        with contextlib.redirect_stdout(io.StringIO()):
+            import migrations
+            migrations.migrate()
+        conn = db_pool.connect(readonly=True)
+        codes = [row[0] for row in conn.execute("SELECT store_code FROM stores ORDER BY id LIMIT ?", (args.stores,))]
+        conn.close()
+
+        print(f"{'mode':<11}{'procs':>6}{'clients':>8}{'requests':>10}{'commits':>9}{'errors':>8}{'locked':>8}"
+              f"{'lost':>6}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        for processes in args.processes:
+            for clients in args.clients:
+                if clients < processes:
+                    continue
+                for mode in args.modes:
+                    row = run(mode, args.synchronous, clients, processes, codes, args.duration, args.seed)
+                    results.append(row)
+                    print(f"{mode:<11}{processes:>6}{clients:>8}{row['requests']:>10}{row['commits']:>9}"
+                          f"{row['errors']:>8}{row['locked']:>8}{row['lost']:>6}{row['rps']:>9}"
+                          f"{row['p50_ms']:>9}{row['p99_ms']:>9}")
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    save('visits', {'clients': args.clients, 'processes': args.processes, 'duration': args.duration,
+                    'synchronous': args.synchronous, 'stores': args.stores, 'seed': args.seed}, results, args.json)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+합성 매장 데이터 생성기 (600 ~ 500k 행, 같은 seed 면 항상 같은 데이터)
+
+실제 행정동 폴리곤 (geo_cache 'dong') 안에서 좌표를 뽑고, 그 동의 구 / 동 이름으로 주소를 만든다.
+주소 형식은 db_3.extract_locations 의 분기를 골고루 지나가도록 섞음:
+
+- 괄호 안 동 이름     "서울특별시 노원구 월계로 12 (월계1동) 1522-3232"
+- 괄호 안 쉼표        "서울특별시 노원구 월계로 12, 2층 (월계1동, 합성빌딩)"
+- 괄호 없이 단어에서  "서울특별시 노원구 월계1동 123-4"
+- 좌표 없음 (주소로만 배정), 서울 밖 매장 (지역 필터에서 빠짐)
+
+--styles 로 일부 형식만 뽑을 수 있음 (예: token 만 -> 괄호 있는 주소가 하나도 없는 CSV)
+
+CSV 는 data/star_bucks_store_utf.csv 와 같은 형식 (매장명, 주소, 위도, 경도)
+
+python benchmarks/synthetic.py 50000 /tmp/stores_50k.csv
+python benchmarks/synthetic.py 5000 /tmp/stores_no_paren.csv --styles token
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import shapely
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import geo_cache  # noqa: E402
+
+SIZES = (600, 5000, 50000, 500000)
+
+# 주소 형식 비율 (합이 1)
+ADDRESS_STYLES = (('paren', 0.70), ('comma', 0.12), ('token', 0.10), ('no_coords', 0.05), ('outside', 0.03))
+OUTSIDE_ADDRESSES = ('경기도 성남시 분당구 판교역로 {n}', '부산광역시 해운대구 해운대로 {n} (우동)',
+                     '인천광역시 연수구 송도과학로 {n}')
+
+
+def _points_in(geom, bounds, count, rng):
+    """폴리곤 안의 무작위 점 count 개 (bbox 에서 뽑고 밖에 떨어진 것은 버림)"""
+    minx, miny, maxx, maxy = bounds
+    xs, ys = [], []
+    need = count
+    while need > 0:
+        x = rng.uniform(minx, maxx, need * 3)
+        y = rng.uniform(miny, maxy, need * 3)
+        inside = shapely.contains_xy(geom, x, y)
+        xs.append(x[inside][:need])
+        ys.append(y[inside][:need])
+        need -= len(xs[-1])
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def store_rows(n, seed=0, styles=None):
+    """n 개 합성 매장 DataFrame (store_name, address, lat, lng) - 서울 매장은 행정동에 고르게 흩어짐
+
+    styles: 쓸 주소 형식 이름 목록 (없으면 ADDRESS_STYLES 전부, 비율은 남은 형식끼리 다시 맞춤)
+    """
+    rng = np.random.default_rng(seed)
+    layer = geo_cache.load('dong')
+    shapely.prepare(layer.geoms)
+    names, probs = zip(*[(name, p) for name, p in ADDRESS_STYLES if styles is None or name in styles])
+    if styles is not None:
+        probs = np.array(probs) / sum(probs)
+    styles = rng.choice(names, size=n, p=probs)
+    areas = rng.integers(0, len(layer.features), size=n)
+    numbers = rng.integers(1, 999, size=n)
+
+    lngs = np.full(n, np.nan)
+    lats = np.full(n, np.nan)
+    for area in np.unique(areas):
+        rows = np.flatnonzero(areas == area)
+        lngs[rows], lats[rows] = _points_in(layer.geoms[area], layer.bounds[area], len(rows), rng)
+
+    addresses = []
+    for i, (style, area, num) in enumerate(zip(styles, areas, numbers)):
+        f = layer.features[area]
+        road = f"{f['dong'].rstrip('동').rstrip('0123456789·.')}로"
+        if style == 'paren':
+            addresses.append(f"서울특별시 {f['gu']} {road} {num} ({f['dong']}) 1522-3232")
+        elif style == 'comma':
+            addresses.append(f"서울특별시 {f['gu']} {road} {num}, {num % 5 + 1}층 ({f['dong']}, 합성빌딩{i})")
+        elif style == 'token':
+            addresses.append(f"서울특별시 {f['gu']} {f['dong']} {num}-{i % 50 + 1}")
+        elif style == 'no_coords':
+            addresses.append(f"서울특별시 {f['gu']} {road} {num} ({f['dong']})")
+            lngs[i] = lats[i] = np.nan
+        else:
+            addresses.append(OUTSIDE_ADDRESSES[i % len(OUTSIDE_ADDRESSES)].format(n=num))
+            lngs[i], lats[i] = lngs[i] + 0.5, lats[i] - 0.5
+
+    return pd.DataFrame({
+        'store_name': [f'합성매장{i:06d}' for i in range(n)],
+        'address': addresses,
+        'lat': lats.round(7),
+        'lng': lngs.round(7),
+    })
+
+
+def write_csv(path, n, seed=0, styles=None):
+    """ingest.py 가 읽는 star_bucks_store_utf 형식으로 저장하고 경로 반환"""
+    df = store_rows(n, seed, styles).rename(columns={'store_name': '매장명', 'address': '주소', 'lat': '위도', 'lng': '경도'})
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--styles', nargs='+', choices=[name for name, _ in ADDRESS_STYLES], help='주소 형식 (기본: 전부)')
+    args = parser.parse_args()
+    write_csv(args.path, args.rows, args.seed, args.styles)
+    print(f"{args.rows} synthetic stores -> {args.path}")
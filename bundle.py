@@ -0,0 +1,384 @@
+"""
+미리 빌드한 서빙 번들 (서버 시작 직후부터 SQLite 조회 / JSON 직렬화 / gzip 압축 없이 응답)
+
+서버는 매장 목록 JSON 과 정적 GeoJSON 압축본을 첫 요청이나 시작할 때 워커마다 만들어서
+각자 메모리에 들고 있었다. 번들은 그 결과물을 파일 하나로 미리 만들어 두고 mmap 으로 연다.
+
+- bundle/serving-<내용 해시>.bundle : 한 번 쓰면 바뀌지 않는 파일 (geo_cache 와 같은 [MAGIC][헤더 JSON][데이터] 형식)
+  - 매장 목록 스냅샷: 전체 / 구별 / 구+동별 JSON (store_cache 와 같은 바이트) + gzip(+brotli) + ETag
+  - 정적 GeoJSON: static/*.geojson 원본과 geo_build.py 결과물 (static/geo/) 의 압축본 + ETag
+- bundle/CURRENT : 현재 번들 파일 이름 (새 번들을 다 쓴 다음 os.replace 로 바꿈 -> 원자적 교체)
+- 워커는 CHECK_INTERVAL 마다 CURRENT 를 확인해서 바뀌었으면 새 파일을 mmap (진행 중인 응답은 이전 매핑을 계속 씀)
+- mmap 은 페이지 캐시를 그대로 쓰므로 워커가 몇 개든 같은 물리 메모리를 공유 (워커별 복사본 없음)
+- 매장 스냅샷은 빌드할 때의 stores 세대 번호 + 지문 (매장 수, store_locations 세대 번호, 매장 행 전체의 sha256) 이
+  지금 DB 와 같을 때만 사용 (방문 기록이 바뀌면 세대 번호가 바뀌어서 예전처럼 store_cache 가 SQLite 에서 다시 만듦)
+  지문 확인 결과는 (번들, 세대 번호, DB 파일) 이 그대로인 동안만 재사용 -> CURRENT 가 바뀌거나
+  DB 파일을 다른 파일로 바꾸면 (STARMAP_DB, 복원한 사본) 다시 확인
+- 정적 파일은 원본 크기 / mtime (mtime 만 다르면 sha256) 이 같을 때만 사용
+
+python bundle.py          : 번들 빌드 + 교체 (ingest / geo_build 후, 배포할 때 실행)
+python bundle.py --info   : 현재 번들 정보
+python bundle.py --bench  : 번들 유무에 따른 서버 시작 시간 / 첫 요청 / 워커 메모리 비교
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+import db_pool
+import geo_assets
+import http_cache
+
+BUNDLE_DIR = os.path.abspath(os.environ.get('STARMAP_BUNDLE_DIR') or os.path.join(db_pool.BASE_DIR, 'bundle'))
+POINTER = 'CURRENT'
+MAGIC = b'STARMAP-BUNDLE\x01'
+ALIGN = 8
+CHECK_INTERVAL = 1.0  # 초
+KEEP = 3              # 교체 후 남겨 둘 이전 번들 수 (아직 이전 파일을 연 워커가 있을 수 있음)
+
+_lock = threading.Lock()
+_current = (None, None)  # (CURRENT 파일 (크기, mtime), Bundle)
+_checked_at = 0.0
+_valid = (None, False)  # ((번들 version, stores 세대, DB 파일), 지금 DB 와 같은지) - 마지막 확인 한 건
+
+
+def _relpath(path):
+    return os.path.relpath(os.path.abspath(path), db_pool.BASE_DIR)
+
+
+def _fingerprint(conn):
+    # 세대 번호만으로는 다른 DB 파일로 바꾼 경우를 구분하지 못하므로 매장 데이터 요약을 함께 기록
+    # (스냅샷에 들어가는 모든 열의 해시 -> 구/동 / adm_cd 만 고친 경우도 다름)
+    locations = conn.execute("SELECT value FROM data_generation WHERE name = 'store_locations'").fetchone()
+    digest = hashlib.sha256()
+    count = 0
+    for row in conn.execute("SELECT * FROM stores ORDER BY id"):
+        digest.update(json.dumps(tuple(row), ensure_ascii=False).encode('utf-8'))
+        count += 1
+    return [count, locations[0] if locations else 0, digest.hexdigest()]
+
+
+def _db_file():
+    # DB 파일 식별자: 경로가 바뀌거나 다른 파일로 교체 / 덮어쓰면 달라짐 (WAL 체크포인트 후에도 달라져서 한 번 더 확인)
+    try:
+        st = os.stat(db_pool.DB_PATH)
+    except FileNotFoundError:
+        return None
+    return db_pool.DB_PATH, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def static_sources():
+    """번들에 넣을 정적 파일 (원본 GeoJSON + geo_build 결과물)"""
+    paths = list(geo_assets.FALLBACK.values())
+    manifest = geo_assets.load_manifest() or {}
+    for levels in manifest.get('layers', {}).values():
+        for level in levels:
+            paths += [os.path.join(geo_assets.GEO_DIR, level[fmt]) for fmt in geo_assets.MEDIA_TYPES if fmt in level]
+    return [p for p in dict.fromkeys(paths) if os.path.exists(p)]
+
+
+# ----------------------------------------------------------------------------
+# 빌드
+# ----------------------------------------------------------------------------
+
+class _Writer:
+    """blob 들을 8바이트 정렬로 이어 붙이면서 위치를 기록 (같은 내용은 한 번만)"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.seen = {}
+        self.digest = hashlib.sha256()
+
+    def add(self, data):
+        key = hashlib.sha256(data).digest()
+        if key in self.seen:
+            return self.seen[key]
+        position = (self.size, len(data))
+        self.chunks.append(data + b'\0' * (-len(data) % ALIGN))
+        self.size += len(self.chunks[-1])
+        self.digest.update(key)
+        self.seen[key] = position
+        return position
+
+    def add_variants(self, cached):
+        return {encoding: [*self.add(body), etag] for encoding, (body, etag) in cached.variants.items()}
+
+
+def build(directory=None):
+    """현재 DB / 정적 파일로 번들을 만들고 CURRENT 를 바꿈 -> (번들 경로, 바뀌었는지)"""
+    import store_cache  # store_cache 가 이 모듈을 쓰므로 빌드할 때만 불러옴
+
+    directory = directory or BUNDLE_DIR
+    writer = _Writer()
+    conn = db_pool.connect(readonly=True)
+    try:
+        # 한 읽기 트랜잭션 안에서 세대 번호와 데이터를 함께 읽어 둘이 어긋나지 않게
+        conn.execute("BEGIN")
+        generation = conn.execute("SELECT value FROM data_generation WHERE name = 'stores'").fetchone()
+        fingerprint = _fingerprint(conn)
+        rows = [dict(row) for row in conn.execute("SELECT * FROM stores ORDER BY gu, dong, store_name")]
+        conn.rollback()
+    finally:
+        conn.close()
+
+    # store_cache.select_rows 와 같은 순서 (gu, dong, store_name) 로 나눠서 같은 바이트를 만듦
+    groups = {(None, None): rows}
+    for row in rows:
+        groups.setdefault((row['gu'], None), []).append(row)
+        groups.setdefault((row['gu'], row['dong']), []).append(row)
+    stores = {}
+    for key, group in groups.items():
+        snapshot = store_cache.serialize(group)
+        stores[json.dumps(key, ensure_ascii=False)] = {'count': snapshot.count,
+                                                       'variants': writer.add_variants(snapshot.http)}
+
+    static = {}
+    for path in static_sources():
+        with open(path, 'rb') as f:
+            raw = f.read()
+        st = os.stat(path)
+        static[_relpath(path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                                  'sha256': hashlib.sha256(raw).hexdigest(),
+                                  'variants': writer.add_variants(http_cache.build_variants(raw))}
+
+    generation = generation[0] if generation else 0
+    # 같은 내용이라도 세대 번호가 다르면 다른 번들 (내용 해시 + 세대 번호 + 요약으로 이름을 정함)
+    writer.digest.update(json.dumps([generation, fingerprint]).encode())
+    version = writer.digest.hexdigest()[:16]
+    name = f'serving-{version}.bundle'
+    path = os.path.join(directory, name)
+    pointer = os.path.join(directory, POINTER)
+    if _read_pointer(pointer) == name and os.path.exists(path):
+        return path, False
+
+    header = {
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'generation': generation,
+        'fingerprint': fingerprint,
+        'stores': stores,
+        'static': static,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    os.makedirs(directory, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        prefix = MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+        f.write(prefix + b'\0' * (-len(prefix) % ALIGN))
+        for chunk in writer.chunks:
+            f.write(chunk)
+    # 번들 파일을 다 쓴 다음에 CURRENT 를 바꿈 -> 워커는 반쯤 쓴 파일을 볼 수 없음
+    os.replace(tmp, path)
+    tmp_pointer = f'{pointer}.{os.getpid()}.tmp'
+    with open(tmp_pointer, 'w', encoding='utf-8') as f:
+        f.write(name + '\n')
+    os.replace(tmp_pointer, pointer)
+    _prune(directory, name)
+    return path, True
+
+
+def _prune(directory, keep_name):
+    """오래된 번들 삭제 (이미 연 워커는 mmap 이 살아 있으므로 지워도 계속 읽을 수 있음)"""
+    old = sorted((p for p in os.listdir(directory) if p.endswith('.bundle') and p != keep_name),
+                 key=lambda p: os.stat(os.path.join(directory, p)).st_mtime_ns, reverse=True)
+    for name in old[KEEP:]:
+        os.remove(os.path.join(directory, name))
+
+
+# ----------------------------------------------------------------------------
+# 로드
+# ----------------------------------------------------------------------------
+
+class Bundle:
+    """mmap 으로 연 번들 (헤더는 파싱해 두고, 본문은 memoryview 로 잘라서 복사 없이 돌려줌)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a serving bundle")
+        (length,) = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[start:start + length])
+        self.path = path
+        self.version = self.header['version']
+        self._data = memoryview(self._mmap)[-(-(start + length) // ALIGN) * ALIGN:]
+
+    def variants(self, spec):
+        variants = {encoding: (self._data[offset:offset + size], etag)
+                    for encoding, (offset, size, etag) in spec.items()}
+        return http_cache.Variants(variants['identity'][1], variants)
+
+    def stores(self, gu, dong):
+        """(JSON 본문 memoryview, 매장 수, Variants) 또는 None"""
+        entry = self.header['stores'].get(json.dumps([gu, dong], ensure_ascii=False))
+        if entry is None:
+            return None
+        cached = self.variants(entry['variants'])
+        return cached.variants['identity'][0], entry['count'], cached
+
+    def static(self, path):
+        entry = self.header['static'].get(_relpath(path))
+        if entry is None:
+            return None
+        st = os.stat(path)
+        if st.st_size != entry['size']:
+            return None
+        if st.st_mtime_ns != entry['mtime_ns']:
+            # git checkout 등으로 mtime 만 바뀐 경우는 내용 해시로 확인
+            with open(path, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() != entry['sha256']:
+                    return None
+        return self.variants(entry['variants'])
+
+
+def _read_pointer(pointer):
+    try:
+        with open(pointer, encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def current():
+    """현재 번들 (없으면 None) - CURRENT 는 CHECK_INTERVAL 마다만 확인"""
+    global _current, _checked_at, _valid
+    now = time.monotonic()
+    if now - _checked_at < CHECK_INTERVAL:
+        return _current[1]
+    with _lock:
+        if now - _checked_at < CHECK_INTERVAL:
+            return _current[1]
+        pointer = os.path.join(BUNDLE_DIR, POINTER)
+        try:
+            st = os.stat(pointer)
+            stat = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            stat = None
+        if stat != _current[0]:
+            bundle = None
+            name = _read_pointer(pointer) if stat else None
+            if name:
+                try:
+                    bundle = Bundle(os.path.join(BUNDLE_DIR, name))
+                except (OSError, ValueError) as e:
+                    print(f"Bundle load failed ({name}): {e}")
+            # 이전 Bundle 은 닫지 않음: 캐시나 진행 중인 응답이 memoryview 를 들고 있을 수 있음 (참조가 없어지면 해제)
+            _current = (stat, bundle)
+            _valid = (None, False)
+        _checked_at = now
+        return _current[1]
+
+
+def stores(gu, dong, generation):
+    """stores 세대 번호가 generation 일 때 쓸 수 있는 매장 스냅샷 (JSON, 매장 수, Variants) 또는 None"""
+    bundle = current()
+    if bundle is None or bundle.header['generation'] != generation:
+        return None
+    global _valid
+    key = (bundle.version, generation, _db_file())
+    cached_key, valid = _valid
+    if cached_key != key:
+        valid = _fingerprint(db_pool.get_conn()) == bundle.header['fingerprint']
+        _valid = (key, valid)
+    return bundle.stores(gu, dong) if valid else None
+
+
+def static(path):
+    """정적 파일의 Variants (번들에 없거나 원본이 바뀌었으면 None)"""
+    bundle = current()
+    return bundle.static(path) if bundle is not None else None
+
+
+# ----------------------------------------------------------------------------
+# 벤치마크
+# ----------------------------------------------------------------------------
+
+_BENCH_CHILD = r"""
+import json, os, sys, time, tracemalloc
+t0 = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+import app
+from werkzeug.test import EnvironBuilder
+startup = time.perf_counter() - t0
+client = app.app.test_client()
+t = time.perf_counter()
+first = client.get('/api/dong-stats', headers={'Accept-Encoding': 'gzip'})
+first_ms = (time.perf_counter() - t) * 1000
+client.get('/api/dong-stats?gu=강남구', headers={'Accept-Encoding': 'gzip'})
+client.get('/static/seoul_map.geojson', headers={'Accept-Encoding': 'gzip'})
+
+def raw(path):
+    # test_client 는 본문을 b''.join 으로 합치므로 WSGI 앱을 직접 불러 서버가 받는 조각 그대로 확인
+    return list(app.app.wsgi_app(EnvironBuilder(path=path).get_environ(), lambda *args: None))
+
+raw('/static/seoul_map.geojson')
+tracemalloc.start()
+chunks = raw('/static/seoul_map.geojson')
+copy_kb = tracemalloc.get_traced_memory()[1] / 1024
+tracemalloc.stop()
+private = shared = 0
+with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+        name, _, value = line.partition(':')
+        if name.startswith('Private_'):
+            private += int(value.split()[0])
+        elif name.startswith('Shared_'):
+            shared += int(value.split()[0])
+print(json.dumps({'startup_ms': startup * 1000, 'first_ms': first_ms, 'status': first.status_code,
+                  'private_kb': private, 'shared_kb': shared, 'copy_kb': copy_kb,
+                  'body_kb': sum(len(c) for c in chunks) / 1024,
+                  'zero_copy': all(isinstance(c, memoryview) for c in chunks)}))
+"""
+
+
+def bench(runs=3):
+    import subprocess
+    import tempfile
+
+    build()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='starmap-nobundle-') as empty:
+        for label, directory in (('no bundle', empty), ('bundle', BUNDLE_DIR)):
+            env = dict(os.environ, STARMAP_BUNDLE_DIR=directory)
+            samples = []
+            for _ in range(runs):
+                out = subprocess.run([sys.executable, '-c', _BENCH_CHILD], cwd=db_pool.BASE_DIR, env=env,
+                                     capture_output=True, text=True, check=True).stdout
+                samples.append(json.loads(out.strip().splitlines()[-1]))
+            results[label] = {k: sorted(s[k] for s in samples)[len(samples) // 2] for k in samples[0]}
+    print(f"{'':<11}{'startup ms':>12}{'first req ms':>14}{'private MB':>12}{'shared MB':>11}{'alloc KB/req':>14}")
+    for label, r in results.items():
+        print(f"{label:<11}{r['startup_ms']:>12.1f}{r['first_ms']:>14.2f}"
+              f"{r['private_kb'] / 1024:>12.1f}{r['shared_kb'] / 1024:>11.1f}{r['copy_kb']:>14.1f}")
+    # 번들에서 응답한 본문은 mmap 의 memoryview 그대로여야 하고, 요청 하나에 본문 크기만큼 할당하면 복사한 것
+    mapped = results['bundle']
+    ok = mapped['zero_copy'] and mapped['copy_kb'] < mapped['body_kb'] / 10
+    print(f"seoul_map.geojson ({mapped['body_kb']:.0f} KB) served from the bundle without copying: "
+          f"{'OK' if ok else 'FAILED'}")
+    return ok
+
+
+if __name__ == '__main__':
+    if '--info' in sys.argv:
+        bundle = current()
+        if bundle is None:
+            print(f"No bundle in {BUNDLE_DIR}")
+            sys.exit(1)
+        h = bundle.header
+        print(f"{bundle.path}: version {h['version']} built {h['created']}, stores generation {h['generation']}, "
+              f"{len(h['stores'])} store snapshots, {len(h['static'])} static files, "
+              f"{os.path.getsize(bundle.path) / 1024:.0f} KB")
+    elif '--bench' in sys.argv:
+        sys.exit(0 if bench() else 1)
+    else:
+        t = time.perf_counter()
+        path, changed = build()
+        print(f"{'Built' if changed else 'Unchanged'} {path} in {(time.perf_counter() - t) * 1000:.0f} ms "
+              f"({os.path.getsize(path) / 1024:.0f} KB)")
@@ -1,132 +1,147 @@
 import pandas as pd
-import sqlite3
 import re
-import hashlib
+import sys
+import time
+
+UNKNOWN = "미분류"
+
+# [Manual Overrides]
+# 사용자 요청에 따른 수동 매핑: (주소에 포함된 문자열, 구, 동) - 위에서부터 먼저 맞는 것 사용
+MANUAL_OVERRIDES = [
+    ('송월길 155', '종로구', '교북동'),       # 독립문역
+    ('한강대로23길 55', '용산구', '한강로동'),
+    ('가로수길 59', '강남구', '신사동'),
+]
+
+# 주소 파싱용 정규식 (모듈 로드 시 한 번만 컴파일)
+PHONE_RE = re.compile(r'1522-3232')
+# '구' 로 끝나는 첫 번째 단어
+GU_RE = re.compile(r'(?:^|(?<=\s))(\S*구)(?=\s|$)')
+# 첫 번째 괄호 안의 내용
+PAREN_RE = re.compile(r'\(([^)]+)\)')
+# 괄호/쉼표를 뺀 단어 중 처음으로
+#  1) '동' 이 (첫 글자가 아닌 곳에) 들어있으면 마지막 '동' 까지  ("월계동104호" -> "월계동")
+#  2) 두 글자 이상이고 '로'/'가' 로 끝나면 그 단어 전체
+TOKEN_DONG_RE = re.compile(r'(?:^|(?<=\s))(?:(\S+동)\S*|(\S+[로가]))(?=\s|$)')
+PUNCT_RE = re.compile(r'[(),]')
+DONG_SUFFIX_RE = re.compile(r'[동로가]$')
+DONG_NUMBER_RE = re.compile(r'[0-9·.]+')
+
+
+def extract_locations(addresses):
+    """주소 Series -> gu, dong 컬럼 DataFrame (pandas .str 벡터 연산)
+
+    "서울특별시 노원구 동일로 1414 (월계동) ..." -> ("노원구", "월계동")
+    """
+    addresses = pd.Series(addresses, dtype=object)
+    missing = addresses.isna()
+    # 주소 문자열 정리 (전화번호 등 제거)
+    addr = addresses.fillna('').astype(str).str.replace(PHONE_RE, '', regex=True)
+
+    # '구' 추출
+    gu = addr.str.extract(GU_RE, expand=False).fillna(UNKNOWN)
+
+    # '동' 추출 - 1. 괄호 안에서 동/로/가 추출 (쉼표로 구분된 경우 첫 번째 것 사용)
+    # (괄호가 있는 주소가 하나도 없으면 extract 결과가 전부 NaN 인 float Series 라서 .str 을 못 씀 -> '' 로 채움)
+    paren = addr.str.extract(PAREN_RE, expand=False).fillna('').str.split(',').str[0].str.strip()
+    dong = paren.where(paren.str.contains(DONG_SUFFIX_RE, na=False))
+
+    # 2. 괄호 안에 없으면 주소 단어에서 찾기
+    need = dong.isna()
+    if need.any():
+        tokens = addr[need].str.replace(PUNCT_RE, '', regex=True).str.extract(TOKEN_DONG_RE)
+        dong[need] = tokens[0].fillna(tokens[1])
+
+    # 동 이름 정제 ("월계1동" -> "월계동")
+    dong = dong.fillna(UNKNOWN).str.replace(DONG_NUMBER_RE, '', regex=True).replace('', UNKNOWN)
+
+    result = pd.DataFrame({'gu': gu, 'dong': dong}, index=addresses.index)
+
+    # 수동 매핑 (앞에 있는 규칙이 우선이므로 뒤에서부터 덮어씀)
+    for keyword, o_gu, o_dong in reversed(MANUAL_OVERRIDES):
+        mask = addr.str.contains(keyword, regex=False)
+        result.loc[mask, ['gu', 'dong']] = (o_gu, o_dong)
+
+    result.loc[missing, ['gu', 'dong']] = (UNKNOWN, UNKNOWN)
+    return result
+
+
+# 골든 파일: 이전 행 단위(extract_location) 구현의 결과를 그대로 저장해 둔 것
+# python db_3.py --check 로 현재 구현이 같은 결과를 내는지 확인
+GOLDEN_FILES = [
+    ('data/star_bucks_store_utf.csv', '주소', 'data/golden/star_bucks_store_utf.csv'),
+    ('data/kor_starbucks_data.csv', 'address', 'data/golden/kor_starbucks_data.csv'),
+]
+
+
+# 골든 파일에 없는 경우: 묶음(ingest 청크)에 괄호 있는 주소가 없을 때 / 한 행 / 빈 입력
+EDGE_CASES = [
+    (['서울특별시 강남구 테헤란로 123'], [('강남구', '테헤란로')]),
+    (['서울특별시 강남구 테헤란로 123', '서울특별시 중구 을지로 30'], [('강남구', '테헤란로'), ('중구', '을지로')]),
+    (['서울특별시 노원구 동일로 1414 (월계동)'], [('노원구', '월계동')]),
+    ([None, ''], [(UNKNOWN, UNKNOWN), (UNKNOWN, UNKNOWN)]),
+    ([], []),
+]
+
+
+def check_golden():
+    ok = True
+    for addresses, expected in EDGE_CASES:
+        try:
+            got = list(extract_locations(addresses).itertuples(index=False, name=None))
+        except Exception as e:
+            got = f"{type(e).__name__}: {e}"
+        if got != expected:
+            print(f"  {addresses!r}: got {got}, expected {expected}")
+            ok = False
+    print(f"edge cases: {len(EDGE_CASES)} inputs, {'OK' if ok else 'FAILED'}")
+    for src, column, golden_path in GOLDEN_FILES:
+        addresses = pd.read_csv(src)[column]
+        golden = pd.read_csv(golden_path, keep_default_na=False)
+
+        start = time.perf_counter()
+        result = extract_locations(addresses)
+        elapsed = time.perf_counter() - start
+
+        diff = (result['gu'] != golden['gu']) | (result['dong'] != golden['dong'])
+        print(f"{src}: {len(result)} rows, {int(diff.sum())} mismatches, {elapsed * 1000:.1f} ms")
+        for idx in diff[diff].index[:10]:
+            print(f"  {addresses[idx]!r}: got {tuple(result.loc[idx])}, "
+                  f"expected {(golden.at[idx, 'gu'], golden.at[idx, 'dong'])}")
+        ok = ok and not diff.any()
+    return ok
+
+
+STORE_COLUMNS = ['store_name', 'store_code', 'gu', 'dong', 'adm_cd', 'lat', 'lng', 'address']
+# 매장명(store_name)을 안정적인 키로 사용, 나머지 컬럼이 바뀌면 update
+# (store_code 는 DB 에서 한 번 발급되면 바뀌지 않음 - migrations.allocate_store_code)
+
+
+def print_changeset(changes, limit=5):
+    print(f"Changeset: +{len(changes['insert'])} inserted, ~{len(changes['update'])} updated, "
+          f"-{len(changes['delete'])} deleted, {changes['unchanged']} unchanged")
+    for label, names in (('+', [r['store_name'] for r in changes['insert']]),
+                         ('~', [r['store_name'] for r in changes['update']]),
+                         ('-', changes['delete'])):
+        for name in names[:limit]:
+            print(f"  {label} {name}")
+        if len(names) > limit:
+            print(f"  {label} ... and {len(names) - limit} more")
+
 
 def init_detailed_db():
+    """star_bucks_store_utf.csv 를 현재 DB 에 증분 반영 (방문 기록은 그대로 유지)
+
+    청크 읽기 / 행정동 폴리곤 배정 / 배치 스테이징은 ingest.py 의 스트리밍 파이프라인이 담당
+    """
+    import ingest  # ingest 가 이 모듈의 파서를 쓰므로 순환 import 를 피해 함수 안에서
+
     print("Initializing database with new data...")
-    # 1. 원본 CSV 로드
-    df = pd.read_csv('data/star_bucks_store_utf.csv')
-    
-    # 컬럼 이름이 '매장명', '주소', '위도', '경도'라고 가정
-    # Renaming for consistency with existing logic
-    df = df.rename(columns={
-        '매장명': 'store_name',
-        '주소': 'address',
-        '위도': 'lat',
-        '경도': 'lng'
-    })
-
-    # 2. 서울특별시 데이터만 추출 (주소에 '서울'이 포함된 경우)
-    seoul_df = df[df['address'].str.contains('서울', na=False)].copy()
-
-    # 3. 주소에서 '구'와 '동'을 추출하는 함수
-    def extract_location(addr):
-        if pd.isna(addr): return "미분류", "미분류"
-        # 주소 문자열 정리 (전화번호 등 제거)
-        addr = re.sub(r'1522-3232', '', addr)
-        
-        # [Manual Overrides]
-        # 사용자 요청에 따른 수동 매핑
-        if '독립문역' in addr or '독립문역' in str(seoul_df.loc[seoul_df['address'] == addr, 'store_name'].values): 
-             # Note: extract_location only sees addr usually, but let's check input logic. 
-             # Simpler to construct a mapping based on address keywords or store name if possible.
-             # Since apply only passes address, relying on unique address substrings or passing row. 
-             pass # Will implement inside the iteration or improve apply to use row.
-        
-        # Better approach: Check specific address patterns for manual override
-        if '송월길 155' in addr: return "종로구", "교북동"
-        if '한강대로23길 55' in addr: return "용산구", "한강로동"
-        if '가로수길 59' in addr: return "강남구", "신사동"
-
-        parts = addr.split()
-        # '구' 추출 (보통 두 번째 단어)
-        gu = "미분류"
-        for part in parts:
-            if part.endswith('구'):
-                gu = part
-                break
-        
-        # '동' 추출 (괄호 안의 동 이름 우선)
-        dong = "미분류"
-        # 1. 괄호 안에서 동/로/가 추출
-        match = re.search(r'\(([^)]+)\)', addr)
-        if match:
-            content = match.group(1)
-            # 쉼표로 구분된 경우 첫 번째 것 사용 (예: "가산동, 우림...")
-            content = content.split(',')[0].strip()
-            if content.endswith('동') or content.endswith('로') or content.endswith('가'):
-                dong = content
-        
-        # 2. 괄호 안에 없으면 주소 파트에서 찾기
-        if dong == "미분류":
-            for part in parts:
-                # 쉼표, 괄호 등 제거 후 확인
-                clean_part = re.sub(r'[(),]', '', part)
-                # "월계동(104호)" -> "월계동" 추출
-                match_dong = re.match(r'(.+동)', clean_part)
-                if match_dong:
-                    candidate = match_dong.group(1)
-                    if not candidate.endswith('구') and not candidate.endswith('시') and not candidate.isdigit():
-                        dong = candidate
-                        break
-
-                if (clean_part.endswith('동') or clean_part.endswith('로') or clean_part.endswith('가')) and \
-                   not clean_part.endswith('구') and not clean_part.endswith('시') and not clean_part.isdigit() and \
-                   len(clean_part) > 1: # "1로" 같은거 제외
-                    dong = clean_part
-                    break
-        
-        # 동 이름 정제 ("월계1동" -> "월계동")
-        dong = re.sub(r'[0-9·.]+', '', dong)
-        
-        if dong == "": dong = "미분류"
-        
-        return gu, dong
-
-    # 구, 동 컬럼 생성
-    locations = seoul_df['address'].apply(extract_location)
-    seoul_df['gu'] = locations.apply(lambda x: x[0])
-    seoul_df['dong'] = locations.apply(lambda x: x[1])
-
-    # Store Code 생성 (매장명 기반 해시)
-    def generate_code(name):
-        return int(hashlib.md5(name.encode('utf-8')).hexdigest(), 16) % 1000000
-
-    seoul_df['store_code'] = seoul_df['store_name'].apply(generate_code)
-
-    # 4. SQLite DB 연결 및 테이블 생성
-    conn = sqlite3.connect('starbucks.db')
-    
-    # [stores 테이블]
-    stores_df = seoul_df[['store_name', 'store_code', 'gu', 'dong', 'lat', 'lng', 'address']]
-    
-    
-    # 기존 방문 기록 백업 시도
-    visited_map = {}
-    try:
-        cur = conn.execute("SELECT store_name, visited FROM stores")
-        for row in cur.fetchall():
-            visited_map[row[0]] = row[1]
-    except:
-        print("No existing visited data found.")
-
-    stores_df.to_sql('stores', conn, if_exists='replace', index=False)
-    
-    # 복원 및 컬럼 추가
-    conn.execute("ALTER TABLE stores ADD COLUMN visited INTEGER DEFAULT 0")
-    
-    # 방문 기록 복원
-    if visited_map:
-        print(f"Restoring visited status for {len(visited_map)} stores...")
-        for index, row in stores_df.iterrows():
-            if row['store_name'] in visited_map:
-                conn.execute("UPDATE stores SET visited = ? WHERE store_name = ?", 
-                             (visited_map[row['store_name']], row['store_name']))
-    
-    conn.commit()
-    conn.close()
+    changes = ingest.run(['data/star_bucks_store_utf.csv'])
     print("Database updated successfully with star_bucks_store_utf.csv")
+    return changes
 
 if __name__ == '__main__':
+    if '--check' in sys.argv:
+        sys.exit(0 if check_golden() else 1)
     init_detailed_db()
@@ -1,87 +1,160 @@
 import json
-import sqlite3
 import time
-from shapely.geometry import shape, Point
+
+import shapely
+from shapely import STRtree
+from shapely.geometry import shape
+
+import admin_codes
+import db_pool
+import geo_cache
+import migrations
+import store_stats
+
+# 폴리곤 밖에 찍힌 매장(경계선 근처 좌표 오차)을 가장 가까운 동에 붙여주는 최대 거리
+# (위경도 단위, 서울 위도에서 0.002도 ≈ 180~220m)
+NEAREST_MAX_DISTANCE = 0.002
+
+
+def parse_gu(addr):
+    # "서울특별시 노원구 ..." -> "노원구" (두 번째 단어가 '구' 로 끝날 때만)
+    parts = addr.split() if addr else []
+    return parts[1] if len(parts) > 1 and parts[1].endswith('구') else None
+
+
+class DongIndex:
+    """행정동 폴리곤 STRtree 인덱스 (한 번 만들어서 여러 매장을 한꺼번에 배정)"""
+
+    def __init__(self, features, polygons):
+        # features: geo_cache.normalize() 속성 (adm_cd, gu, dong ...), polygons: shapely geometry 목록
+        self.features = list(features)
+        self.names = [f['adm_nm'] for f in self.features]  # "서울특별시 노원구 월계1동"
+        self.polygons = list(polygons)
+        shapely.prepare(self.polygons)
+        self.tree = STRtree(self.polygons)
+
+    @classmethod
+    def load(cls):
+        # geo_cache: 원본 GeoJSON 이 바뀌었을 때만 다시 파싱하고 평소에는 캐시 파일에서 바로 읽음
+        layer = geo_cache.load('dong')
+        return cls(layer.features, layer.geoms)
+
+    @classmethod
+    def from_geojson(cls, path='static/seoul_map.geojson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            geojson = json.load(f)
+        features = [geo_cache.normalize('dong', feature['properties']) for feature in geojson['features']]
+        polygons = [shape(feature['geometry']) for feature in geojson['features']]
+        return cls(features, polygons)
+
+    def _gu_ok(self, poly_idx, gu):
+        # 주소에서 구를 알 수 있으면 같은 구의 폴리곤만 인정
+        return gu is None or gu == self.features[poly_idx]['gu']
+
+    def assign(self, lngs, lats, gus):
+        """매장 좌표 배열 -> (폴리곤 index 또는 None 목록, 'contains'/'nearest'/None 목록)
+
+        1) 포함 검사: STRtree 로 후보를 뽑고 prepared geometry 로 한 번에 판정
+        2) 실패한 매장만 NEAREST_MAX_DISTANCE 안에서 가장 가까운 (같은 구) 폴리곤으로 대체
+        """
+        n = len(lngs)
+        matched = [None] * n
+        methods = [None] * n
+        points = shapely.points(lngs, lats)  # shapely 는 (x, y) = (lng, lat)
+
+        # predicate='within': 점이 폴리곤 안에 있는 (점, 폴리곤) 쌍
+        # 원래 GeoJSON 순서에서 처음 맞는 폴리곤을 쓰도록 폴리곤 index 가 작은 것 우선
+        point_idx, poly_idx = self.tree.query(points, predicate='within')
+        for p, g in zip(point_idx.tolist(), poly_idx.tolist()):
+            if self._gu_ok(g, gus[p]) and (matched[p] is None or g < matched[p]):
+                matched[p] = g
+                methods[p] = 'contains'
+
+        missing = [i for i in range(n) if matched[i] is None]
+        if missing:
+            point_idx, poly_idx = self.tree.query(points[missing], predicate='dwithin',
+                                                  distance=NEAREST_MAX_DISTANCE)
+            if len(point_idx):
+                distances = shapely.distance(points[missing][point_idx], self.tree.geometries[poly_idx])
+                best = {}
+                for p, g, d in zip(point_idx.tolist(), poly_idx.tolist(), distances.tolist()):
+                    i = missing[p]
+                    if self._gu_ok(g, gus[i]) and (i not in best or d < best[i][1]):
+                        best[i] = (g, d)
+                for i, (g, _) in best.items():
+                    matched[i] = g
+                    methods[i] = 'nearest'
+
+        return matched, methods
+
+    def dong_name(self, poly_idx):
+        # adm_nm 마지막 단어 = 행정동 이름 ("월계1동")
+        return self.features[poly_idx]['dong']
+
 
 def update_db_with_granular_dongs():
-    print("Loading GeoJSON...")
-    with open('static/seoul_map.geojson', 'r', encoding='utf-8') as f:
-        geojson = json.load(f)
-    
-    # Prepare polygons
-    dong_polygons = []
-    for feature in geojson['features']:
-        # adm_nm: "종로구 사직동", "노원구 월계1동"
-        full_name = feature['properties']['adm_nm'] 
-        geom = shape(feature['geometry'])
-        dong_polygons.append((full_name, geom))
-    
-    print(f"Loaded {len(dong_polygons)} dong polygons.")
+    timings = {}
+    t0 = time.perf_counter()
+
+    print("Loading dong polygons...")
+    index = DongIndex.load()
+    timings['load + index'] = time.perf_counter() - t0
+    print(f"Loaded {len(index.names)} dong polygons.")
 
     print("Connecting to DB...")
-    conn = sqlite3.connect('starbucks.db')
-    cur = conn.execute("SELECT store_name, lat, lng, address FROM stores")
-    stores = cur.fetchall()
-    
-    updated_count = 0
-    unknown_count = 0
-    
+    t = time.perf_counter()
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    stores = [row for row in conn.execute("SELECT id, lat, lng, address, store_name FROM stores")
+              if row[1] and row[2]]
+    timings['read stores'] = time.perf_counter() - t
+
     print(f"Processing {len(stores)} stores...")
-    
-    updates = []
-    
-    for store in stores:
-        name, lat, lng, addr = store
-        if not lat or not lng:
-            continue
-            
-        point = Point(lng, lat) # shapely uses (x, y) = (lng, lat)
-        
-        matched_dong = None
-        
-        # Checking polygons
-        # Optimization: Filter by Gu first if possible, but parsing adm_nm is fast enough for 400 polygons
-        current_gu = addr.split()[1] if len(addr.split()) > 1 and addr.split()[1].endswith('구') else None
-        
-        found = False
-        for dong_full_name, polygon in dong_polygons:
-            # dong_full_name ex: "서울특별시 노원구 월계1동" OR "상계1동" depending on geojson
-            # Let's check the geojson format. Assuming "Gu Dong" format based on previous knowledge or standard.
-            # We will filter polygons that contain the Gu name to speed up (optional but safer)
-            
-            if current_gu and current_gu not in dong_full_name:
-                continue
-                
-            if polygon.contains(point):
-                # Extract just the dong part. 
-                # adm_nm usually "서울특별시 노원구 월계1동"
-                parts = dong_full_name.split()
-                real_dong = parts[-1] # "월계1동"
-                
-                matched_dong = real_dong
-                found = True
-                break
-        
-        if found:
-            updates.append((matched_dong, name))
-            updated_count += 1
-        else:
-            # Fallback: keep existing logic or mark as unknown. 
-            # If point is slightly outside due to errors, we might want to keep original.
-            # But the goal is to be granular.
-            # Let's see if we can perform a "nearest" check for edge cases? 
-            # For now, let's look at the result.
-            unknown_count += 1
-            # print(f"Unmatched: {name} ({lat}, {lng}) {addr}")
-
-    print(f"Updating DB: {updated_count} matched, {unknown_count} unmatched.")
-    
+    t = time.perf_counter()
+    ids = [row[0] for row in stores]
+    lats = [row[1] for row in stores]
+    lngs = [row[2] for row in stores]
+    gus = [parse_gu(row[3]) for row in stores]
+    matched, methods = index.assign(lngs, lats, gus)
+    timings['assign'] = time.perf_counter() - t
+
+    # 구 / 동 이름과 행정동 코드는 폴리곤의 코드 표 값 그대로 (admin_codes.py)
+    updates = [(index.features[g]['gu'], index.features[g]['dong'], index.features[g]['adm_cd'], store_id)
+               for store_id, g in zip(ids, matched) if g is not None]
+    nearest_count = methods.count('nearest')
+    unknown = [row[4] for row, g in zip(stores, matched) if g is None]
+
+    print(f"Updating DB: {len(updates)} matched ({nearest_count} by nearest polygon), "
+          f"{len(unknown)} unmatched.")
+    for name in unknown[:10]:
+        print(f"  Unmatched: {name}")
+
+    t = time.perf_counter()
     if updates:
-        conn.executemany("UPDATE stores SET dong = ? WHERE store_name = ?", updates)
-        conn.commit()
+        # 한 트랜잭션 안에서 한 번에 반영 (구/동 집계는 끝나고 한 번에 다시 계산)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            admin_codes.sync(conn)
+            with store_stats.bulk_maintenance(conn):
+                conn.executemany("UPDATE stores SET gu = ?, dong = ?, adm_cd = ? WHERE id = ?", updates)
+            db_pool.bump_generation(conn, 'stores')
+            db_pool.bump_generation(conn, 'store_locations')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         print("DB Updated.")
-    
     conn.close()
+    timings['write'] = time.perf_counter() - t
+    timings['total'] = time.perf_counter() - t0
+
+    print("Timing report:")
+    for step, seconds in timings.items():
+        print(f"  {step:<14}{seconds * 1000:>9.1f} ms")
+    if stores:
+        print(f"  {'throughput':<14}{len(stores) / timings['assign']:>9.0f} stores/s (assign)")
+    return timings
+
 
 if __name__ == "__main__":
     update_db_with_granular_dongs()
@@ -0,0 +1,177 @@
+"""
+SQLite 연결 관리 모듈 (Flask app.py / FastAPI backend 공용)
+
+요청마다 sqlite3.connect() -> PRAGMA -> close() 를 반복하지 않도록
+스레드(워커)별로 연결을 하나씩 만들어 재사용한다.
+
+- 읽기 전용 연결: file:...?mode=ro URI 로 열어서 GET 라우트에서 사용
+- 쓰기 연결: WAL 모드 + synchronous=NORMAL, 쓰기 후에만 commit
+- 두 연결 모두 mmap_size 와 statement cache 를 크게 잡아 prepared statement 재사용
+- execute / fetch 시간은 metrics.py 로 보내서 요청별 쿼리 수 / 시간으로 집계
+"""
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+import metrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 서버를 어느 디렉토리에서 실행하든 같은 DB 파일을 보도록 절대 경로로 고정
+# (STARMAP_DB 환경변수로 다른 DB 파일을 지정할 수 있음)
+DB_PATH = os.path.abspath(os.environ.get('STARMAP_DB') or os.path.join(BASE_DIR, 'starbucks.db'))
+
+MMAP_SIZE = 256 * 1024 * 1024   # 256MB (DB 파일보다 크게 잡으면 전체가 mmap 됨)
+CACHED_STATEMENTS = 256         # 연결당 prepared statement 캐시 크기
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+
+# 이 프로세스 안에서 bump_generation() 이 호출된 횟수
+# (캐시가 다른 프로세스의 변경 확인 주기를 기다리지 않고 바로 무효화하는 데 사용)
+local_generation = 0
+
+
+class Cursor(sqlite3.Cursor):
+    """fetchall / fetchmany / fetchone 시간을 metrics 에 더하는 커서 (for 문으로 도는 행은 재지 않음)"""
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            metrics.record_query(time.perf_counter() - start, 0)
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            metrics.record_query(time.perf_counter() - start, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            metrics.record_query(time.perf_counter() - start, 0)
+
+
+class Connection(sqlite3.Connection):
+    """execute / executemany 한 번을 쿼리 하나로 metrics 에 기록하는 연결"""
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute 는 기본 커서를 만들므로 같은 동작을 Cursor 로 직접
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return self.cursor().execute(sql, parameters)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return self.cursor().executemany(sql, parameters)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+
+def _apply_pragmas(conn, readonly):
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        # journal_mode=WAL 은 DB 파일에 영구 기록되므로 한 번만 바뀌면 이후 연결은 그대로 WAL
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+
+def connect(readonly=False, path=None):
+    """새 연결을 만들어 반환 (스크립트/배치 작업용, 호출한 쪽에서 close 해야 함)"""
+    path = path or DB_PATH
+    if readonly:
+        uri = f"file:{pathname2url(path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS, factory=Connection)
+    else:
+        conn = sqlite3.connect(path, cached_statements=CACHED_STATEMENTS, factory=Connection)
+    conn.row_factory = sqlite3.Row
+    _apply_pragmas(conn, readonly)
+    return conn
+
+
+def get_conn(readonly=True):
+    """현재 스레드 전용 풀링 연결을 반환 (close 하지 말 것)
+
+    gunicorn 처럼 fork 하는 서버에서 부모 프로세스의 연결을 물려받지 않도록
+    pid 가 바뀌면 새로 연결한다.
+    """
+    key = 'ro' if readonly else 'rw'
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        _local.pid = pid
+        _local.conns = {}
+    conn = _local.conns.get(key)
+    if conn is None:
+        conn = connect(readonly=readonly)
+        _local.conns[key] = conn
+    return conn
+
+
+def close_thread_conns():
+    """현재 스레드의 풀링 연결을 모두 닫음 (테스트/종료 시 사용)"""
+    for conn in getattr(_local, 'conns', {}).values():
+        conn.close()
+    _local.conns = {}
+
+
+def query(sql, args=(), one=False):
+    """읽기 전용 연결로 SELECT 실행 (commit 하지 않음)"""
+    rv = get_conn(readonly=True).execute(sql, args).fetchall()
+    return (rv[0] if rv else None) if one else rv
+
+
+def execute(sql, args=(), generation=None):
+    """쓰기 연결로 INSERT/UPDATE/DELETE 실행 후 commit, 영향받은 row 수 반환
+
+    generation 에 데이터 이름('stores' 등)을 주면 같은 트랜잭션 안에서 세대 번호를 올린다.
+    """
+    conn = get_conn(readonly=False)
+    with conn:
+        cur = conn.execute(sql, args)
+        if generation and cur.rowcount:
+            bump_generation(conn, generation)
+    return cur.rowcount
+
+
+def bump_generation(conn, name='stores'):
+    """쓰기 트랜잭션 안에서 호출: name 데이터의 세대 번호를 1 올림 (캐시 무효화 신호)
+
+    ingest 스크립트처럼 다른 프로세스에서 쓰더라도 DB 에 기록되므로
+    서버 쪽 캐시가 read_generation() 으로 변경을 감지할 수 있다.
+
+    - 'stores': stores 의 어떤 값이든 바뀌면 (방문 여부 포함) - store_cache
+    - 'store_locations': 매장 추가/삭제, 이름/좌표/구·동이 바뀔 때만 (ingest, db_granular, admin_codes) - vector_tiles
+    """
+    global local_generation
+    conn.execute("CREATE TABLE IF NOT EXISTS data_generation (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("""
+        INSERT INTO data_generation (name, value) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET value = value + 1
+    """, (name,))
+    local_generation += 1
+
+
+def read_generation(name='stores'):
+    """name 데이터의 현재 세대 번호 (한 번도 쓰인 적 없으면 0)"""
+    try:
+        row = query("SELECT value FROM data_generation WHERE name = ?", (name,), one=True)
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
@@ -0,0 +1,50 @@
+"""
+geo_build.py 결과물(static/geo/manifest.json) 에서 요청 줌에 맞는 지도 파일을 고른다.
+빌드 결과가 없으면 원본 GeoJSON 으로 대체한다. (Flask app.py / FastAPI backend 공용)
+"""
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GEO_DIR = os.path.join(BASE_DIR, 'static', 'geo')
+MANIFEST_PATH = os.path.join(GEO_DIR, 'manifest.json')
+
+FALLBACK = {
+    'dong': os.path.join(BASE_DIR, 'static', 'seoul_map.geojson'),
+    'gu': os.path.join(BASE_DIR, 'static', 'seoul_gu_map.geojson'),
+}
+MEDIA_TYPES = {'geojson': 'application/geo+json', 'topojson': 'application/json'}
+
+_manifest = (None, None)  # (mtime, manifest)
+
+
+def load_manifest():
+    global _manifest
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest[0] != mtime:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            _manifest = (mtime, json.load(f))
+    return _manifest[1]
+
+
+def resolve(layer, zoom=None, fmt='geojson'):
+    """(파일 경로, media type) 반환, 없는 layer/format 이면 None
+
+    zoom 이 없으면 가장 상세한 레벨, 있으면 min_zoom <= zoom 인 레벨 중 가장 상세한 것
+    """
+    if layer not in FALLBACK or fmt not in MEDIA_TYPES:
+        return None
+    manifest = load_manifest()
+    levels = sorted((manifest or {}).get('layers', {}).get(layer, []), key=lambda lv: lv['min_zoom'])
+    if not levels:
+        # 빌드 전에는 원본만 있으므로 GeoJSON 요청만 처리
+        return (FALLBACK[layer], MEDIA_TYPES['geojson']) if fmt == 'geojson' else None
+
+    chosen = levels[-1]
+    if zoom is not None:
+        candidates = [lv for lv in levels if lv['min_zoom'] <= zoom]
+        chosen = candidates[-1] if candidates else levels[0]
+    return os.path.join(GEO_DIR, chosen[fmt]), MEDIA_TYPES[fmt]
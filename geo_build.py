@@ -0,0 +1,260 @@
+"""
+지도 GeoJSON 경량화 빌드 (오프라인 실행: python geo_build.py)
+
+static/seoul_map.geojson (행정동), static/seoul_gu_map.geojson (구) 를
+줌 레벨별 허용 오차로 단순화하고 좌표를 정수 격자로 양자화해서
+static/geo/ 아래에 레벨별 TopoJSON + 양자화된 GeoJSON 과 manifest.json 을 만든다.
+
+- 단순화: shapely.coverage_simplify 로 이웃 폴리곤이 공유하는 경계를 함께 단순화 (틈/겹침 없음)
+- TopoJSON: 공유 경계를 arc 하나로 저장하고 좌표는 정수 delta 로 인코딩
+- 서버는 geo_assets.py 로 manifest 를 읽어 요청 줌에 맞는 레벨을 골라 응답
+
+python geo_build.py --bench : 원본 대비 용량(원본/gzip) 과 JSON 파싱 시간 비교
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+import shapely
+from shapely.geometry import shape, mapping
+
+from db_pool import BASE_DIR
+
+# 어느 디렉터리에서 실행해도 서버(geo_assets)가 읽는 곳에 씀 (LAYERS / manifest 의 원본 경로는 BASE_DIR 기준)
+OUT_DIR = os.path.join(BASE_DIR, 'static', 'geo')
+
+LAYERS = {
+    # layer 이름: (원본 파일, 유지할 properties)
+    'dong': ('static/seoul_map.geojson', ['adm_nm', 'adm_cd', 'adm_cd2', 'sgg', 'sido', 'sidonm', 'sggnm']),
+    'gu': ('static/seoul_gu_map.geojson', ['code', 'name', 'name_eng', 'base_year']),
+}
+
+# min_zoom 이상에서 사용할 레벨
+# tolerance: 단순화 허용 오차 (도 단위, 해당 줌에서 약 1픽셀 = 360 / (256 * 2^z))
+# quantization: 격자 크기 (bbox 를 q x q 정수 격자로), decimals: GeoJSON 출력 소수점 자리수
+LEVELS = [
+    {'min_zoom': 0, 'tolerance': 360 / (256 * 2 ** 10), 'quantization': 10000, 'decimals': 4},
+    {'min_zoom': 12, 'tolerance': 360 / (256 * 2 ** 12), 'quantization': 100000, 'decimals': 5},
+    {'min_zoom': 14, 'tolerance': 360 / (256 * 2 ** 14), 'quantization': 100000, 'decimals': 6},
+]
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _polygons(geom):
+    return list(geom.geoms) if geom.geom_type == 'MultiPolygon' else [geom]
+
+
+def _quantize_ring(coords, translate, scale):
+    ring = []
+    for x, y in coords:
+        p = (round((x - translate[0]) / scale[0]), round((y - translate[1]) / scale[1]))
+        if not ring or ring[-1] != p:
+            ring.append(p)
+    if ring[0] != ring[-1]:
+        ring.append(ring[0])
+    # 양자화로 면적이 사라진 링은 버림
+    return ring if len(ring) >= 4 else None
+
+
+def _quantize(geoms, bbox, q):
+    """geometry 목록 -> [[polygon rings ...] ...] (정수 좌표), transform"""
+    x0, y0, x1, y1 = bbox
+    scale = ((x1 - x0) / (q - 1) or 1, (y1 - y0) / (q - 1) or 1)
+    translate = (x0, y0)
+    quantized = []
+    for geom in geoms:
+        polygons = []
+        for poly in _polygons(geom):
+            exterior = _quantize_ring(poly.exterior.coords, translate, scale)
+            if exterior is None:
+                continue
+            holes = [_quantize_ring(r.coords, translate, scale) for r in poly.interiors]
+            polygons.append([exterior] + [h for h in holes if h])
+        quantized.append(polygons)
+    return quantized, {'scale': list(scale), 'translate': list(translate)}
+
+
+def _find_junctions(rings):
+    """인접 점이 2개가 아닌 점(경계가 갈라지거나 합쳐지는 점) = arc 를 자를 위치"""
+    neighbors = {}
+    for ring in rings:
+        n = len(ring) - 1
+        for i in range(n):
+            p = ring[i]
+            s = neighbors.setdefault(p, set())
+            s.add(ring[i - 1] if i else ring[n - 1])
+            s.add(ring[i + 1])
+    return {p for p, s in neighbors.items() if len(s) != 2}
+
+
+def _split_ring(ring, junctions):
+    points = ring[:-1]
+    cuts = [i for i, p in enumerate(points) if p in junctions]
+    if not cuts:
+        # 공유 경계가 없는 섬/완전히 겹치는 링: 최소 점에서 시작하도록 회전해서 같은 링끼리 arc 공유
+        start = points.index(min(points))
+        rotated = points[start:] + points[:start]
+        return [rotated + [rotated[0]]]
+    rotated = points[cuts[0]:] + points[:cuts[0]]
+    offsets = [c - cuts[0] for c in cuts] + [len(points)]
+    rotated.append(rotated[0])
+    return [rotated[offsets[k]:offsets[k + 1] + 1] for k in range(len(offsets) - 1)]
+
+
+def to_topology(layer, geoms, properties, bbox, q):
+    """양자화 + arc 공유 TopoJSON dict 생성"""
+    quantized, transform = _quantize(geoms, bbox, q)
+    junctions = _find_junctions([ring for polys in quantized for poly in polys for ring in poly])
+
+    arcs = []
+    arc_index = {}
+
+    def arc_id(arc):
+        key = tuple(arc)
+        if key in arc_index:
+            return arc_index[key]
+        rkey = key[::-1]
+        if rkey in arc_index:
+            return ~arc_index[rkey]
+        arc_index[key] = len(arcs)
+        # delta 인코딩 (첫 점은 절대 좌표)
+        encoded = [list(arc[0])]
+        for (ax, ay), (bx, by) in zip(arc, arc[1:]):
+            encoded.append([bx - ax, by - ay])
+        arcs.append(encoded)
+        return arc_index[key]
+
+    geometries = []
+    for polys, props in zip(quantized, properties):
+        encoded = [[[arc_id(a) for a in _split_ring(ring, junctions)] for ring in poly] for poly in polys]
+        if len(encoded) == 1:
+            geometries.append({'type': 'Polygon', 'arcs': encoded[0], 'properties': props})
+        else:
+            geometries.append({'type': 'MultiPolygon', 'arcs': encoded, 'properties': props})
+
+    return {
+        'type': 'Topology',
+        'bbox': list(bbox),
+        'transform': transform,
+        'objects': {layer: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': arcs,
+    }
+
+
+def topology_to_geojson(topology, layer, decimals):
+    """TopoJSON -> GeoJSON FeatureCollection (Leaflet 이 바로 읽을 수 있는 형태)"""
+    (sx, sy), (tx, ty) = topology['transform']['scale'], topology['transform']['translate']
+    decoded = []
+    for arc in topology['arcs']:
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x += dx
+            y += dy
+            points.append([round(x * sx + tx, decimals), round(y * sy + ty, decimals)])
+        decoded.append(points)
+
+    def ring(arc_ids):
+        coords = []
+        for i in arc_ids:
+            points = decoded[i] if i >= 0 else decoded[~i][::-1]
+            coords.extend(points if not coords else points[1:])
+        return coords
+
+    features = []
+    for g in topology['objects'][layer]['geometries']:
+        if g['type'] == 'Polygon':
+            coords = [ring(r) for r in g['arcs']]
+        else:
+            coords = [[ring(r) for r in poly] for poly in g['arcs']]
+        features.append({'type': 'Feature', 'properties': g['properties'],
+                          'geometry': {'type': g['type'], 'coordinates': coords}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _dump(obj, path):
+    body = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(body)
+    return len(body)
+
+
+def build():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    manifest = {'source': {}, 'layers': {}}
+
+    for layer, (src, keep) in LAYERS.items():
+        print(f"[{layer}] Loading {src}...")
+        with open(os.path.join(BASE_DIR, src), 'r', encoding='utf-8') as f:
+            features = json.load(f)['features']
+        geoms = [shape(f['geometry']) for f in features]
+        properties = [{k: f['properties'][k] for k in keep if k in f['properties']} for f in features]
+        bbox = tuple(shapely.total_bounds(geoms))
+        manifest['source'][layer] = {'path': src, 'sha256': _file_hash(os.path.join(BASE_DIR, src))}
+
+        levels = []
+        for level in LEVELS:
+            z = level['min_zoom']
+            simplified = shapely.coverage_simplify(geoms, level['tolerance'])
+            topology = to_topology(layer, simplified, properties, bbox, level['quantization'])
+            geojson = topology_to_geojson(topology, layer, level['decimals'])
+
+            topo_name = f'{layer}.z{z}.topo.json'
+            geo_name = f'{layer}.z{z}.geojson'
+            topo_bytes = _dump(topology, os.path.join(OUT_DIR, topo_name))
+            geo_bytes = _dump(geojson, os.path.join(OUT_DIR, geo_name))
+            levels.append({
+                'min_zoom': z,
+                'tolerance': level['tolerance'],
+                'quantization': level['quantization'],
+                'topojson': topo_name,
+                'geojson': geo_name,
+                'topojson_bytes': topo_bytes,
+                'geojson_bytes': geo_bytes,
+            })
+            print(f"  z{z:>2}: {shapely.get_num_coordinates(simplified).sum():>6} coords, "
+                  f"topojson {topo_bytes / 1024:.0f} KB, geojson {geo_bytes / 1024:.0f} KB")
+        manifest['layers'][layer] = levels
+
+    with open(os.path.join(OUT_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {OUT_DIR}/manifest.json")
+    return manifest
+
+
+def bench(repeat=20):
+    """원본 vs 빌드 결과: 용량(원본/gzip)과 json.loads 파싱 시간"""
+    with open(os.path.join(OUT_DIR, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    def measure(path):
+        with open(path, 'rb') as f:
+            body = f.read()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            json.loads(body)
+        parse_ms = (time.perf_counter() - start) / repeat * 1000
+        return len(body), len(gzip.compress(body, 9)), parse_ms
+
+    print(f"{'file':<28}{'bytes':>10}{'gzip':>10}{'parse ms':>10}")
+    for layer, levels in manifest['layers'].items():
+        rows = [os.path.join(BASE_DIR, manifest['source'][layer]['path'])]
+        for level in levels:
+            rows += [os.path.join(OUT_DIR, level['geojson']), os.path.join(OUT_DIR, level['topojson'])]
+        for path in rows:
+            size, gz, parse_ms = measure(path)
+            print(f"{os.path.basename(path):<28}{size:>10}{gz:>10}{parse_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        bench()
+    else:
+        build()
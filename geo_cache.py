@@ -0,0 +1,203 @@
+"""
+행정동 / 구 폴리곤 캐시 (GeoJSON 을 매번 json.load + shape() 하지 않도록)
+
+static/seoul_map.geojson (930KB) 을 읽을 때마다 JSON 파싱과 shapely geometry 생성을 다시 하던 것을
+한 번 만든 바이너리 파일에서 바로 읽는다.
+
+- 파일 하나 = layer 하나 (geo_cache/dong.bin, geo_cache/gu.bin)
+  [MAGIC][헤더 길이 uint32][헤더 JSON][8바이트 정렬된 numpy 배열들]
+- 헤더: 원본 sha256 / 크기 / mtime, 정규화된 속성 (gu, dong 이름과 코드), 배열 위치
+- 배열: 좌표 (N x 2 float64) + ragged offset (shapely.from_ragged_array 형식), feature 별 bbox
+- mmap 으로 열어서 np.frombuffer 로 복사 없이 배열을 얻고 from_ragged_array 로 geometry 를 만듦
+- 원본이 바뀌면 (크기/mtime 이 다르고 sha256 도 다르면) 자동으로 다시 빌드
+
+python geo_cache.py         : 캐시 빌드 (바뀐 layer 만)
+python geo_cache.py --bench : GeoJSON 파싱 vs 캐시 로드 시간 비교
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import shapely
+
+import db_pool
+
+SOURCES = {
+    'dong': os.path.join(db_pool.BASE_DIR, 'static', 'seoul_map.geojson'),
+    'gu': os.path.join(db_pool.BASE_DIR, 'static', 'seoul_gu_map.geojson'),
+}
+CACHE_DIR = os.path.abspath(os.environ.get('STARMAP_GEO_CACHE') or os.path.join(db_pool.BASE_DIR, 'geo_cache'))
+
+MAGIC = b'STARMAP-GEO\x02'  # 형식(헤더 속성 포함)이 바뀌면 번호를 올려서 기존 캐시를 다시 빌드
+ALIGN = 8
+
+# geoms: shapely geometry 배열, bounds: (n, 4) [minx, miny, maxx, maxy], features: 정규화된 속성 dict 목록
+# sha256: 원본 GeoJSON 해시 (타일 캐시 등 다른 캐시의 버전 키로 사용)
+Layer = namedtuple('Layer', ['geoms', 'bounds', 'features', 'sha256'])
+
+_layers = {}  # layer -> ((크기, mtime), Layer)
+_lock = threading.Lock()
+
+
+def normalize(layer, props):
+    """GeoJSON properties -> 공통 속성 (코드는 정수, 이름은 마지막 단어)"""
+    if layer == 'gu':
+        return {'code': int(props['code']), 'name': props['name']}
+    # adm_nm "서울특별시 종로구 사직동" 의 마지막 단어 = 동 이름
+    return {'adm_cd': int(props['adm_cd']), 'adm_cd2': int(props['adm_cd2']), 'adm_nm': props['adm_nm'],
+            'gu_code': int(props['sgg']), 'gu': props['sggnm'], 'dong': props['adm_nm'].split()[-1]}
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_path(layer):
+    return os.path.join(CACHE_DIR, f'{layer}.bin')
+
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+# ----------------------------------------------------------------------------
+# 빌드
+# ----------------------------------------------------------------------------
+
+def build(layer):
+    """원본 GeoJSON 을 파싱해서 캐시 파일을 (원자적으로) 다시 씀"""
+    source = SOURCES[layer]
+    with open(source, 'rb') as f:
+        raw = f.read()
+    features = json.loads(raw)['features']
+    geoms = shapely.from_geojson([json.dumps(f['geometry']) for f in features])
+    if len(set(shapely.get_type_id(geoms).tolist())) > 1:
+        # from_ragged_array 는 한 가지 타입만 받으므로 섞여 있으면 MultiPolygon 으로 통일
+        geoms = np.array([g if g.geom_type == 'MultiPolygon' else shapely.MultiPolygon([g]) for g in geoms])
+    geometry_type, coords, offsets = shapely.to_ragged_array(geoms)
+
+    arrays = {'coords': coords, 'bounds': shapely.bounds(geoms)}
+    arrays.update({f'offsets{i}': offset for i, offset in enumerate(offsets)})
+
+    size, mtime = _stat(source)
+    header = {
+        'layer': layer,
+        'source_sha256': hashlib.sha256(raw).hexdigest(),
+        'source_size': size,
+        'source_mtime_ns': mtime,
+        'geometry_type': int(geometry_type),
+        'offsets': len(offsets),
+        'features': [normalize(layer, f['properties']) for f in features],
+        'arrays': {},
+    }
+    # 헤더 길이가 배열 위치에 따라 달라지지 않도록 배열 위치는 데이터 영역 시작 기준으로 기록
+    position = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header['arrays'][name] = [position, array.dtype.str, list(array.shape)]
+        position += -(-array.nbytes // ALIGN) * ALIGN
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(layer)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        prefix = MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+        f.write(prefix + b'\0' * (-len(prefix) % ALIGN))
+        for array in arrays.values():
+            data = array.tobytes()
+            f.write(data + b'\0' * (-len(data) % ALIGN))
+    os.replace(tmp, path)  # 다른 프로세스가 읽는 중이어도 반쯤 쓴 파일이 보이지 않음
+    return header
+
+
+# ----------------------------------------------------------------------------
+# 로드
+# ----------------------------------------------------------------------------
+
+def _read(path):
+    """캐시 파일 -> (헤더, {배열 이름: mmap 위의 numpy 배열}), 형식이 다르면 None"""
+    try:
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # 파일이 없거나 비어 있음
+        return None
+    if buf[:len(MAGIC)] != MAGIC:
+        return None
+    (length,) = struct.unpack_from('<I', buf, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(buf[start:start + length])
+    data_start = -(-(start + length) // ALIGN) * ALIGN
+    arrays = {}
+    for name, (position, dtype, shape) in header['arrays'].items():
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(buf, dtype=dtype, count=count, offset=data_start + position).reshape(shape)
+    return header, arrays
+
+
+def _is_current(header, source):
+    size, mtime = _stat(source)
+    if header['source_size'] == size and header['source_mtime_ns'] == mtime:
+        return True
+    # git checkout 등으로 mtime 만 바뀐 경우는 내용 해시로 확인
+    return header['source_size'] == size and header['source_sha256'] == _file_hash(source)
+
+
+def load(layer):
+    """layer ('dong' | 'gu') 의 Layer (원본이 바뀌었으면 캐시를 다시 만들고, 프로세스 안에서는 재사용)"""
+    source = SOURCES[layer]
+    stat = _stat(source)
+    entry = _layers.get(layer)
+    if entry and entry[0] == stat:
+        return entry[1]
+    with _lock:
+        entry = _layers.get(layer)
+        if entry and entry[0] == stat:
+            return entry[1]
+        cached = _read(cache_path(layer))
+        if cached is None or not _is_current(cached[0], source):
+            build(layer)
+            cached = _read(cache_path(layer))
+        header, arrays = cached
+        offsets = tuple(arrays[f'offsets{i}'] for i in range(header['offsets']))
+        geoms = shapely.from_ragged_array(shapely.GeometryType(header['geometry_type']), arrays['coords'], offsets)
+        result = Layer(geoms, arrays['bounds'], header['features'], header['source_sha256'])
+        _layers[layer] = (stat, result)
+        return result
+
+
+def bench(repeat=10):
+    print(f"{'layer':<8}{'geojson ms':>12}{'cache ms':>10}{'speedup':>9}")
+    for layer, source in SOURCES.items():
+        load(layer)  # 캐시 파일 준비
+        start = time.perf_counter()
+        for _ in range(repeat):
+            with open(source, encoding='utf-8') as f:
+                features = json.load(f)['features']
+            [shapely.geometry.shape(f['geometry']) for f in features]
+        parse_ms = (time.perf_counter() - start) / repeat * 1000
+        start = time.perf_counter()
+        for _ in range(repeat):
+            _layers.pop(layer, None)
+            load(layer)
+        load_ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"{layer:<8}{parse_ms:>12.2f}{load_ms:>10.2f}{parse_ms / load_ms:>8.0f}x")
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        bench()
+    else:
+        for name in SOURCES:
+            layer = load(name)
+            print(f"{name}: {len(layer.geoms)} features, sha256 {layer.sha256[:16]} -> {cache_path(name)}")
@@ -0,0 +1,118 @@
+"""
+HTTP 캐시 검증(ETag) + 미리 압축해 둔 응답 (Flask app.py / FastAPI backend 공용)
+
+응답 본문을 한 번만 압축(gzip, 설치되어 있으면 brotli)해서 메모리에 들고 있다가
+요청의 Accept-Encoding 에 맞는 것을 그대로(복사 없이) 내보낸다.
+If-None-Match 가 고른 variant 의 ETag 와 같으면 본문 없이 304 를 돌려준다 (Vary: Accept-Encoding).
+"""
+import gzip
+import hashlib
+import os
+from collections import namedtuple
+
+try:
+    import brotli
+except ImportError:  # brotli 는 선택 의존성 (없으면 gzip 만 제공)
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+# 압축할 가치가 없는 작은 응답은 원본만 보냄
+MIN_COMPRESS_SIZE = 1024
+
+# etag: 원본 내용 해시 기반 강한 ETag, variants: {encoding: (body, etag)} ('identity' 포함)
+Variants = namedtuple('Variants', ['etag', 'variants'])
+
+
+def build_variants(body, gzip_body=None):
+    """원본 bytes 로 ETag 와 압축 variant 들을 만든다
+
+    gzip_body: 이미 gzip 으로 압축된 본문이 있으면 (예: MBTiles 에 저장된 타일) 다시 압축하지 않고 사용
+    """
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    variants = {'identity': (body, f'"{digest}"')}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        if gzip_body is None:
+            gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        variants['gzip'] = (gzip_body, f'"{digest}-gz"')
+        if brotli is not None:
+            variants['br'] = (brotli.compress(body, quality=BROTLI_QUALITY), f'"{digest}-br"')
+    return Variants(f'"{digest}"', variants)
+
+
+def _accepted_encodings(accept_encoding):
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _etag_matches(if_none_match, etag):
+    # 협상으로 고른 variant 의 ETag 와만 비교 (gzip 본문을 받아 둔 클라이언트가 identity / br 을 요청하면
+    # 받은 적 없는 표현이므로 304 가 아니라 200)
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def select(cached, accept_encoding=None, if_none_match=None):
+    """요청 헤더에 맞는 응답을 고른다 -> (status, body, headers)
+
+    body 는 bytes 또는 서빙 번들(bundle.py)의 mmap 영역 memoryview (복사하지 않고 그대로 응답에 씀)
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in cached.variants and candidate in accepted:
+            encoding = candidate
+            break
+    body, etag = cached.variants[encoding]
+
+    headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if _etag_matches(if_none_match, etag):
+        return 304, b'', headers
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return 200, body, headers
+
+
+_static_cache = {}
+
+
+def load_static(path):
+    """정적 파일을 읽어 variant 를 만든다 (경로별로 한 번만, 파일이 바뀌면 다시 만듦)
+
+    서빙 번들(bundle.py)에 같은 파일의 압축본이 있으면 압축하지 않고 번들의 것을 씀
+    """
+    import bundle  # bundle 이 이 모듈의 build_variants 를 쓰므로 여기서 불러옴
+
+    mtime = os.stat(path).st_mtime_ns
+    entry = _static_cache.get(path)
+    if entry is None or entry[0] != mtime:
+        cached = bundle.static(path)
+        if cached is None:
+            with open(path, 'rb') as f:
+                cached = build_variants(f.read())
+        entry = (mtime, cached)
+        _static_cache[path] = entry
+    return entry[1]
@@ -0,0 +1,295 @@
+"""
+매장 CSV 스트리밍 적재 (주소 파싱 + 행정동 폴리곤 배정 + 증분 반영을 한 번에)
+
+예전에는 db_3.py 가 CSV 전체를 메모리에 올려 구/동을 파싱해서 쓰고,
+db_granular.py 가 DB 를 다시 전부 읽어서 행정동을 고쳐 쓰는 두 단계였다.
+
+1. CSV 를 CHUNK_ROWS 줄씩 읽음 (star_bucks_store_utf.csv / kor_starbucks_data.csv 형식 자동 인식)
+2. 지역 필터(기본: 서울) -> db_3.extract_locations 로 구/동 파싱 (pandas 벡터 연산)
+3. 좌표 -> 행정동 폴리곤 배정을 프로세스 풀에서 (워커마다 DongIndex 를 한 번만 만듦)
+   폴리곤에 들어가면 구 / 동 / 행정동 코드(adm_cd)는 코드 표의 정식 값 (admin_codes.py)
+   동시에 처리 중인 청크는 최대 MAX_PENDING 개 -> 파일 크기와 상관없이 메모리 일정
+4. 결과를 TEMP 테이블(ingest_stage)에 배치 INSERT (본 DB 쓰기 락을 잡지 않음)
+5. 마지막에 BEGIN IMMEDIATE 트랜잭션 하나로 stores 에 반영 (INSERT ... ON CONFLICT + DELETE, SQL 집합 연산)
+
+python ingest.py                                   : data/star_bucks_store_utf.csv 적재
+python ingest.py data/kor_starbucks_data.csv --no-delete --workers 4
+python ingest.py big.csv --all-regions             : 지역 필터 없이 (폴리곤 밖은 주소 파싱 결과 사용)
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import admin_codes
+import db_pool
+import geo_cache
+import migrations
+import store_stats
+from db_3 import STORE_COLUMNS, UNKNOWN, extract_locations, print_changeset
+from db_granular import DongIndex
+from migrations import allocate_store_code
+
+CHUNK_ROWS = 20000
+MAX_PENDING = 4          # 프로세스 풀에 동시에 넘겨 둔 청크 수 (메모리 상한)
+DEFAULT_REGION = '서울'
+DEFAULT_FILES = ['data/star_bucks_store_utf.csv']
+
+# CSV 형식별 컬럼 이름 -> 공통 이름
+FORMATS = {
+    'star_bucks_store_utf': {'매장명': 'store_name', '주소': 'address', '위도': 'lat', '경도': 'lng'},
+    'kor_starbucks_data': {'store_name': 'store_name', 'address': 'address', 'lat': 'lat', 'lng': 'lng',
+                           'sido': 'sido'},
+}
+
+
+def detect_format(path):
+    header = pd.read_csv(path, nrows=0).columns
+    for name, mapping in FORMATS.items():
+        required = [c for c in mapping if c != 'sido']
+        if all(c in header for c in required):
+            return name
+    raise ValueError(f"{path}: unknown CSV header {list(header)}")
+
+
+def read_chunks(path, region=DEFAULT_REGION, chunk_rows=CHUNK_ROWS):
+    """CSV 를 청크 단위로 읽어 store_name, address, lat, lng 로 맞춘 DataFrame 을 차례로 돌려줌"""
+    mapping = FORMATS[detect_format(path)]
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, usecols=list(mapping), dtype={'address': object}):
+        chunk = chunk.rename(columns=mapping)
+        chunk = chunk[chunk['store_name'].notna()]
+        if region:
+            # sido 컬럼이 있으면 시/도로, 없으면 주소에 지역 이름이 들어있는지로 거름
+            where = chunk['sido'] if 'sido' in chunk else chunk['address']
+            chunk = chunk[where.str.contains(region, na=False, regex=False)]
+        chunk = chunk.assign(store_name=chunk['store_name'].astype(str).str.strip(),
+                             lat=pd.to_numeric(chunk['lat'], errors='coerce'),
+                             lng=pd.to_numeric(chunk['lng'], errors='coerce'))
+        if len(chunk):
+            yield chunk[['store_name', 'address', 'lat', 'lng']]
+
+
+# ----------------------------------------------------------------------------
+# 행정동 배정 (프로세스 풀 워커)
+# ----------------------------------------------------------------------------
+
+_index = None
+
+
+def _init_worker():
+    global _index
+    _index = DongIndex.load()
+
+
+def assign_dongs(lngs, lats, gus):
+    """좌표 목록 -> 행정동 폴리곤 index 목록 (geo_cache 'dong' 의 feature 순서, 폴리곤에 안 들어가면 None)"""
+    has_coords = [i for i, (x, y) in enumerate(zip(lngs, lats)) if x == x and y == y]  # NaN 제외
+    polygons = [None] * len(lngs)
+    if has_coords:
+        matched, _ = _index.assign([lngs[i] for i in has_coords], [lats[i] for i in has_coords],
+                                   [gus[i] for i in has_coords])
+        for i, g in zip(has_coords, matched):
+            polygons[i] = g
+    return polygons
+
+
+def _parse(chunk):
+    locations = extract_locations(chunk['address'])
+    # 주소에서 구를 못 찾았으면 구 제한 없이 폴리곤 배정
+    gus = [None if gu == UNKNOWN else gu for gu in locations['gu']]
+    return chunk.assign(gu=locations['gu'], dong=locations['dong']), gus
+
+
+# ----------------------------------------------------------------------------
+# 스테이징 (TEMP 테이블) + 최종 반영
+# ----------------------------------------------------------------------------
+
+def _create_stage(conn):
+    conn.execute("DROP TABLE IF EXISTS temp.ingest_stage")
+    conn.execute("""
+        CREATE TEMP TABLE ingest_stage (
+            store_name TEXT PRIMARY KEY,
+            store_code INTEGER NOT NULL,
+            gu TEXT, dong TEXT, adm_cd INTEGER, lat REAL, lng REAL, address TEXT
+        )
+    """)
+
+
+class Stager:
+    """파싱된 청크를 ingest_stage 에 배치로 넣음 (새 매장은 충돌 없는 store_code 발급)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.areas = geo_cache.load('dong').features
+        self.taken = {row[0] for row in conn.execute("SELECT store_code FROM stores")}
+        self.rows = 0
+        self.polygon_matched = 0
+
+    def add(self, chunk, polygons):
+        names = chunk['store_name'].tolist()
+        existing = dict(self.conn.execute(
+            "SELECT store_name, store_code FROM stores WHERE store_name IN (SELECT value FROM json_each(?))",
+            (json.dumps(names, ensure_ascii=False),)))
+        batch = []
+        for name, gu, dong, polygon, lat, lng, address in zip(
+                names, chunk['gu'], chunk['dong'], polygons, chunk['lat'], chunk['lng'], chunk['address']):
+            code = existing.get(name)
+            if code is None:
+                code = allocate_store_code(name, self.taken)
+            if polygon is not None:
+                area = self.areas[polygon]
+                self.polygon_matched += 1
+            else:
+                # 폴리곤 밖이면 주소에서 파싱한 이름을 코드 표로 (하나로 정해지는 별칭만)
+                area = admin_codes.resolve(gu, dong)
+            if area is not None:
+                gu, dong, adm_cd = area['gu'], area['dong'], area['adm_cd']
+            else:
+                adm_cd = None
+            batch.append((name, code, gu, dong, adm_cd,
+                          None if lat != lat else lat, None if lng != lng else lng, address))
+        with self.conn:
+            # 같은 매장명이 여러 번 나오면 처음 것 사용 (migrations 001 과 같은 규칙)
+            self.conn.executemany("INSERT INTO ingest_stage VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                                  "ON CONFLICT(store_name) DO NOTHING", batch)
+        self.rows += len(batch)
+
+
+# 이름 / store_code 말고 ingest 가 덮어쓰는 열 (store_code 는 기존 매장이면 그대로 유지)
+_UPDATED_COLUMNS = [c for c in STORE_COLUMNS if c not in ('store_name', 'store_code')]
+
+
+def _changed(old, new):
+    """old 테이블 행과 new 테이블 행의 값이 하나라도 다르면 참인 SQL 조건"""
+    return ' OR '.join(f'{old}.{c} IS NOT {new}.{c}' for c in _UPDATED_COLUMNS)
+
+
+def merge_stage(conn, delete_missing=True):
+    """ingest_stage 를 stores 에 한 트랜잭션으로 반영하고 changeset 반환"""
+    columns = ', '.join(STORE_COLUMNS)
+    assignments = ', '.join(f'{c} = excluded.{c}' for c in _UPDATED_COLUMNS)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        admin_codes.sync(conn)
+        changes = {
+            'insert': [dict(row) for row in conn.execute(
+                "SELECT store_name FROM ingest_stage WHERE store_name NOT IN (SELECT store_name FROM stores)")],
+            'update': [dict(row) for row in conn.execute(
+                f"SELECT st.store_name FROM ingest_stage st JOIN stores s ON s.store_name = st.store_name "
+                f"WHERE {_changed('s', 'st')}")],
+            'delete': [row[0] for row in conn.execute(
+                "SELECT store_name FROM stores WHERE store_name NOT IN (SELECT store_name FROM ingest_stage)")]
+            if delete_missing else [],
+        }
+        staged = conn.execute("SELECT COUNT(*) FROM ingest_stage").fetchone()[0]
+        changes['unchanged'] = staged - len(changes['insert']) - len(changes['update'])
+
+        if changes['insert'] or changes['update'] or changes['delete']:
+            # 구/동 집계는 행마다 트리거로 고치지 않고 끝나고 한 번에 다시 계산
+            with store_stats.bulk_maintenance(conn):
+                # store_code 는 기존 매장이면 그대로 유지 (SET 에 포함하지 않음)
+                conn.execute(f"""
+                    INSERT INTO stores ({columns}) SELECT {columns} FROM ingest_stage WHERE true
+                    ON CONFLICT(store_name) DO UPDATE SET {assignments}
+                    WHERE {_changed('stores', 'excluded')}
+                """)
+                if changes['delete']:
+                    conn.execute("DELETE FROM stores WHERE store_name NOT IN (SELECT store_name FROM ingest_stage)")
+            db_pool.bump_generation(conn, 'stores')
+            db_pool.bump_generation(conn, 'store_locations')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return changes
+
+
+# ----------------------------------------------------------------------------
+# 파이프라인
+# ----------------------------------------------------------------------------
+
+def default_workers():
+    # 코어가 하나뿐이면 프로세스를 띄우는 비용만 늘어나므로 현재 프로세스에서 처리
+    return min(4, (os.cpu_count() or 1) - 1)
+
+
+def run(paths=None, region=DEFAULT_REGION, workers=None, chunk_rows=CHUNK_ROWS, delete_missing=True):
+    """CSV 파일들을 스트리밍으로 적재하고 changeset 반환"""
+    paths = paths or DEFAULT_FILES
+    workers = default_workers() if workers is None else workers
+    timings = {}
+    t0 = time.perf_counter()
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    # 서버 연결은 temp_store=MEMORY 지만 스테이징 테이블은 입력 크기만큼 커지므로 임시 파일로
+    conn.execute("PRAGMA temp_store = FILE")
+    _create_stage(conn)
+    stager = Stager(conn)
+
+    # 폴리곤 캐시를 먼저 만들어 두면 워커들은 캐시 파일을 mmap 해서 바로 시작
+    geo_cache.load('dong')
+    if workers > 0:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        submit = lambda *args: pool.submit(assign_dongs, *args)  # noqa: E731
+    else:
+        pool = None
+        _init_worker()
+        submit = None
+
+    pending = deque()
+    try:
+        for path in paths:
+            for chunk in read_chunks(path, region, chunk_rows):
+                chunk, gus = _parse(chunk)
+                args = (chunk['lng'].tolist(), chunk['lat'].tolist(), gus)
+                if pool is None:
+                    stager.add(chunk, assign_dongs(*args))
+                    continue
+                pending.append((chunk, submit(*args)))
+                # 넘겨 둔 청크가 많으면 가장 오래된 것부터 받아서 스테이징 (순서 유지)
+                while len(pending) >= MAX_PENDING:
+                    done_chunk, future = pending.popleft()
+                    stager.add(done_chunk, future.result())
+        while pending:
+            done_chunk, future = pending.popleft()
+            stager.add(done_chunk, future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    timings['parse + assign + stage'] = time.perf_counter() - t0
+
+    t = time.perf_counter()
+    try:
+        changes = merge_stage(conn, delete_missing)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.ingest_stage")
+        conn.close()
+    timings['merge'] = time.perf_counter() - t
+    timings['total'] = time.perf_counter() - t0
+
+    print_changeset(changes)
+    print(f"Staged {stager.rows} rows ({stager.polygon_matched} dong by polygon, "
+          f"{stager.rows - stager.polygon_matched} by address) with {workers or 'no'} worker processes.")
+    for step, seconds in timings.items():
+        print(f"  {step:<24}{seconds * 1000:>10.1f} ms")
+    if stager.rows:
+        print(f"  {'throughput':<24}{stager.rows / timings['total']:>10.0f} rows/s")
+    return changes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=DEFAULT_FILES)
+    parser.add_argument('--workers', type=int, default=None, help='행정동 배정 프로세스 수 (0 = 현재 프로세스)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--region', default=DEFAULT_REGION, help='시/도 필터 (기본: 서울)')
+    parser.add_argument('--all-regions', action='store_true', help='지역 필터 없이 모두 적재')
+    parser.add_argument('--no-delete', action='store_true', help='파일에 없는 기존 매장을 지우지 않음')
+    args = parser.parse_args()
+    run(args.paths, None if args.all_regions else args.region, args.workers, args.chunk_rows,
+        delete_missing=not args.no_delete)
@@ -0,0 +1,248 @@
+"""
+action_logs 집계 (시간/일별 롤업 테이블 + 읽기 전용 조회 API)
+
+action_logs 는 /api/log 가 클릭마다 한 줄씩 쌓는 append-only 테이블이라, "오늘 사용자 수" 나
+"가장 많이 본 구" 를 원본에서 바로 구하면 로그가 쌓일수록 느려진다.
+
+- log_hourly / log_daily : (시간 또는 날짜, action, target) 별 이벤트 수
+- log_daily_users        : (날짜, user_uuid) - 일별 사용자 수 (DAU) 를 구하기 위한 중복 제거 표
+- log_daily_totals       : 날짜별 이벤트 수 / 사용자 수 (refresh 가 건드린 날짜만 다시 셈)
+- log_rollup_state       : 마지막으로 반영한 action_logs.id (high-water mark)
+  refresh() 는 그 다음 id 부터 REFRESH_BATCH 줄씩 GROUP BY 해서 롤업에 더하고 mark 를 올림
+  (쓰기는 한 번에 한 연결만 하므로 MAX(id) 까지의 줄은 모두 커밋된 상태 -> 빠지는 줄 없음)
+- log_writer 가 로그를 기록한 뒤 ROLLUP_INTERVAL 마다 refresh() 를 불러서 롤업을 최신으로 유지
+- 조회(daily / top_targets / timeseries)는 롤업 테이블만 읽음 -> 원본 로그 크기와 상관없이 일정
+
+시간은 action_logs.timestamp 와 같은 UTC 기준 ('YYYY-MM-DD HH:MM:SS')
+테이블과 인덱스 정의(DDL)는 migrations.py 의 7 단계에 있다.
+
+python log_analytics.py           : 밀린 로그를 롤업에 반영
+python log_analytics.py --rebuild : 롤업을 비우고 처음부터 다시 집계
+python log_analytics.py --check   : 롤업 합계와 원본 GROUP BY 비교
+"""
+import datetime
+import json
+import sys
+import time
+
+import db_pool
+
+REFRESH_BATCH = 50000   # refresh() 트랜잭션 하나에서 반영하는 최대 로그 줄 수
+ROLLUP_INTERVAL = 5.0   # log_writer 가 refresh() 를 부르는 최소 간격 (초)
+MAX_DAYS = 366          # 조회 기간 최대 일수
+MAX_HOURS = 24 * 31     # 시간 단위 조회 최대 길이
+MAX_TOP = 100
+
+DATE_FORMAT = '%Y-%m-%d'
+HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+
+
+def high_water_mark(conn):
+    return conn.execute("SELECT last_log_id FROM log_rollup_state WHERE id = 0").fetchone()[0]
+
+
+TOTALS_SQL = """
+    SELECT d.day, SUM(d.events), (SELECT COUNT(*) FROM log_daily_users u WHERE u.day = d.day)
+    FROM log_daily d
+"""
+
+
+def _apply_range(conn, start, end):
+    # id 가 (start, end] 인 로그를 롤업에 더함
+    for table, bucket, expr in (('log_hourly', 'hour', f"strftime('{HOUR_FORMAT}', timestamp)"),
+                                ('log_daily', 'day', 'date(timestamp)')):
+        conn.execute(f"""
+            INSERT INTO {table} ({bucket}, action, target, events)
+            SELECT {expr}, COALESCE(action, ''), COALESCE(target, ''), COUNT(*)
+            FROM action_logs WHERE id > ? AND id <= ? AND timestamp IS NOT NULL
+            GROUP BY 1, 2, 3
+            ON CONFLICT({bucket}, action, target) DO UPDATE SET events = events + excluded.events
+        """, (start, end))
+    conn.execute("""
+        INSERT OR IGNORE INTO log_daily_users (day, user_uuid)
+        SELECT DISTINCT date(timestamp), user_uuid FROM action_logs
+        WHERE id > ? AND id <= ? AND timestamp IS NOT NULL AND user_uuid IS NOT NULL
+    """, (start, end))
+    # 이번에 로그가 들어온 날짜(보통 오늘 하루)의 합계만 다시 계산
+    days = json.dumps([row[0] for row in conn.execute(
+        "SELECT DISTINCT date(timestamp) FROM action_logs WHERE id > ? AND id <= ? AND timestamp IS NOT NULL",
+        (start, end))])
+    conn.execute(f"""
+        INSERT INTO log_daily_totals (day, events, users)
+        {TOTALS_SQL} WHERE d.day IN (SELECT value FROM json_each(?)) GROUP BY d.day
+        ON CONFLICT(day) DO UPDATE SET events = excluded.events, users = excluded.users
+    """, (days,))
+    conn.execute("UPDATE log_rollup_state SET last_log_id = ? WHERE id = 0", (end,))
+
+
+def refresh(conn, batch=REFRESH_BATCH):
+    """high-water mark 이후의 로그를 id batch 개씩 롤업에 반영하고 mark 가 올라간 만큼 반환"""
+    applied = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = high_water_mark(conn)
+            latest = conn.execute("SELECT MAX(id) FROM action_logs").fetchone()[0] or 0
+            end = min(latest, start + batch)
+            if end > start:
+                _apply_range(conn, start, end)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied += max(0, end - start)
+        if end >= latest:
+            return applied
+
+
+def rebuild(conn):
+    """롤업을 비우고 처음부터 다시 집계"""
+    with conn:
+        for table in ('log_hourly', 'log_daily', 'log_daily_users', 'log_daily_totals'):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("UPDATE log_rollup_state SET last_log_id = 0 WHERE id = 0")
+    return refresh(conn)
+
+
+def check_consistency(conn):
+    """(table, key, 롤업 값, 원본 값) 목록 - mark 까지의 원본과 비교, 비어 있으면 일치"""
+    mark = high_water_mark(conn)
+    diffs = []
+    for table, bucket, expr in (('log_hourly', 'hour', f"strftime('{HOUR_FORMAT}', timestamp)"),
+                                ('log_daily', 'day', 'date(timestamp)')):
+        live = {tuple(r[:3]): r[3] for r in conn.execute(f"""
+            SELECT {expr}, COALESCE(action, ''), COALESCE(target, ''), COUNT(*) FROM action_logs
+            WHERE id <= ? AND timestamp IS NOT NULL GROUP BY 1, 2, 3
+        """, (mark,))}
+        stored = {tuple(r[:3]): r[3] for r in conn.execute(f"SELECT {bucket}, action, target, events FROM {table}")}
+        for key in sorted(set(live) | set(stored)):
+            if live.get(key) != stored.get(key):
+                diffs.append((table, key, stored.get(key), live.get(key)))
+    live = {tuple(r) for r in conn.execute("""
+        SELECT DISTINCT date(timestamp), user_uuid FROM action_logs
+        WHERE id <= ? AND timestamp IS NOT NULL AND user_uuid IS NOT NULL
+    """, (mark,))}
+    stored = {tuple(r) for r in conn.execute("SELECT day, user_uuid FROM log_daily_users")}
+    for key in sorted(live ^ stored):
+        diffs.append(('log_daily_users', key, key in stored, key in live))
+    live = {r[0]: tuple(r[1:]) for r in conn.execute(f"{TOTALS_SQL} GROUP BY d.day")}
+    stored = {r[0]: tuple(r[1:]) for r in conn.execute("SELECT day, events, users FROM log_daily_totals")}
+    for key in sorted(set(live) | set(stored)):
+        if live.get(key) != stored.get(key):
+            diffs.append(('log_daily_totals', key, stored.get(key), live.get(key)))
+    return diffs
+
+
+# ----------------------------------------------------------------------------
+# 조회 (읽기 전용, 롤업 테이블만 읽음)
+# ----------------------------------------------------------------------------
+
+def _parse_day(value, name):
+    try:
+        return datetime.datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+def day_range(start=None, end=None, days=7):
+    """(start, end) 날짜 문자열 (end 포함) - 없으면 오늘(UTC)까지 days 일, 잘못된 값이면 ValueError"""
+    end_day = _parse_day(end, 'end') if end else datetime.datetime.now(datetime.timezone.utc).date()
+    start_day = _parse_day(start, 'start') if start else end_day - datetime.timedelta(days=days - 1)
+    if start_day > end_day:
+        raise ValueError("start must not be after end")
+    if (end_day - start_day).days + 1 > MAX_DAYS:
+        raise ValueError(f"at most {MAX_DAYS} days per query")
+    return start_day.strftime(DATE_FORMAT), end_day.strftime(DATE_FORMAT)
+
+
+def _as_of(conn):
+    # 롤업에 반영된 마지막 로그 (응답에 함께 보내서 얼마나 최신인지 알 수 있게)
+    mark = high_water_mark(conn)
+    row = conn.execute("SELECT timestamp FROM action_logs WHERE id = ?", (mark,)).fetchone()
+    return {'last_log_id': mark, 'last_timestamp': row[0] if row else None}
+
+
+def daily(start, end):
+    """날짜별 이벤트 수 / 사용자 수 (day_range() 를 거친 값으로 호출)"""
+    conn = db_pool.get_conn()
+    totals = {row[0]: row for row in conn.execute(
+        "SELECT day, events, users FROM log_daily_totals WHERE day BETWEEN ? AND ?", (start, end))}
+    actions = {}
+    for day, action, count in conn.execute(
+            "SELECT day, action, SUM(events) FROM log_daily WHERE day BETWEEN ? AND ? GROUP BY day, action",
+            (start, end)):
+        actions.setdefault(day, {})[action] = count
+    days = []
+    day = _parse_day(start, 'start')
+    while day.strftime(DATE_FORMAT) <= end:
+        key = day.strftime(DATE_FORMAT)
+        events, users = totals[key][1:] if key in totals else (0, 0)
+        days.append({'day': key, 'events': events, 'users': users, 'actions': actions.get(key, {})})
+        day += datetime.timedelta(days=1)
+    return {'start': start, 'end': end, 'days': days, 'as_of': _as_of(conn)}
+
+
+TOP_TARGETS_SQL = """
+    SELECT target, SUM(events) AS events FROM log_daily
+    WHERE action = ? AND day BETWEEN ? AND ?
+    GROUP BY target ORDER BY events DESC, target LIMIT ?
+"""
+
+
+def top_targets(action, start, end, limit=10):
+    """기간 동안 action 의 target 별 이벤트 수 상위 limit 개 (예: CLICK_GU -> 가장 많이 본 구)"""
+    if not 1 <= limit <= MAX_TOP:
+        raise ValueError(f"limit must be between 1 and {MAX_TOP}")
+    conn = db_pool.get_conn()
+    rows = conn.execute(TOP_TARGETS_SQL, (action, start, end, limit)).fetchall()
+    return {'action': action, 'start': start, 'end': end,
+            'targets': [dict(row) for row in rows], 'as_of': _as_of(conn)}
+
+
+def timeseries(start, end, granularity='day', action=None, target=None):
+    """시간 / 날짜별 이벤트 수 (action, target 으로 거를 수 있음, 이벤트가 없는 구간은 생략)"""
+    if granularity not in ('hour', 'day'):
+        raise ValueError("granularity must be 'hour' or 'day'")
+    table = 'log_hourly' if granularity == 'hour' else 'log_daily'
+    if granularity == 'hour':
+        hours = (_parse_day(end, 'end') - _parse_day(start, 'start')).days * 24 + 24
+        if hours > MAX_HOURS:
+            raise ValueError(f"hourly queries cover at most {MAX_HOURS // 24} days")
+        low, high = f'{start} 00:00:00', f'{end} 23:00:00'
+    else:
+        low, high = start, end
+    where = [f"{granularity} BETWEEN ? AND ?"]
+    args = [low, high]
+    if action is not None:
+        where.append("action = ?")
+        args.append(action)
+    if target is not None:
+        where.append("target = ?")
+        args.append(target)
+    conn = db_pool.get_conn()
+    rows = conn.execute(f"""
+        SELECT {granularity} AS bucket, SUM(events) AS events FROM {table}
+        WHERE {' AND '.join(where)} GROUP BY bucket ORDER BY bucket
+    """, args).fetchall()
+    return {'granularity': granularity, 'start': start, 'end': end, 'action': action, 'target': target,
+            'buckets': [dict(row) for row in rows], 'as_of': _as_of(conn)}
+
+
+if __name__ == '__main__':
+    import migrations
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    if '--check' in sys.argv:
+        diffs = check_consistency(conn)
+        for table, key, stored, live in diffs[:20]:
+            print(f"MISMATCH {table} {key}: rollup={stored} raw={live}")
+        print(f"Rollups up to log id {high_water_mark(conn)}: {'OK' if not diffs else f'{len(diffs)} mismatches'}")
+        conn.close()
+        sys.exit(1 if diffs else 0)
+
+    start = time.perf_counter()
+    applied = rebuild(conn) if '--rebuild' in sys.argv else refresh(conn)
+    print(f"Applied {applied} log rows in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"(high-water mark {high_water_mark(conn)})")
+    conn.close()
@@ -0,0 +1,241 @@
+"""
+action_logs 버퍼링 기록기 (/api/log, /api/log/batch 용)
+
+요청 처리 중에는 로그를 메모리 큐에 넣기만 하고, 백그라운드 스레드 하나가
+모아서 executemany 한 번 + commit 한 번으로 기록한다 (group commit).
+
+- BATCH_SIZE 개가 모이거나 FLUSH_INTERVAL 초가 지나면 기록
+- 큐가 가득 차면 ENQUEUE_TIMEOUT 만큼만 기다리고 버림 (dropped 로 집계)
+  여러 건(submit_many)도 묶음 전체가 ENQUEUE_TIMEOUT 한 번만 기다리고, 한 번 가득 차면 나머지는 바로 버림
+  block=False 면 기다리지 않음 (async 서버의 이벤트 루프에서 부를 때)
+- uuid / action / target 은 문자열(또는 None)로 바꿔서 넣음 (JSON 객체 / 배열이 와도 묶음 전체가 실패하지 않게)
+  그래도 바인딩에 실패하는 행이 있으면 그 묶음만 한 행씩 다시 기록해서 나머지는 살림
+- 프로세스 종료 시(atexit) 남은 로그를 모두 기록
+- 기록한 뒤 log_analytics.ROLLUP_INTERVAL 마다 시간/일별 롤업을 이어서 갱신 (같은 스레드에서)
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import db_pool
+import log_analytics
+
+MAX_QUEUE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5   # 초
+ENQUEUE_TIMEOUT = 0.05  # 초 (큐가 가득 찼을 때 요청이 기다리는 최대 시간)
+WRITE_RETRIES = 2       # 쓰기 락을 못 잡았을 때 다시 시도하는 횟수
+
+INSERT_SQL = """
+    INSERT INTO action_logs (user_uuid, action, target, ip_address, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+
+def _text(value):
+    # TEXT 컬럼에 넣을 값: 문자열 / None 은 그대로, 숫자 등은 str, 객체 / 배열은 JSON 문자열
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class LogWriter:
+    def __init__(self, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.counters = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+        self._lock = threading.Lock()
+        self._next_rollup = 0.0
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def submit(self, user_uuid, action, target, ip_address, timeout=ENQUEUE_TIMEOUT):
+        """로그 한 건을 큐에 넣음 (timeout 초 안에 못 넣어서 버려지면 False, timeout <= 0 이면 기다리지 않음)"""
+        # timestamp 는 실제로 기록되는 시점이 아니라 요청을 받은 시점 (CURRENT_TIMESTAMP 와 같은 UTC 형식)
+        entry = (_text(user_uuid), _text(action), _text(target), ip_address,
+                 time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
+        try:
+            if timeout > 0:
+                self.queue.put(entry, timeout=timeout)
+            else:
+                self.queue.put_nowait(entry)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _write(self, batch):
+        conn = self._conn
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                with conn:
+                    conn.executemany(INSERT_SQL, batch)
+                break
+            except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+                # 바인딩할 수 없는 값이 섞인 경우: 한 행씩 기록해서 그 행만 버림
+                self._write_rows(batch)
+                return
+            except sqlite3.OperationalError as e:
+                # busy_timeout 동안에도 쓰기 락을 못 잡은 경우 (database is locked) 다시 시도
+                if attempt == WRITE_RETRIES:
+                    print(f"Log writer error ({len(batch)} entries lost): {e}")
+                    self._count('failed', len(batch))
+                    return
+            except Exception as e:
+                print(f"Log writer error ({len(batch)} entries lost): {e}")
+                self._count('failed', len(batch))
+                return
+        self._count('written', len(batch))
+        self._count('batches')
+        if time.monotonic() >= self._next_rollup:
+            self._rollup()
+
+    def _write_rows(self, batch):
+        failed = 0
+        try:
+            with self._conn as conn:
+                for entry in batch:
+                    try:
+                        conn.execute(INSERT_SQL, entry)
+                    except (sqlite3.InterfaceError, sqlite3.ProgrammingError) as e:
+                        print(f"Log writer error (1 entry lost): {e}")
+                        failed += 1
+        except Exception as e:
+            print(f"Log writer error ({len(batch)} entries lost): {e}")
+            self._count('failed', len(batch))
+            return
+        self._count('failed', failed)
+        self._count('written', len(batch) - failed)
+        self._count('batches')
+
+    def _rollup(self):
+        self._next_rollup = time.monotonic() + log_analytics.ROLLUP_INTERVAL
+        try:
+            log_analytics.refresh(self._conn)
+        except Exception as e:
+            # refresh 는 실패한 구간을 되돌림, 롤업은 다음 refresh 때 high-water mark 부터 이어서 반영되므로 로그는 잃지 않음
+            print(f"Log rollup error: {e}")
+
+    def _safe_write(self, batch):
+        # 묶음 / 롤업 하나가 어떤 예외로 실패해도 스레드는 계속 (스레드가 죽으면 큐가 차서 /api/log 가 계속 503)
+        try:
+            self._write(batch)
+        except Exception as e:
+            print(f"Log writer error ({len(batch)} entries lost): {e}")
+            self._count('failed', len(batch))
+
+    def _run(self):
+        self._conn = db_pool.connect()
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._safe_write(batch)
+
+        # 종료: 큐에 남은 것 모두 기록
+        rest = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        for i in range(0, len(rest), self.batch_size):
+            self._safe_write(rest[i:i + self.batch_size])
+        self._rollup()
+        self._conn.close()
+
+    def close(self, timeout=5.0):
+        """남은 로그를 모두 기록하고 스레드를 멈춤"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=self.queue.qsize())
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """프로세스별 LogWriter (gunicorn 워커가 fork 된 뒤 처음 쓸 때 시작)"""
+    global _writer, _writer_pid
+    pid = os.getpid()
+    if _writer is None or _writer_pid != pid:
+        with _writer_lock:
+            if _writer is None or _writer_pid != pid:
+                _writer = LogWriter()
+                _writer_pid = pid
+    return _writer
+
+
+def submit(user_uuid, action, target, ip_address, block=True):
+    """block=False 면 큐가 가득 찼을 때 기다리지 않고 바로 버림"""
+    return get_writer().submit(user_uuid, action, target, ip_address, ENQUEUE_TIMEOUT if block else 0)
+
+
+def submit_many(events, ip_address, default_uuid=None, block=True):
+    """이벤트 dict 목록을 큐에 넣고 (accepted, dropped) 반환
+
+    묶음 전체가 ENQUEUE_TIMEOUT 까지만 기다리고 (block=False 면 기다리지 않음),
+    큐가 한 번 가득 차면 나머지 이벤트는 기다리지 않고 버린 것으로 셈
+    """
+    writer = get_writer()
+    deadline = time.monotonic() + (ENQUEUE_TIMEOUT if block else 0)
+    accepted = 0
+    for i, event in enumerate(events):
+        if not writer.submit(event.get('uuid') or default_uuid, event.get('action'), event.get('target'),
+                             ip_address, deadline - time.monotonic()):
+            dropped = len(events) - i
+            writer._count('dropped', dropped - 1)  # 실패한 한 건은 submit 이 이미 셈
+            return accepted, dropped
+        accepted += 1
+    return accepted, 0
+
+
+def stats():
+    """이 프로세스의 기록기 통계 (아직 시작하지 않았으면 빈 dict)"""
+    if _writer is None or _writer_pid != os.getpid():
+        return {}
+    return _writer.stats()
+
+
+@atexit.register
+def shutdown():
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.close()
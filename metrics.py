@@ -0,0 +1,393 @@
+"""
+요청 단위 계측 + Prometheus /metrics + 느린 요청 샘플링 프로파일러 (Flask app.py / FastAPI backend 공용)
+
+요청마다 RequestStats 를 contextvar 에 두고, 요청 안에서 일어난 일을 거기에 더한다.
+- 라우트별 지연 시간 히스토그램 (method, route 템플릿, status)
+- SQLite 쿼리 수 / 시간: db_pool 연결의 execute / fetch 를 잰 값 (요청 밖의 쿼리는 <background>)
+- 응답한 행 수 (JSON 배열 길이, 캐시된 매장 목록은 매장 수) / 응답 바이트
+- 값은 프로세스 안에서만 모음 (gunicorn 워커가 여럿이면 워커마다 따로 보임)
+
+연결 방법
+- Flask  : metrics.init_flask(app)       -> before/after_request 훅 + JSON 배열 행 수
+- FastAPI: app.add_middleware(metrics.ASGIMiddleware)  (순수 ASGI 미들웨어, BaseHTTPMiddleware 아님)
+           스레드 풀로 넘기는 DB 작업은 metrics.traced 로 감싸야 같은 요청으로 집계됨 (async_db.py)
+
+샘플링 프로파일러 (기본 꺼짐)
+- STARMAP_PROFILE_SLOW_MS=250 으로 켜면 PROFILE_INTERVAL 마다 요청 중인 스레드의 스택을 샘플링하고,
+  SLOW_MS 보다 오래 걸린 요청의 스택만 profiles/slow-<pid>.folded 에 추가 (flamegraph.pl / speedscope 형식)
+  첫 프레임은 "GET /api/dong-stats" 처럼 라우트라서 라우트별로 나뉘어 보임
+- FastAPI 의 이벤트 루프 스레드는 여러 요청이 함께 쓰므로, 그동안 루프가 한 일이 동시에 진행 중인
+  모든 요청에 들어감 (느린 요청이 다른 요청 때문에 루프가 막혀서 느린 경우도 보이도록)
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED = '<unmatched>'  # 라우트가 없는 경로 (404) - 경로를 그대로 쓰면 라벨 수가 끝없이 늘어남
+
+PROFILE_INTERVAL = 0.005
+PROFILE_MAX_DEPTH = 64
+PROFILE_DIR = os.path.abspath(os.environ.get('STARMAP_PROFILE_DIR')
+                              or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'query_seconds', 'rows', 'samples', 'threads')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.rows = 0
+        self.samples = None  # 프로파일러가 켜져 있으면 Counter({접힌 스택: 샘플 수})
+        self.threads = []
+
+
+_current = contextvars.ContextVar('starmap_request', default=None)
+_lock = threading.Lock()
+_histograms = {}    # (method, route, status) -> [버킷별 개수..., +Inf 개수, 합계 초]
+_route_totals = {}  # (method, route) -> [쿼리 수, 쿼리 초, 행 수, 응답 바이트]
+_background = [0, 0.0]  # 요청 밖에서 실행된 쿼리 수, 초
+_gauges = []        # (이름, 설명, 라벨 이름, fn -> {라벨 값: 숫자})
+_profiler = None
+
+
+# ----------------------------------------------------------------------------
+# 요청 안에서 부르는 함수
+# ----------------------------------------------------------------------------
+
+def record_query(seconds, count=1):
+    """SQLite 호출 한 번 (db_pool 연결이 부름) - fetch 는 count=0 으로 시간만 더함"""
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += count
+        stats.query_seconds += seconds
+        return
+    with _lock:
+        _background[0] += count
+        _background[1] += seconds
+
+
+def add_rows(count):
+    """응답에 직렬화한 행 수"""
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += count
+
+
+def traced(func, *args, **kwargs):
+    """다른 스레드에서 요청의 일부를 실행할 때 (contextvars.copy_context().run 안에서) - 프로파일러에 스레드 등록"""
+    stats = _current.get()
+    if _profiler is None or stats is None:
+        return func(*args, **kwargs)
+    _profiler.attach(stats)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _profiler.detach(stats)
+
+
+# ----------------------------------------------------------------------------
+# 요청 시작 / 끝
+# ----------------------------------------------------------------------------
+
+def begin():
+    """요청 시작: (RequestStats, contextvar 토큰) 반환"""
+    stats = RequestStats()
+    if _profiler is not None:
+        _profiler.attach(stats)
+    return stats, _current.set(stats)
+
+
+def end(started, method, route, status, response_bytes):
+    """요청 끝: 집계에 더하고 contextvar 를 되돌림 (느린 요청이면 스택 기록)"""
+    stats, token = started
+    duration = time.perf_counter() - stats.start
+    try:
+        _current.reset(token)
+    except ValueError:  # 다른 context 에서 끝난 경우 (정상 경로에서는 없음)
+        pass
+    profiler = _profiler
+    if profiler is not None:
+        profiler.detach(stats)
+        if duration * 1000 >= profiler.slow_ms:
+            profiler.dump(f'{method} {route}', stats.samples)
+
+    with _lock:
+        histogram = _histograms.get((method, route, status))
+        if histogram is None:
+            histogram = _histograms[(method, route, status)] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[len(LATENCY_BUCKETS)] += 1
+        histogram[-1] += duration
+        totals = _route_totals.get((method, route))
+        if totals is None:
+            totals = _route_totals[(method, route)] = [0, 0.0, 0, 0]
+        totals[0] += stats.queries
+        totals[1] += stats.query_seconds
+        totals[2] += stats.rows
+        totals[3] += response_bytes
+    return duration
+
+
+def register_gauges(name, help_text, label, fn):
+    """/metrics 를 만들 때마다 fn() -> {라벨 값: 숫자} 를 불러 gauge 로 내보냄 (log_writer 큐 상태 등)"""
+    _gauges.append((name, help_text, label, fn))
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _route_totals.clear()
+        _background[:] = [0, 0.0]
+
+
+# ----------------------------------------------------------------------------
+# Prometheus 텍스트 형식
+# ----------------------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def render():
+    """현재까지의 집계를 Prometheus text exposition 형식 문자열로"""
+    with _lock:
+        histograms = {key: list(value) for key, value in _histograms.items()}
+        totals = {key: list(value) for key, value in _route_totals.items()}
+        background = list(_background)
+
+    lines = ['# HELP starmap_request_duration_seconds 요청 처리 시간',
+             '# TYPE starmap_request_duration_seconds histogram']
+    for (method, route, status), counts in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), counts):
+            cumulative += count
+            lines.append(f'starmap_request_duration_seconds_bucket'
+                         f'{_labels(method=method, route=route, status=status, le=bound)} {cumulative}')
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f'starmap_request_duration_seconds_sum{labels} {counts[-1]:.6f}')
+        lines.append(f'starmap_request_duration_seconds_count{labels} {cumulative}')
+
+    for i, (name, kind, help_text) in enumerate((
+            ('starmap_request_sqlite_queries_total', 'counter', '요청 안에서 실행한 SQLite 쿼리 수'),
+            ('starmap_request_sqlite_seconds_total', 'counter', '요청 안에서 SQLite execute / fetch 에 쓴 시간'),
+            ('starmap_response_rows_total', 'counter', '응답에 직렬화한 행 수'),
+            ('starmap_response_bytes_total', 'counter', '응답 본문 바이트 (압축된 경우 압축 후)'))):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for (method, route), values in sorted(totals.items()):
+            value = f'{values[i]:.6f}' if isinstance(values[i], float) else values[i]
+            lines.append(f'{name}{_labels(method=method, route=route)} {value}')
+
+    lines += ['# HELP starmap_background_sqlite_queries_total 요청 밖 (백그라운드 스레드) SQLite 쿼리 수',
+              '# TYPE starmap_background_sqlite_queries_total counter',
+              f'starmap_background_sqlite_queries_total {background[0]}',
+              '# HELP starmap_background_sqlite_seconds_total 요청 밖 SQLite 쿼리 시간',
+              '# TYPE starmap_background_sqlite_seconds_total counter',
+              f'starmap_background_sqlite_seconds_total {background[1]:.6f}']
+
+    profiler = _profiler
+    if profiler is not None:
+        lines += ['# HELP starmap_profiled_slow_requests_total 스택을 기록한 느린 요청 수',
+                  '# TYPE starmap_profiled_slow_requests_total counter',
+                  f'starmap_profiled_slow_requests_total {profiler.dumped}']
+
+    for name, help_text, label, fn in _gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        for key, value in sorted(fn().items()):
+            lines.append(f'{name}{_labels(**{label: key})} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------------------------------------------------------
+# 샘플링 프로파일러
+# ----------------------------------------------------------------------------
+
+def _collapse(frame):
+    # 바깥 -> 안쪽 순서의 "파일:함수" 목록 (flamegraph 의 접힌 스택 한 줄)
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """요청 중인 스레드만 INTERVAL 마다 샘플링 (요청이 없으면 sys._current_frames 도 부르지 않음)"""
+
+    def __init__(self, slow_ms, interval=PROFILE_INTERVAL, directory=PROFILE_DIR):
+        self.slow_ms = slow_ms
+        self.interval = interval
+        self.directory = directory
+        self.dumped = 0
+        self._active = {}  # 스레드 id -> {RequestStats, ...}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+
+    def _ensure_thread(self):
+        # fork 된 워커에서는 부모의 샘플링 스레드가 없으므로 처음 쓸 때 시작
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='starmap-profiler', daemon=True).start()
+
+    def attach(self, stats):
+        ident = threading.get_ident()
+        with self._lock:
+            self._ensure_thread()
+            if stats.samples is None:
+                stats.samples = Counter()
+            stats.threads.append(ident)
+            self._active.setdefault(ident, set()).add(stats)
+
+    def detach(self, stats):
+        ident = threading.get_ident()
+        with self._lock:
+            requests = self._active.get(ident)
+            if requests is not None:
+                requests.discard(stats)
+                if not requests:
+                    del self._active[ident]
+            if ident in stats.threads:
+                stats.threads.remove(ident)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._active:
+                    continue
+                active = {ident: list(requests) for ident, requests in self._active.items()}
+            frames = sys._current_frames()
+            for ident, requests in active.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = _collapse(frame)
+                for stats in requests:
+                    stats.samples[stack] += 1
+
+    def dump(self, label, samples):
+        if not samples:
+            return
+        label = label.replace(';', ',')
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'slow-{os.getpid()}.folded')
+        with self._file_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                for stack, count in samples.items():
+                    f.write(f'{label};{stack} {count}\n')
+            self.dumped += 1
+
+    def stop(self):
+        self._stop.set()
+
+
+def enable_profiler(slow_ms, interval=PROFILE_INTERVAL, directory=PROFILE_DIR):
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+    _profiler = SamplingProfiler(slow_ms, interval, directory)
+    return _profiler
+
+
+def disable_profiler():
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+    _profiler = None
+
+
+def configure_from_env():
+    """STARMAP_PROFILE_SLOW_MS 가 있으면 프로파일러를 켬 (STARMAP_PROFILE_INTERVAL_MS 로 샘플 간격)"""
+    slow_ms = os.environ.get('STARMAP_PROFILE_SLOW_MS')
+    if slow_ms and _profiler is None:
+        interval = float(os.environ.get('STARMAP_PROFILE_INTERVAL_MS') or PROFILE_INTERVAL * 1000) / 1000
+        enable_profiler(float(slow_ms), interval)
+
+
+# ----------------------------------------------------------------------------
+# 프레임워크 연결
+# ----------------------------------------------------------------------------
+
+def init_flask(app):
+    """Flask 앱에 before/after_request 훅과 JSON 배열 행 수 집계를 붙임"""
+    from flask import g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class JSONProvider(DefaultJSONProvider):
+        def response(self, *args, **kwargs):
+            # jsonify([...]) 의 배열 길이 = 직렬화한 행 수
+            if len(args) == 1 and isinstance(args[0], list):
+                add_rows(len(args[0]))
+            return super().response(*args, **kwargs)
+
+    app.json_provider_class = JSONProvider
+    app.json = JSONProvider(app)
+
+    @app.before_request
+    def _metrics_begin():
+        g.metrics = begin()
+
+    @app.after_request
+    def _metrics_end(response):
+        started = g.pop('metrics', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else UNMATCHED
+            end(started, request.method, route, response.status_code, response.calculate_content_length() or 0)
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        # 처리되지 않은 예외로 after_request 를 건너뛴 요청
+        started = g.pop('metrics', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else UNMATCHED
+            end(started, request.method, route, 500, 0)
+
+    configure_from_env()
+    return app
+
+
+class ASGIMiddleware:
+    """FastAPI / Starlette 용 계측 미들웨어 (응답 status 와 본문 크기는 send 메시지에서 읽음)"""
+
+    def __init__(self, app):
+        self.app = app
+        configure_from_env()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = begin()
+        response = {'status': 500, 'bytes': 0}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 라우터가 scope 에 매칭된 라우트를 넣어 둠 (경로 파라미터가 아닌 템플릿으로 집계)
+            route = scope.get('route')
+            end(started, scope['method'], getattr(route, 'path', None) or UNMATCHED,
+                response['status'], response['bytes'])
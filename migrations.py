@@ -0,0 +1,639 @@
+"""
+starbucks.db 스키마 마이그레이션 (버전은 PRAGMA user_version 에 기록)
+
+서버(app.py, FastAPI backend)와 ingest 스크립트(db_3.py, db_granular.py)가 시작할 때
+migrate() 를 호출해서 아직 적용되지 않은 단계만 순서대로 적용한다.
+각 단계는 BEGIN IMMEDIATE 트랜잭션 안에서 실행되므로 여러 워커가 동시에 시작해도 한 번만 적용된다.
+
+각 단계의 DDL 은 그 단계를 만든 때의 SQL 을 그대로 적어 둔다 (다른 모듈의 현재 코드를 부르지 않음).
+그래야 새 DB 와 예전 버전에서 올라온 DB 의 스키마가 같다. 스키마를 바꾸려면 기존 단계를 고치지 말고
+새 단계를 뒤에 추가한다 (예: 8 단계가 2 단계의 집계 트리거를 바꿈).
+
+python migrations.py          : 마이그레이션 적용
+python migrations.py --check  : 주요 쿼리의 EXPLAIN QUERY PLAN 이 인덱스를 타는지 + 새 DB 와 스키마가 같은지 확인
+"""
+import hashlib
+import sys
+
+import admin_codes
+import db_pool
+import geo_cache
+import log_analytics
+import store_spatial
+import store_stats
+
+STORE_CODE_SPACE = 1000000
+
+
+def base_store_code(name):
+    # 매장명 기반 해시 (기존 db_3.generate_code 와 같은 값)
+    return int(hashlib.md5(name.encode('utf-8')).hexdigest(), 16) % STORE_CODE_SPACE
+
+
+def allocate_store_code(name, taken):
+    """충돌 검사를 거친 store_code 발급: 해시값이 이미 쓰였으면 다음 빈 번호 (taken 에 추가됨)"""
+    code = base_store_code(name)
+    while code in taken:
+        code = (code + 1) % STORE_CODE_SPACE
+    taken.add(code)
+    return code
+
+
+def _001_stores_schema(conn):
+    """stores: 정수 PK, 유니크 store_name/store_code, 조회/집계용 인덱스"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS action_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_uuid TEXT,
+            action TEXT,
+            target TEXT,
+            ip_address TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS data_generation (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    conn.execute("""
+        CREATE TABLE stores_new (
+            id INTEGER PRIMARY KEY,
+            store_name TEXT NOT NULL,
+            store_code INTEGER NOT NULL,
+            gu TEXT,
+            dong TEXT,
+            lat REAL,
+            lng REAL,
+            address TEXT,
+            visited INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    has_stores = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stores'").fetchone()
+    if has_stores:
+        # pandas to_sql 로 만들어진 기존 테이블: 매장명 중복은 첫 행만, store_code 충돌은 다시 발급
+        rows = conn.execute("""
+            SELECT store_name, store_code, gu, dong, lat, lng, address, COALESCE(visited, 0)
+            FROM stores WHERE store_name IS NOT NULL ORDER BY rowid
+        """).fetchall()
+        seen_names = set()
+        taken = set()
+        copied = []
+        for name, code, *rest in rows:
+            if name in seen_names:
+                continue
+            seen_names.add(name)
+            if code is None or code in taken:
+                code = allocate_store_code(name, taken)
+            else:
+                taken.add(code)
+            copied.append((name, code, *rest))
+        conn.executemany("""
+            INSERT INTO stores_new (store_name, store_code, gu, dong, lat, lng, address, visited)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, copied)
+        conn.execute("DROP TABLE stores")
+
+    conn.execute("ALTER TABLE stores_new RENAME TO stores")
+    conn.execute("CREATE UNIQUE INDEX idx_stores_store_name ON stores (store_name)")
+    conn.execute("CREATE UNIQUE INDEX idx_stores_store_code ON stores (store_code)")
+    # /api/dong-stats 정렬 + 구/동 필터
+    conn.execute("CREATE INDEX idx_stores_gu_dong_name ON stores (gu, dong, store_name)")
+    # 구/동별 방문 집계 (테이블을 읽지 않고 인덱스만으로 처리)
+    conn.execute("CREATE INDEX idx_stores_gu_dong_visited ON stores (gu, dong, visited)")
+
+
+def _002_stats_triggers(conn):
+    """gu_stats / dong_stats 를 PK 가 있는 집계 테이블로 다시 만들고 트리거로 유지"""
+    conn.execute("DROP TABLE IF EXISTS gu_stats")
+    conn.execute("DROP TABLE IF EXISTS dong_stats")
+    conn.execute("""
+        CREATE TABLE gu_stats (
+            gu TEXT PRIMARY KEY,
+            total_stores INTEGER NOT NULL DEFAULT 0,
+            visited_stores INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE dong_stats (
+            gu TEXT NOT NULL,
+            dong TEXT NOT NULL,
+            total_stores INTEGER NOT NULL DEFAULT 0,
+            visited_stores INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (gu, dong)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO gu_stats (gu, total_stores, visited_stores)
+        SELECT COALESCE(gu, '미분류'), COUNT(*), SUM(CASE WHEN visited = 1 THEN 1 ELSE 0 END)
+        FROM stores GROUP BY 1
+    """)
+    conn.execute("""
+        INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+        SELECT COALESCE(gu, '미분류'), COALESCE(dong, '미분류'), COUNT(*),
+               SUM(CASE WHEN visited = 1 THEN 1 ELSE 0 END)
+        FROM stores GROUP BY 1, 2
+    """)
+    # 빈 구/동 정리가 테이블 전체를 훑는 처음 트리거 (8 단계에서 바꿈)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_stats_insert AFTER INSERT ON stores
+        BEGIN
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(NEW.gu, '미분류'), +1, +(NEW.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores + 1, visited_stores = visited_stores + (NEW.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(NEW.gu, '미분류'), COALESCE(NEW.dong, '미분류'), +1, +(NEW.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores + 1, visited_stores = visited_stores + (NEW.visited = 1);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_stats_delete AFTER DELETE ON stores
+        BEGIN
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), COALESCE(OLD.dong, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            DELETE FROM gu_stats WHERE total_stores = 0;
+            DELETE FROM dong_stats WHERE total_stores = 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_stats_update AFTER UPDATE OF gu, dong, visited ON stores
+        WHEN OLD.gu IS NOT NEW.gu OR OLD.dong IS NOT NEW.dong OR OLD.visited IS NOT NEW.visited
+        BEGIN
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), COALESCE(OLD.dong, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(NEW.gu, '미분류'), +1, +(NEW.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores + 1, visited_stores = visited_stores + (NEW.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(NEW.gu, '미분류'), COALESCE(NEW.dong, '미분류'), +1, +(NEW.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores + 1, visited_stores = visited_stores + (NEW.visited = 1);
+            DELETE FROM gu_stats WHERE total_stores = 0;
+            DELETE FROM dong_stats WHERE total_stores = 0;
+        END
+    """)
+
+
+def _003_stores_rtree(conn):
+    """매장 좌표 R*Tree (bbox / 최근접 매장 검색용)"""
+    conn.execute("DROP TABLE IF EXISTS stores_rtree")
+    conn.execute("CREATE VIRTUAL TABLE stores_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)")
+    conn.execute("""
+        INSERT INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT id, lat, lat, lng, lng FROM stores WHERE lat IS NOT NULL AND lng IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_rtree_insert AFTER INSERT ON stores
+        WHEN NEW.lat IS NOT NULL AND NEW.lng IS NOT NULL
+        BEGIN
+            INSERT INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (NEW.id, NEW.lat, NEW.lat, NEW.lng, NEW.lng);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_rtree_delete AFTER DELETE ON stores
+        BEGIN
+            DELETE FROM stores_rtree WHERE id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_rtree_update AFTER UPDATE OF lat, lng ON stores
+        WHEN OLD.lat IS NOT NEW.lat OR OLD.lng IS NOT NEW.lng
+        BEGIN
+            DELETE FROM stores_rtree WHERE id = OLD.id;
+            INSERT INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+            SELECT NEW.id, NEW.lat, NEW.lat, NEW.lng, NEW.lng
+            WHERE NEW.lat IS NOT NULL AND NEW.lng IS NOT NULL;
+        END
+    """)
+
+
+def _004_visit_changes(conn):
+    """방문 상태 변경 로그 (visit_changes, /api/visits/changes 의 동기화 버전)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS visit_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_id INTEGER NOT NULL,
+            visited INTEGER NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_visit_log AFTER UPDATE OF visited ON stores
+        WHEN OLD.visited IS NOT NEW.visited
+        BEGIN
+            INSERT INTO visit_changes (store_id, visited) VALUES (NEW.id, NEW.visited);
+        END
+    """)
+
+
+def _005_user_visits(conn):
+    """사용자별 방문 기록 (WITHOUT ROWID) + 구/동 진행률 + 사용자별 변경 로그"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            uuid TEXT NOT NULL UNIQUE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_visits (
+            user_id INTEGER NOT NULL,
+            store_id INTEGER NOT NULL,
+            visited_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, store_id)
+        ) WITHOUT ROWID
+    """)
+    # 매장 삭제 / 구·동 변경 때 그 매장을 방문한 사용자 찾기
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_visits_store ON user_visits (store_id, user_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_gu_progress (
+            user_id INTEGER NOT NULL,
+            gu TEXT NOT NULL,
+            visited_stores INTEGER NOT NULL,
+            PRIMARY KEY (user_id, gu)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_dong_progress (
+            user_id INTEGER NOT NULL,
+            gu TEXT NOT NULL,
+            dong TEXT NOT NULL,
+            visited_stores INTEGER NOT NULL,
+            PRIMARY KEY (user_id, gu, dong)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_visit_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            store_id INTEGER NOT NULL,
+            visited INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_visit_changes_user ON user_visit_changes (user_id, version)")
+    # user_visits INSERT / DELETE 때 사용자별 구/동 방문 수 +1/-1 과 변경 로그
+    conn.execute("""
+        CREATE TRIGGER trg_user_visits_insert AFTER INSERT ON user_visits
+        BEGIN
+            INSERT INTO user_gu_progress (user_id, gu, visited_stores)
+            SELECT NEW.user_id, COALESCE(gu, '미분류'), 1 FROM stores WHERE id = NEW.store_id
+            ON CONFLICT(user_id, gu) DO UPDATE SET visited_stores = visited_stores + 1;
+            INSERT INTO user_dong_progress (user_id, gu, dong, visited_stores)
+            SELECT NEW.user_id, COALESCE(gu, '미분류'), COALESCE(dong, '미분류'), 1 FROM stores WHERE id = NEW.store_id
+            ON CONFLICT(user_id, gu, dong) DO UPDATE SET visited_stores = visited_stores + 1;
+            INSERT INTO user_visit_changes (user_id, store_id, visited) VALUES (NEW.user_id, NEW.store_id, 1);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_user_visits_delete AFTER DELETE ON user_visits
+        BEGIN
+            UPDATE user_gu_progress SET visited_stores = visited_stores - 1
+            WHERE user_id = OLD.user_id
+              AND gu = (SELECT COALESCE(gu, '미분류') FROM stores WHERE id = OLD.store_id);
+            UPDATE user_dong_progress SET visited_stores = visited_stores - 1
+            WHERE user_id = OLD.user_id
+              AND (gu, dong) = (SELECT COALESCE(gu, '미분류'), COALESCE(dong, '미분류') FROM stores WHERE id = OLD.store_id);
+            DELETE FROM user_gu_progress WHERE user_id = OLD.user_id AND visited_stores = 0;
+            DELETE FROM user_dong_progress WHERE user_id = OLD.user_id AND visited_stores = 0;
+            INSERT INTO user_visit_changes (user_id, store_id, visited) VALUES (OLD.user_id, OLD.store_id, 0);
+        END
+    """)
+    # 매장이 삭제되기 "전에" 방문 기록을 지워야 위 삭제 트리거가 매장의 구/동을 찾을 수 있음
+    conn.execute("""
+        CREATE TRIGGER trg_stores_user_visits_delete BEFORE DELETE ON stores
+        BEGIN
+            DELETE FROM user_visits WHERE store_id = OLD.id;
+        END
+    """)
+    # ingest 로 매장의 구/동이 바뀌면 그 매장을 방문한 사용자들의 진행률만 옮김
+    conn.execute("""
+        CREATE TRIGGER trg_stores_user_progress_move AFTER UPDATE OF gu, dong ON stores
+        WHEN OLD.gu IS NOT NEW.gu OR OLD.dong IS NOT NEW.dong
+        BEGIN
+            UPDATE user_gu_progress SET visited_stores = visited_stores - 1
+            WHERE gu = COALESCE(OLD.gu, '미분류')
+              AND user_id IN (SELECT user_id FROM user_visits WHERE store_id = OLD.id);
+            UPDATE user_dong_progress SET visited_stores = visited_stores - 1
+            WHERE gu = COALESCE(OLD.gu, '미분류') AND dong = COALESCE(OLD.dong, '미분류')
+              AND user_id IN (SELECT user_id FROM user_visits WHERE store_id = OLD.id);
+            INSERT INTO user_gu_progress (user_id, gu, visited_stores)
+            SELECT user_id, COALESCE(NEW.gu, '미분류'), 1 FROM user_visits WHERE store_id = NEW.id
+            ON CONFLICT(user_id, gu) DO UPDATE SET visited_stores = visited_stores + 1;
+            INSERT INTO user_dong_progress (user_id, gu, dong, visited_stores)
+            SELECT user_id, COALESCE(NEW.gu, '미분류'), COALESCE(NEW.dong, '미분류'), 1
+            FROM user_visits WHERE store_id = NEW.id
+            ON CONFLICT(user_id, gu, dong) DO UPDATE SET visited_stores = visited_stores + 1;
+            DELETE FROM user_gu_progress
+            WHERE gu = COALESCE(OLD.gu, '미분류') AND visited_stores = 0
+              AND user_id IN (SELECT user_id FROM user_visits WHERE store_id = OLD.id);
+            DELETE FROM user_dong_progress
+            WHERE gu = COALESCE(OLD.gu, '미분류') AND dong = COALESCE(OLD.dong, '미분류') AND visited_stores = 0
+              AND user_id IN (SELECT user_id FROM user_visits WHERE store_id = OLD.id);
+        END
+    """)
+
+
+def _006_admin_codes(conn):
+    """행정동 코드 표 + stores.adm_cd (동 이름 문자열 대신 정수 코드로 조인)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_areas (
+            adm_cd INTEGER PRIMARY KEY,
+            adm_cd2 INTEGER NOT NULL,
+            gu_code INTEGER NOT NULL,
+            gu TEXT NOT NULL,
+            dong TEXT NOT NULL,
+            adm_nm TEXT NOT NULL
+        )
+    """)
+    # 동별 통계(dong_stats) -> 코드 조회
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_areas_gu_dong ON admin_areas (gu, dong)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_aliases (
+            gu TEXT NOT NULL,
+            alias TEXT NOT NULL,
+            adm_cd INTEGER NOT NULL,
+            PRIMARY KEY (gu, alias, adm_cd)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("ALTER TABLE stores ADD COLUMN adm_cd INTEGER")
+
+    # 데이터: 코드 표는 GeoJSON 에서 (내용은 원본 파일을 따름, 이후 ingest 때마다 admin_codes.sync 가 맞춤)
+    features = geo_cache.load('dong').features
+    conn.executemany("""
+        INSERT INTO admin_areas (adm_cd, adm_cd2, gu_code, gu, dong, adm_nm) VALUES (?, ?, ?, ?, ?, ?)
+    """, sorted((f['adm_cd'], f['adm_cd2'], f['gu_code'], f['gu'], f['dong'], f['adm_nm']) for f in features))
+    conn.executemany("INSERT INTO admin_aliases (gu, alias, adm_cd) VALUES (?, ?, ?)", admin_codes.alias_rows())
+    # 매장의 (gu, dong) 이 코드 표의 정식 이름이나 별칭이면 adm_cd 를 채우고 이름도 정식 이름으로
+    updates = []
+    for store_id, gu, dong in conn.execute("SELECT id, gu, dong FROM stores").fetchall():
+        area = admin_codes.resolve(gu, dong)
+        if area is not None:
+            updates.append((area['gu'], area['dong'], area['adm_cd'], store_id))
+    conn.executemany("UPDATE stores SET gu = ?, dong = ?, adm_cd = ? WHERE id = ?", updates)
+
+
+def _007_log_rollups(conn):
+    """action_logs 인덱스 + 시간/일별 롤업 테이블 (기존 로그는 처음 refresh() 때 반영)"""
+    # 기간 / 사용자별 원본 조회용
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_action_logs_timestamp ON action_logs (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_action_logs_user_time ON action_logs (user_uuid, timestamp)")
+    # action / target 이 NULL 이면 '' 로 (NULL 은 PRIMARY KEY 에서 서로 다른 값으로 취급되므로)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_hourly (
+            hour TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT NOT NULL,
+            events INTEGER NOT NULL,
+            PRIMARY KEY (hour, action, target)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_daily (
+            day TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT NOT NULL,
+            events INTEGER NOT NULL,
+            PRIMARY KEY (day, action, target)
+        ) WITHOUT ROWID
+    """)
+    # 특정 action 의 기간별 target 순위
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_daily_action ON log_daily (action, day, target, events)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_daily_users (
+            day TEXT NOT NULL,
+            user_uuid TEXT NOT NULL,
+            PRIMARY KEY (day, user_uuid)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_daily_totals (
+            day TEXT PRIMARY KEY,
+            events INTEGER NOT NULL,
+            users INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_rollup_state (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            last_log_id INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO log_rollup_state (id, last_log_id) VALUES (0, 0)")
+
+
+def _008_stats_trigger_scope(conn):
+    """집계 트리거 다시 만들기: 빈 구/동 정리를 바뀐 줄로 한정, 방문 여부만 바뀌면 visited_stores 만 고침"""
+    conn.execute("DROP TRIGGER IF EXISTS trg_stores_stats_delete")
+    conn.execute("DROP TRIGGER IF EXISTS trg_stores_stats_update")
+    conn.execute("""
+        CREATE TRIGGER trg_stores_stats_delete AFTER DELETE ON stores
+        BEGIN
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), COALESCE(OLD.dong, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            DELETE FROM gu_stats WHERE gu = COALESCE(OLD.gu, '미분류') AND total_stores = 0;
+            DELETE FROM dong_stats
+            WHERE gu = COALESCE(OLD.gu, '미분류') AND dong = COALESCE(OLD.dong, '미분류') AND total_stores = 0;
+        END
+    """)
+    # 구/동이 바뀐 경우: 이전 구/동에서 빼고 새 구/동에 더함 (이전 구/동이 비었으면 그 줄만 지움)
+    conn.execute("""
+        CREATE TRIGGER trg_stores_stats_update AFTER UPDATE OF gu, dong, visited ON stores
+        WHEN OLD.gu IS NOT NEW.gu OR OLD.dong IS NOT NEW.dong
+        BEGIN
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(OLD.gu, '미분류'), COALESCE(OLD.dong, '미분류'), -1, -(OLD.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores - 1, visited_stores = visited_stores - (OLD.visited = 1);
+            INSERT INTO gu_stats (gu, total_stores, visited_stores)
+            VALUES (COALESCE(NEW.gu, '미분류'), +1, +(NEW.visited = 1))
+            ON CONFLICT(gu) DO UPDATE SET
+                total_stores = total_stores + 1, visited_stores = visited_stores + (NEW.visited = 1);
+            INSERT INTO dong_stats (gu, dong, total_stores, visited_stores)
+            VALUES (COALESCE(NEW.gu, '미분류'), COALESCE(NEW.dong, '미분류'), +1, +(NEW.visited = 1))
+            ON CONFLICT(gu, dong) DO UPDATE SET
+                total_stores = total_stores + 1, visited_stores = visited_stores + (NEW.visited = 1);
+            DELETE FROM gu_stats WHERE gu = COALESCE(OLD.gu, '미분류') AND total_stores = 0;
+            DELETE FROM dong_stats
+            WHERE gu = COALESCE(OLD.gu, '미분류') AND dong = COALESCE(OLD.dong, '미분류') AND total_stores = 0;
+        END
+    """)
+    # 방문 여부만 바뀐 경우: 매장 수는 그대로이므로 그 구/동 한 줄의 visited_stores 만 +1/-1
+    conn.execute("""
+        CREATE TRIGGER trg_stores_stats_visit AFTER UPDATE OF visited ON stores
+        WHEN OLD.gu IS NEW.gu AND OLD.dong IS NEW.dong AND OLD.visited IS NOT NEW.visited
+        BEGIN
+            UPDATE gu_stats SET visited_stores = visited_stores + (NEW.visited = 1) - (OLD.visited = 1)
+            WHERE gu = COALESCE(NEW.gu, '미분류');
+            UPDATE dong_stats SET visited_stores = visited_stores + (NEW.visited = 1) - (OLD.visited = 1)
+            WHERE gu = COALESCE(NEW.gu, '미분류') AND dong = COALESCE(NEW.dong, '미분류');
+        END
+    """)
+
+
+# (버전, 설명, 함수) - 새 단계는 항상 맨 뒤에 추가
+MIGRATIONS = [
+    (1, 'stores primary key, unique store_code, covering indexes', _001_stores_schema),
+    (2, 'materialized gu_stats / dong_stats maintained by triggers', _002_stats_triggers),
+    (3, 'R*Tree spatial index on store coordinates', _003_stores_rtree),
+    (4, 'visit change log for delta sync', _004_visit_changes),
+    (5, 'per-user visits with incremental progress counts', _005_user_visits),
+    (6, 'administrative dong code table and stores.adm_cd', _006_admin_codes),
+    (7, 'action_logs indexes and hourly/daily rollups', _007_log_rollups),
+    (8, 'scope stats trigger cleanup to the changed group', _008_stats_trigger_scope),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn=None, verbose=False):
+    """아직 적용되지 않은 마이그레이션을 순서대로 적용하고 현재 버전을 반환"""
+    own = conn is None
+    if own:
+        conn = db_pool.connect()
+    try:
+        if schema_version(conn) >= LATEST_VERSION:
+            return schema_version(conn)
+        for version, description, func in MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 다른 프로세스가 먼저 적용했을 수 있으므로 락을 잡은 뒤 다시 확인
+                if schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                func(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if verbose:
+                print(f"Applied migration {version}: {description}")
+        return schema_version(conn)
+    finally:
+        if own:
+            conn.close()
+
+
+# (쿼리, 파라미터, 쿼리 플랜에 있어야 하는 문자열, 없어야 하는 문자열)
+QUERY_PLAN_CHECKS = [
+    ("UPDATE stores SET visited = ? WHERE store_code = ?", (1, 1),
+     'USING INDEX idx_stores_store_code', None),
+    ("UPDATE stores SET visited = ? WHERE store_name = ?", (1, ''),
+     'USING INDEX idx_stores_store_name', None),
+    ("SELECT * FROM stores WHERE gu = ? ORDER BY gu, dong, store_name", ('',),
+     'USING INDEX idx_stores_gu_dong_name (gu=?)', 'TEMP B-TREE'),
+    ("SELECT * FROM stores WHERE gu = ? AND dong = ? ORDER BY gu, dong, store_name", ('', ''),
+     'USING INDEX idx_stores_gu_dong_name (gu=? AND dong=?)', 'TEMP B-TREE'),
+    ("SELECT * FROM stores ORDER BY gu, dong, store_name", (),
+     'idx_stores_gu_dong_name', 'TEMP B-TREE'),
+    ("SELECT gu, COUNT(*), SUM(CASE WHEN visited = 1 THEN 1 ELSE 0 END) FROM stores GROUP BY gu ORDER BY gu", (),
+     'USING COVERING INDEX idx_stores_gu_dong_visited', 'TEMP B-TREE'),
+    ("SELECT gu, total_stores, visited_stores FROM gu_stats ORDER BY gu", (),
+     'sqlite_autoindex_gu_stats_1', 'TEMP B-TREE'),
+    (store_stats.DONG_STATS_SQL, ('',),
+     'sqlite_autoindex_dong_stats_1 (gu=?)', 'TEMP B-TREE'),
+    (store_stats.DONG_STATS_SQL, ('',),
+     'INDEX idx_admin_areas_gu_dong (gu=? AND dong=?)', None),
+    ("SELECT MAX(version) FROM visit_changes WHERE version > ? AND version <= ? GROUP BY store_id", (0, 0),
+     'SEARCH visit_changes USING INTEGER PRIMARY KEY (rowid>? AND rowid<?)', None),
+    ("SELECT gu, visited_stores FROM user_gu_progress WHERE user_id = ?", (0,),
+     'SEARCH user_gu_progress USING PRIMARY KEY (user_id=?)', None),
+    ("SELECT user_id FROM user_visits WHERE store_id = ?", (0,),
+     'USING COVERING INDEX idx_user_visits_store (store_id=?)', None),
+    ("SELECT MAX(version) FROM user_visit_changes WHERE user_id = ?", (0,),
+     'idx_user_visit_changes_user', None),
+    (store_spatial.BBOX_SQL, (0,) * 9,
+     'SCAN r VIRTUAL TABLE INDEX', 'SCAN s'),
+    ("SELECT COUNT(*) FROM action_logs WHERE id > ? AND id <= ?", (0, 0),
+     'SEARCH action_logs USING INTEGER PRIMARY KEY (rowid>? AND rowid<?)', None),
+    ("SELECT COUNT(*) FROM action_logs WHERE timestamp >= ?", ('',),
+     'idx_action_logs_timestamp (timestamp>?)', None),
+    ("SELECT action, timestamp FROM action_logs WHERE user_uuid = ? ORDER BY timestamp", ('',),
+     'idx_action_logs_user_time (user_uuid=?)', 'TEMP B-TREE'),
+    ("SELECT day, action, SUM(events) FROM log_daily WHERE day BETWEEN ? AND ? GROUP BY day, action", ('', ''),
+     'SEARCH log_daily USING PRIMARY KEY (day>? AND day<?)', None),
+    ("SELECT day, events, users FROM log_daily_totals WHERE day BETWEEN ? AND ?", ('', ''),
+     'SEARCH log_daily_totals USING PRIMARY KEY (day>? AND day<?)', None),
+    ("SELECT COUNT(*) FROM log_daily_users u WHERE u.day = ?", ('',),
+     'SEARCH u USING PRIMARY KEY (day=?)', None),
+    (log_analytics.TOP_TARGETS_SQL, ('', '', '', 1),
+     'COVERING INDEX idx_log_daily_action (action=? AND day>? AND day<?)', None),
+]
+
+
+def check_query_plans(conn):
+    """QUERY_PLAN_CHECKS 를 실행해서 인덱스를 안 타는 쿼리 목록을 반환 (비어 있으면 통과)"""
+    failures = []
+    for sql, params, expected, forbidden in QUERY_PLAN_CHECKS:
+        plan = ' | '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        if expected not in plan or (forbidden and forbidden in plan):
+            failures.append((sql, plan))
+    return failures
+
+
+def schema_sql(conn):
+    """sqlite_master 의 (종류, 이름, 공백을 정리한 SQL) 목록 (통계 테이블 제외)"""
+    rows = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name
+    """).fetchall()
+    return [(kind, name, ' '.join((sql or '').split())) for kind, name, sql in rows]
+
+
+def check_schema(conn):
+    """빈 DB 에 처음부터 적용한 스키마와 conn 의 스키마가 다른 항목 목록 (비어 있으면 일치)"""
+    fresh = db_pool.connect(path=':memory:')
+    try:
+        migrate(fresh)
+        expected = {(kind, name): sql for kind, name, sql in schema_sql(fresh)}
+    finally:
+        fresh.close()
+    actual = {(kind, name): sql for kind, name, sql in schema_sql(conn)}
+    return [key for key in sorted(set(expected) | set(actual)) if expected.get(key) != actual.get(key)]
+
+
+if __name__ == '__main__':
+    conn = db_pool.connect()
+    version = migrate(conn, verbose=True)
+    print(f"Schema version: {version}")
+    if '--check' in sys.argv:
+        failures = check_query_plans(conn)
+        for sql, plan in failures:
+            print(f"FAIL: {sql}\n      plan: {plan}")
+        print(f"Query plan checks: {len(QUERY_PLAN_CHECKS) - len(failures)}/{len(QUERY_PLAN_CHECKS)} passed")
+        schema_diffs = check_schema(conn)
+        for kind, name in schema_diffs:
+            print(f"FAIL: {kind} {name} differs from a freshly migrated database")
+        print(f"Schema vs fresh database: {'OK' if not schema_diffs else f'{len(schema_diffs)} differences'}")
+        conn.close()
+        sys.exit(1 if failures or schema_diffs else 0)
+    conn.close()
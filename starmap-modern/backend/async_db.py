@@ -0,0 +1,58 @@
+# ============================================================================
+# 🎓 LEARNING NOTE: async def 안에서 sqlite3 를 쓰면 안 되는 이유
+# ============================================================================
+#
+# 📌 문제
+# - sqlite3 는 "동기(blocking)" 라이브러리. 쿼리가 끝날 때까지 스레드를 붙잡고 있음
+# - async def 핸들러 안에서 바로 부르면 uvicorn 이벤트 루프(스레드 1개)가 멈춤
+#   → 느린 쿼리 하나, 쓰기 락 대기 하나 때문에 "모든" 클라이언트가 같이 기다림
+#
+# 📌 해결: DB 작업은 별도 스레드 풀에서 실행하고 await 로 결과만 기다림
+# - 읽기: READ_WORKERS 개 스레드 (스레드마다 db_pool 의 읽기 전용 연결을 하나씩 가짐)
+# - 쓰기: 스레드 1개 (SQLite 는 어차피 쓰기가 한 번에 하나 → 전용 writer 로 줄 세움)
+# - 동시에 스레드 풀로 보내는 작업 수를 세마포어로 제한 (넘치면 이벤트 루프에서 대기)
+# ============================================================================
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+READ_WORKERS = 8
+MAX_PENDING_READS = 64
+MAX_PENDING_WRITES = 256
+
+_read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-read")
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+# 📌 Python 3.10+ 의 asyncio.Semaphore 는 처음 쓸 때 이벤트 루프에 연결되므로 모듈에서 만들어도 됨
+_read_slots = asyncio.Semaphore(MAX_PENDING_READS)
+_write_slots = asyncio.Semaphore(MAX_PENDING_WRITES)
+
+
+async def _run(executor, slots, func, *args, **kwargs):
+    # 📌 run_in_executor 는 contextvars 를 넘겨주지 않음 (asyncio.to_thread 와 다름)
+    # - 현재 요청의 context 를 복사해서 그 안에서 실행해야 스레드에서 실행한 쿼리가
+    #   이 요청의 쿼리 수 / 시간으로 집계됨 (metrics.py)
+    call = functools.partial(contextvars.copy_context().run, metrics.traced, func, *args, **kwargs)
+    async with slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, call)
+
+
+async def run_read(func, *args, **kwargs):
+    """읽기 작업(func)을 읽기 스레드 풀에서 실행하고 결과를 반환"""
+    return await _run(_read_executor, _read_slots, func, *args, **kwargs)
+
+
+async def run_write(func, *args, **kwargs):
+    """쓰기 작업(func)을 전용 writer 스레드에서 순서대로 실행하고 결과를 반환"""
+    return await _run(_write_executor, _write_slots, func, *args, **kwargs)
+
+
+def shutdown():
+    """서버 종료 시 스레드 풀 정리 (진행 중인 쓰기는 끝까지 기다림)"""
+    _read_executor.shutdown(wait=False)
+    _write_executor.shutdown(wait=True)
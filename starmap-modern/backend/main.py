@@ -25,12 +25,40 @@
 # sqlite3: 데이터베이스 연결용 (기존과 동일)
 # pydantic: 데이터 검증용 (FastAPI의 핵심 파트너)
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware  # React와 통신할 때 필요!
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel  # 데이터 형식 정의용
-from typing import List, Optional
-import sqlite3
+from pydantic import BaseModel, Field  # 데이터 형식 정의용
+from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import sys
+
+# 📌 DB 연결 관리는 Flask app.py 와 같은 모듈(db_pool.py)을 공유함
+# - starmap-modern/backend/ → 프로젝트 루트(starmap/)를 import 경로에 추가
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import db_pool
+import geo_assets
+import http_cache
+import log_analytics
+import log_writer
+import metrics
+import migrations
+import store_cache
+import store_columnar
+import store_spatial
+import store_stats
+import user_visits
+import vector_tiles
+import visit_sync
+import visit_writer
+
+import async_db  # DB 작업을 이벤트 루프 밖(스레드 풀)에서 실행
 
 # [2] FastAPI 앱 생성
 # ----------------------------------------------------------------------------
@@ -38,12 +66,35 @@ import sqlite3
 # - FastAPI()를 호출하면 웹 서버 인스턴스가 만들어짐
 # - title, description은 자동 생성되는 API 문서에 표시됨
 
+# 📌 lifespan: 서버가 켜질 때/꺼질 때 한 번씩 실행할 코드
+# - 꺼질 때 DB 스레드 풀을 정리 (진행 중인 쓰기는 끝까지 기다림)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    async_db.shutdown()
+
+
+# 📌 기본 JSON 응답 클래스: 배열을 응답하면 그 길이를 "직렬화한 행 수" 로 기록 (metrics.py)
+class MetricsJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if isinstance(content, list):
+            metrics.add_rows(len(content))
+        return super().render(content)
+
+
 app = FastAPI(
     title="StarMap Seoul API",
     description="스타벅스 매장 방문 기록 관리 API",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=MetricsJSONResponse,
 )
 
+# 📌 서버가 시작될 때 DB 스키마를 최신 버전으로 맞춤 (migrations.py)
+# - PRAGMA user_version 으로 어디까지 적용됐는지 기록하므로 이미 적용된 단계는 건너뜀
+# - Flask app.py 도 똑같이 시작할 때 실행함
+migrations.migrate()
+
 # [3] CORS 설정 (Cross-Origin Resource Sharing)
 # ----------------------------------------------------------------------------
 # 📌 왜 필요한가?
@@ -63,6 +114,15 @@ app.add_middleware(
     allow_headers=["*"],  # 모든 헤더 허용
 )
 
+# 📌 요청 계측 미들웨어 (metrics.py, Flask app.py 와 같은 집계를 공유)
+# - 라우트별 지연 시간 히스토그램, 요청당 SQLite 쿼리 수 / 시간, 응답 행 수 / 바이트
+# - 결과는 GET /metrics (Prometheus 형식)
+# - STARMAP_PROFILE_SLOW_MS=250 으로 띄우면 느린 요청의 스택을 profiles/ 에 기록 (flamegraph 용)
+# - 마지막에 추가한 미들웨어가 가장 바깥 → CORS 처리 시간까지 포함해서 잼
+app.add_middleware(metrics.ASGIMiddleware)
+metrics.register_gauges('starmap_log_writer', 'log_writer 큐 / 기록 통계', 'stat', log_writer.stats)
+metrics.register_gauges('starmap_visit_writer', 'visit_writer 큐 / 기록 통계', 'stat', visit_writer.stats)
+
 
 # [4] Pydantic 모델 정의 (데이터 형식 명세서)
 # ----------------------------------------------------------------------------
@@ -76,10 +136,12 @@ app.add_middleware(
 
 class Store(BaseModel):
     """매장 정보를 담는 데이터 형식"""
+    id: int                # 매장 고유 번호 (DB 의 PRIMARY KEY)
     store_name: str        # 문자열 (필수)
     store_code: int        # 정수 (필수)
     gu: str                # 구 이름
     dong: str              # 동 이름
+    adm_cd: Optional[int] = None  # 행정동 코드 (지도 GeoJSON 의 adm_cd 와 같은 값, admin_codes.py)
     lat: float             # 위도 (소수점)
     lng: float             # 경도 (소수점)
     address: str           # 주소
@@ -89,6 +151,25 @@ class VisitUpdate(BaseModel):
     """방문 상태 업데이트 요청 형식"""
     store_code: int
     visited: bool
+    uuid: Optional[str] = None  # 있으면 이 사용자의 방문 기록만 바꿈 (user_visits.py)
+
+class VisitBulk(BaseModel):
+    """방문 목록 일괄 반영 (localStorage 의 visited_stores 를 그대로 보냄)"""
+    store_names: List[str] = Field(default_factory=list, max_length=visit_sync.MAX_BULK)
+    store_codes: List[int] = Field(default_factory=list, max_length=visit_sync.MAX_BULK)
+    replace: bool = False  # True 면 목록에 없는 매장은 미방문으로
+    uuid: Optional[str] = None  # 있으면 이 사용자의 방문 기록에 반영
+
+class LogEvent(BaseModel):
+    """사용자 행동 로그 한 건"""
+    uuid: Optional[str] = None
+    action: Optional[str] = None
+    target: Optional[str] = None
+
+class LogBatch(BaseModel):
+    """여러 로그를 한 번에 보내는 요청 형식 (events 의 uuid 가 없으면 바깥 uuid 사용)"""
+    uuid: Optional[str] = None
+    events: List[LogEvent] = Field(..., max_length=500)
 
 
 # [5] 데이터베이스 연결 함수
@@ -97,16 +178,77 @@ class VisitUpdate(BaseModel):
 # - 같은 코드를 여러 번 쓰지 않기 위해 (DRY 원칙: Don't Repeat Yourself)
 # - 나중에 DB를 바꿀 때 (SQLite → PostgreSQL) 이 함수만 수정하면 됨
 
-def get_db_connection():
-    """SQLite 데이터베이스에 연결하고 커넥션을 반환"""
-    # 📌 경로 설명: 
-    # - backend/ 폴더에서 실행하므로 ../../starbucks.db 로 올라가야 함
-    # - starmap-modern/backend/ → starmap-modern/ → starmap/starbucks.db
-    import os
-    db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'starbucks.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row  # 결과를 딕셔너리처럼 사용 가능하게
-    return conn
+def get_db_connection(readonly=True):
+    """스레드별로 풀링된 SQLite 연결을 반환 (요청마다 새로 열고 닫지 않음)"""
+    # 📌 예전 방식:
+    # - 요청마다 sqlite3.connect() → PRAGMA → close() 를 반복했음
+    # - 부하가 걸리면 이 연결 비용이 요청 시간의 대부분을 차지!
+    #
+    # 📌 지금 방식 (db_pool.py):
+    # - 스레드마다 연결을 하나씩 만들어 계속 재사용 (close 하지 않음)
+    # - GET 요청은 읽기 전용(mode=ro) 연결, 쓰기 요청은 WAL 모드 연결 사용
+    # - DB 경로는 db_pool.DB_PATH (프로젝트 루트의 starbucks.db) 로 고정
+    return db_pool.get_conn(readonly=readonly)
+
+
+# [5-1] 캐시 가능한 응답 만들기 (ETag + 미리 압축된 본문)
+# ----------------------------------------------------------------------------
+# 📌 왜 필요한가?
+# - 지도 GeoJSON(930KB)과 매장 JSON은 거의 안 바뀌는데 매번 전부 다운로드하고 있었음
+# - ETag: 응답 내용의 "지문". 브라우저가 If-None-Match 헤더로 지문을 보내면
+#   내용이 같을 때 본문 없이 304 Not Modified 만 보냄 → 재방문 시 거의 0 바이트
+# - gzip/brotli 압축본은 시작할 때(또는 데이터가 바뀔 때) 한 번만 만들어 두고 재사용
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'public', 'static')
+STATIC_GEOJSON = ('seoul_map.geojson', 'seoul_gu_map.geojson')
+for _name in STATIC_GEOJSON:
+    http_cache.load_static(os.path.join(STATIC_DIR, _name))
+
+# 📌 서빙 번들 (bundle.py): `python bundle.py` 로 미리 만들어 둔 직렬화·압축 결과를 mmap 으로 열어 씀
+# - 워커가 여러 개여도 같은 파일을 OS 페이지 캐시로 공유 → 워커마다 JSON 을 다시 만들지 않고 메모리도 덜 씀
+# - 번들이 없거나 DB 와 맞지 않으면 아무것도 하지 않음 (기존처럼 첫 요청 때 SQLite 에서 만듦)
+store_cache.preload()
+
+
+async def get_snapshot(gu: Optional[str] = None, dong: Optional[str] = None):
+    """매장 목록 스냅샷 (캐시에 있으면 바로, 없으면 읽기 스레드에서 SQLite 조회)"""
+    # 📌 캐시 적중(대부분의 요청)은 스레드 전환 없이 이벤트 루프에서 바로 응답
+    snapshot = store_cache.peek(gu, dong)
+    if snapshot is None:
+        snapshot = await async_db.run_read(store_cache.get_stores, gu, dong)
+    metrics.add_rows(snapshot.count)  # 미리 직렬화된 응답이라 JSON 응답 클래스를 거치지 않음
+    return snapshot
+
+
+async def stores_response(request: Request, gu: Optional[str], dong: Optional[str], format: str,
+                          fields: Optional[str], cursor: Optional[str], limit: Optional[int]):
+    """매장 목록 응답: format=json 이면 기존 행 배열, columnar/msgpack 이면 컬럼형 페이지"""
+    if format == "json":
+        if fields or cursor or limit:
+            raise HTTPException(status_code=400, detail="fields / cursor / limit 는 format=columnar 에서만 쓸 수 있습니다")
+        snapshot = await get_snapshot(gu, dong)
+        return cached_response(request, snapshot.http)
+
+    # 📌 컬럼형 응답 (store_columnar.py)
+    # - [{"id":1,"gu":"강남구",...}, ...] 처럼 행마다 키 이름을 반복하지 않고 컬럼별 배열로 보냄
+    # - gu/dong 은 문자열 대신 사전 번호 (0, 0, 0, 1, ...) → 크기가 크게 줄어듦
+    # - Pydantic 행 검증 없이 미리 인코딩된 bytes 를 그대로 응답
+    try:
+        params = store_columnar.validate(format, fields, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cached = store_columnar.peek(gu, dong, *params)
+    if cached is None:
+        cached = await async_db.run_read(store_columnar.get_page, gu, dong, *params)
+    return cached_response(request, cached, store_columnar.MEDIA_TYPES[format])
+
+
+def cached_response(request: Request, cached, media_type="application/json"):
+    """요청 헤더(Accept-Encoding, If-None-Match)에 맞춰 200 압축본 또는 304 응답"""
+    status, body, headers = http_cache.select(
+        cached, request.headers.get("accept-encoding"), request.headers.get("if-none-match"))
+    # 📌 body 가 서빙 번들(bundle.py)의 memoryview 여도 Starlette Response 가 복사 없이 그대로 보냄
+    return Response(content=body, status_code=status, headers=headers, media_type=media_type)
 
 
 # [6] API 엔드포인트 정의
@@ -135,8 +277,76 @@ async def root():
     return {"message": "StarMap Seoul API v2.0 - FastAPI Edition"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus 형식 계측 값 (metrics.py)
+
+    📌 include_in_schema=False: 모니터링용이라 /docs API 문서에는 표시하지 않음
+    - 값은 이 프로세스 안에서만 모은 것 (uvicorn 워커가 여럿이면 워커마다 다름)
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/static/{name}.geojson")
+async def get_geojson(name: str, request: Request):
+    """지도 GeoJSON (ETag + gzip/brotli)"""
+    filename = f"{name}.geojson"
+    if filename not in STATIC_GEOJSON:
+        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다")
+    cached = http_cache.load_static(os.path.join(STATIC_DIR, filename))
+    return cached_response(request, cached, "application/geo+json")
+
+
+@app.get("/api/geo/{layer}")
+async def get_geo(layer: str, request: Request, zoom: Optional[float] = None, format: str = "geojson"):
+    """
+    줌 레벨에 맞게 단순화된 지도 (layer: dong 또는 gu, format: geojson 또는 topojson)
+
+    📌 왜?
+    - 원본 GeoJSON 은 좌표가 소수점 15자리라 930KB나 됨
+    - geo_build.py 가 줌 레벨별로 단순화 + 좌표 양자화한 파일을 미리 만들어 둠
+    - 서버는 ?zoom= 값에 맞는 파일만 골라서 보내줌 (화면에 필요한 만큼만!)
+    """
+    resolved = geo_assets.resolve(layer, zoom, format)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="지도 레이어를 찾을 수 없습니다")
+    path, media_type = resolved
+    return cached_response(request, http_cache.load_static(path), media_type)
+
+
+@app.get("/tiles/tiles.json")
+async def get_tilejson(request: Request):
+    """벡터 타일 설명서 (TileJSON): 타일 주소, 줌 범위, 레이어/속성 목록"""
+    base = str(request.base_url).rstrip("/")
+    return vector_tiles.tilejson(base + "/tiles/{z}/{x}/{y}.mvt")
+
+
+@app.get("/tiles/{z}/{x}/{y}.mvt")
+async def get_tile(z: int, x: int, y: int, request: Request):
+    """
+    지도 벡터 타일 (Mapbox Vector Tile)
+
+    📌 왜 타일?
+    - 예전: 처음에 동 경계 GeoJSON 전체 + 매장 전체를 받고 브라우저가 다 그림
+    - 타일: 지도를 256px 격자로 나눠서 "화면에 보이는 칸" 만, 그 줌에 맞게 단순화해서 받음
+    - 한 번 만든 타일은 tiles.mbtiles (SQLite) 에 저장 → 다음부터는 읽기만 함
+    """
+    # 📌 타일 만들기(도형 자르기/인코딩)는 CPU 작업이라 이벤트 루프 밖에서 실행
+    cached = await async_db.run_read(vector_tiles.get_tile, z, x, y)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="타일 범위를 벗어났습니다")
+    return cached_response(request, cached, vector_tiles.MEDIA_TYPE)
+
+
 @app.get("/api/stores", response_model=List[Store])
-async def get_all_stores():
+async def get_all_stores(
+    request: Request,
+    format: str = "json",
+    fields: Optional[str] = Query(None, description="format=columnar 일 때 보낼 컬럼 (예: id,lat,lng,gu)"),
+    cursor: Optional[str] = Query(None, description="이전 페이지의 next_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=store_columnar.MAX_LIMIT),
+):
     """
     모든 매장 목록 조회
     
@@ -144,16 +354,23 @@ async def get_all_stores():
     - "이 API는 Store 형식의 리스트를 반환합니다"라고 명시
     - 문서에 자동 반영되고, 반환값 검증도 해줌
     """
-    conn = get_db_connection()
-    stores = conn.execute("SELECT * FROM stores").fetchall()
-    conn.close()
-    
-    # sqlite3.Row 객체를 딕셔너리로 변환
-    return [dict(store) for store in stores]
+    # 📌 스냅샷 캐시 (store_cache.py):
+    # - 매장 목록은 거의 바뀌지 않으므로 JSON 으로 한 번 직렬화해 두고 그대로 돌려줌
+    # - Response 를 직접 반환하면 response_model 검증/재직렬화를 건너뜀 (문서에는 그대로 표시)
+    # - ?format=columnar&fields=id,lat,lng&limit=500 : 필요한 컬럼만, 페이지 단위로 (stores_response 참고)
+    return await stores_response(request, None, None, format, fields, cursor, limit)
 
 
 @app.get("/api/dong-stats")
-async def get_dong_stats():
+async def get_dong_stats(
+    request: Request,
+    gu: Optional[str] = None,
+    dong: Optional[str] = None,
+    format: str = "json",
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=store_columnar.MAX_LIMIT),
+):
     """
     동별 매장 통계 조회 (기존 Flask API와 동일한 기능)
     
@@ -170,14 +387,82 @@ async def get_dong_stats():
     #     ...
     #     return result  <- 그냥 반환하면 자동 JSON 변환
     """
-    conn = get_db_connection()
-    stores = conn.execute("SELECT * FROM stores").fetchall()
-    conn.close()
-    return [dict(s) for s in stores]
+    # 📌 쿼리 파라미터 (Query Parameter):
+    # - /api/dong-stats?gu=강남구&dong=역삼1동 처럼 Flask 버전과 같은 필터 지원
+    return await stores_response(request, gu, dong, format, fields, cursor, limit)
+
+
+@app.get("/api/gu-stats")
+async def get_gu_stats():
+    """
+    구별 매장 수 / 방문한 매장 수
+
+    📌 집계 테이블 (Materialized Aggregate):
+    - 매번 stores 전체를 GROUP BY 하지 않고, 미리 계산해 둔 gu_stats 테이블을 읽음
+    - stores 가 바뀌면 SQLite 트리거가 gu_stats / dong_stats 숫자를 자동으로 고쳐줌
+    """
+    rows = await async_db.run_read(store_stats.gu_stats)
+    return [dict(row) for row in rows]
+
+
+@app.get("/api/gu-stats/{gu_name}")
+async def get_gu_dong_stats(gu_name: str):
+    """특정 구의 동별 매장 수 / 방문한 매장 수"""
+    results = await async_db.run_read(store_stats.dong_stats, gu_name)
+    if not results:
+        raise HTTPException(status_code=404, detail=f"'{gu_name}' 구를 찾을 수 없습니다")
+    return [dict(row) for row in results]
+
+
+class NearbyStore(Store):
+    """가까운 매장 (Store + 거리)"""
+    distance_m: float      # 요청 좌표에서의 거리 (미터)
+
+class StoresInBBox(BaseModel):
+    """화면 안의 매장 목록 (limit 개를 넘으면 truncated=True)"""
+    stores: List[Store]
+    truncated: bool
+
+
+# 📌 주의: /api/stores/{gu_name} 보다 "먼저" 선언해야 함!
+# - FastAPI 는 위에서부터 경로를 맞춰 보므로 뒤에 두면 "bbox" 가 구 이름으로 해석됨
+
+@app.get("/api/stores/bbox", response_model=StoresInBBox)
+async def get_stores_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(store_spatial.MAX_BBOX_RESULTS, ge=1, le=store_spatial.MAX_BBOX_RESULTS),
+):
+    """
+    지도 화면(viewport) 사각형 안의 매장만 조회
+
+    📌 공간 인덱스 (R*Tree):
+    - 예전에는 /api/stores 로 전체를 받아서 브라우저가 걸러냈음
+    - stores_rtree (SQLite R*Tree) 가 "이 사각형과 겹치는 점" 을 인덱스로 바로 찾아줌
+    - 전국 데이터로 늘어나도 화면에 보이는 만큼만 전송!
+    """
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="min 값이 max 보다 큽니다")
+    rows, truncated = await async_db.run_read(store_spatial.in_bbox, min_lat, min_lng, max_lat, max_lng, limit)
+    return {"stores": [dict(row) for row in rows], "truncated": truncated}
+
+
+@app.get("/api/stores/nearest", response_model=List[NearbyStore])
+async def get_nearest_stores(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=store_spatial.MAX_NEAREST),
+    radius: Optional[float] = Query(None, gt=0, description="검색 반경 (미터)"),
+):
+    """(lat, lng) 에서 가까운 순서로 k 개 매장 + 거리(m)"""
+    results = await async_db.run_read(store_spatial.nearest, lat, lng, k, radius)
+    return [dict(row, distance_m=round(distance, 1)) for row, distance in results]
 
 
 @app.get("/api/stores/{gu_name}")
-async def get_stores_by_gu(gu_name: str):
+async def get_stores_by_gu(gu_name: str, request: Request):
     """
     특정 구의 매장만 조회
     
@@ -185,19 +470,38 @@ async def get_stores_by_gu(gu_name: str):
     - URL에 {gu_name}처럼 변수를 넣을 수 있음
     - /api/stores/강남구 → gu_name = "강남구"
     """
-    conn = get_db_connection()
-    stores = conn.execute(
-        "SELECT * FROM stores WHERE gu = ?", 
-        (gu_name,)
-    ).fetchall()
-    conn.close()
+    snapshot = await get_snapshot(gu_name)
     
-    if not stores:
+    if not snapshot.count:
         # 📌 HTTPException: FastAPI의 에러 처리 방법
         # status_code: HTTP 상태 코드 (404 = 찾을 수 없음)
         raise HTTPException(status_code=404, detail=f"'{gu_name}' 구를 찾을 수 없습니다")
     
-    return [dict(s) for s in stores]
+    return cached_response(request, snapshot.http)
+
+
+async def write_visit(store_code: int, visited: bool, uuid: Optional[str] = None):
+    """
+    방문 상태 변경을 visit_writer 에 맡기고 commit 될 때까지 기다림
+
+    📌 쓰기 모으기 (write coalescing, visit_writer.py):
+    - 매장을 연달아 체크하면 요청마다 트랜잭션 + commit 이 따로 생기고 SQLite 쓰기 락 앞에 줄을 섬
+    - visit_writer 스레드가 짧은 시간(WINDOW) 동안 들어온 변경을 트랜잭션 하나로 모아서 한 번에 commit
+    - 같은 매장을 여러 번 누르면 마지막 값만 기록 (last write wins)
+    - Future 를 asyncio.wrap_future 로 기다리므로 기다리는 동안 스레드를 붙잡지 않음
+    - 클라이언트가 끊기면 Future 도 취소됨 → writer 는 아직 기록하지 않은 그 변경을 건너뜀
+    - wait_for 로 최대 WAIT_TIMEOUT 만 기다림 (writer 에 문제가 생겨도 요청이 영원히 걸려 있지 않게)
+    """
+    try:
+        if visit_writer.COALESCE:
+            return await asyncio.wait_for(asyncio.wrap_future(visit_writer.submit(visited, store_code, uuid=uuid)),
+                                          visit_writer.WAIT_TIMEOUT)
+        # STARMAP_VISIT_COALESCE=0: 예전처럼 writer 스레드에서 한 건씩
+        return await async_db.run_write(visit_writer.set_visit, visited, store_code, uuid=uuid)
+    except visit_writer.QueueFull:
+        raise HTTPException(status_code=503, detail="visit write queue is full")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="visit write timed out")
 
 
 @app.post("/api/update-visit")
@@ -215,14 +519,131 @@ async def update_visit(data: VisitUpdate):
     #     return jsonify({"error": "store_code is required"}), 400
     # 이런 식으로 일일이 검증해야 했음
     """
-    conn = get_db_connection()
-    conn.execute(
-        "UPDATE stores SET visited = ? WHERE store_code = ?",
-        (1 if data.visited else 0, data.store_code)
-    )
-    conn.commit()
-    conn.close()
-    return {"status": "success", "store_code": data.store_code}
+    # 📌 uuid 가 있으면 사용자별 방문 기록 (user_visits.py)
+    # - 예전: stores.visited 하나를 모두가 같이 씀 → 누가 체크하면 모든 사람에게 방문으로 보였음
+    # - 지금: (user_id, store_id) 테이블에 사용자마다 따로 저장, 구/동 진행률도 사용자별로 트리거가 +1/-1
+    # 📌 응답의 version: 이 변경이 commit 된 동기화 버전 (/api/visits/changes?since= 에 그대로 쓰는 번호)
+    # - commit 이 끝난 뒤에만 응답하므로 version 을 받았으면 서버가 꺼져도 그 변경은 남아 있음
+    result = await write_visit(data.store_code, data.visited, data.uuid)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"매장 코드 {data.store_code} 를 찾을 수 없습니다")
+    return {"status": "success", "store_code": data.store_code, **result}
+
+
+@app.get("/api/visits/changes")
+async def get_visit_changes(since: int = Query(0, ge=0), uuid: Optional[str] = None):
+    """
+    버전 since 이후 바뀐 방문 상태만 조회 (증분 동기화)
+
+    📌 동기화 버전 (visit_sync.py):
+    - 방문 상태가 바뀔 때마다 트리거가 visit_changes 에 기록 → 그 번호가 "버전"
+    - 클라이언트는 마지막으로 받은 version 을 기억해 두었다가 ?since= 로 보냄
+    - 다시 접속해도 매장 전체를 받을 필요 없이 바뀐 것만 작은 응답 하나로 받음
+    - full=true 면 changes 가 전체 방문 목록 (로그가 정리됐거나 너무 오래된 경우)
+    """
+    # - uuid 를 주면 그 사용자의 방문 기록 기준 (user_visits.py)
+    if uuid:
+        return await async_db.run_read(user_visits.changes_since, uuid, since)
+    return await async_db.run_read(visit_sync.changes_since, since)
+
+
+@app.post("/api/visits/bulk")
+async def bulk_update_visits(data: VisitBulk):
+    """방문 목록 전체를 트랜잭션 하나로 반영 (매장마다 POST 를 N 번 보내지 않음)"""
+    try:
+        if data.uuid:
+            return await async_db.run_write(user_visits.apply_visits, data.uuid,
+                                            data.store_names, data.store_codes, data.replace)
+        return await async_db.run_write(visit_sync.apply_visits, data.store_names, data.store_codes, data.replace)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@app.get("/api/users/{uuid}/progress")
+async def get_user_progress(uuid: str, gu: Optional[str] = None):
+    """
+    사용자별 진행률: 구별 (gu 를 주면 그 구의 동별) 전체 매장 수 / 방문한 매장 수
+
+    📌 매번 GROUP BY 하지 않음
+    - 방문을 추가/삭제할 때 트리거가 user_gu_progress / user_dong_progress 를 +1/-1
+    - 여기서는 gu_stats(전체 매장 수)와 한 사용자의 진행률 행만 읽음
+    """
+    return await async_db.run_read(user_visits.progress, uuid, gu)
+
+
+@app.post("/api/log")
+async def log_action(event: LogEvent, request: Request):
+    """
+    사용자 행동 로그 기록
+
+    📌 버퍼링 (log_writer.py):
+    - 클릭할 때마다 DB 에 INSERT + commit 하면 SQLite 쓰기 락을 두고 요청끼리 줄을 서게 됨
+    - 그래서 메모리 큐에 넣기만 하고 바로 응답 → 백그라운드 스레드가 모아서 한 번에 기록
+    - 큐가 가득 차면 기다리지 않고 버림 (503 + dropped 로 알려줌)
+
+    📌 block=False: 이벤트 루프에서 부르므로 큐 자리가 날 때까지 기다리면 안 됨
+    - 기다리면 그동안 다른 모든 요청도 같이 멈춤 (Flask 는 요청마다 스레드라 잠깐 기다려도 됨)
+    """
+    client_ip = request.client.host if request.client else None
+    if not log_writer.submit(event.uuid, event.action, event.target, client_ip, block=False):
+        raise HTTPException(status_code=503, detail="log queue is full")
+    return {"status": "logged"}
+
+
+@app.post("/api/log/batch")
+async def log_actions_batch(batch: LogBatch, request: Request):
+    """여러 로그를 POST 한 번으로 기록 (프론트엔드에서 모아서 보낼 때)"""
+    client_ip = request.client.host if request.client else None
+    events = [event.model_dump() for event in batch.events]
+    # 📌 block=False: 큐가 가득 차면 이벤트 루프를 멈추지 않고 나머지는 바로 dropped 로 셈
+    accepted, dropped = log_writer.submit_many(events, client_ip, batch.uuid, block=False)
+    if dropped and not accepted:
+        raise HTTPException(status_code=503, detail="log queue is full")
+    return {"status": "logged", "accepted": accepted, "dropped": dropped}
+
+
+def analytics_range(start: Optional[str], end: Optional[str], days: int):
+    try:
+        return log_analytics.day_range(start, end, days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/analytics/daily")
+async def get_analytics_daily(start: Optional[str] = None, end: Optional[str] = None,
+                              days: int = Query(7, ge=1, le=log_analytics.MAX_DAYS)):
+    """
+    날짜별 이벤트 수 / 사용자 수 (start~end, 없으면 오늘까지 최근 days 일, UTC)
+
+    📌 롤업 테이블 (log_analytics.py):
+    - action_logs 원본을 매번 GROUP BY 하지 않고 시간/일별로 미리 세어 둔 표만 읽음
+    - log_writer 가 로그를 기록하면서 마지막으로 반영한 id(high-water mark) 다음부터 이어서 집계
+    - 그래서 로그가 수백만 줄이 되어도 조회 시간은 조회 기간 길이에만 비례
+    """
+    start, end = analytics_range(start, end, days)
+    return await async_db.run_read(log_analytics.daily, start, end)
+
+
+@app.get("/api/analytics/top")
+async def get_analytics_top(action: str, start: Optional[str] = None, end: Optional[str] = None,
+                            days: int = Query(7, ge=1, le=log_analytics.MAX_DAYS),
+                            limit: int = Query(10, ge=1, le=log_analytics.MAX_TOP)):
+    """기간 동안 action 의 target 순위 (예: action=CLICK_GU → 가장 많이 본 구)"""
+    start, end = analytics_range(start, end, days)
+    return await async_db.run_read(log_analytics.top_targets, action, start, end, limit)
+
+
+@app.get("/api/analytics/timeseries")
+async def get_analytics_timeseries(start: Optional[str] = None, end: Optional[str] = None,
+                                   days: int = Query(7, ge=1, le=log_analytics.MAX_DAYS),
+                                   granularity: Literal["hour", "day"] = "day",
+                                   action: Optional[str] = None, target: Optional[str] = None):
+    """시간(hour) / 날짜(day) 별 이벤트 수 (action, target 으로 거를 수 있음)"""
+    start, end = analytics_range(start, end, days)
+    try:
+        return await async_db.run_read(log_analytics.timeseries, start, end, granularity, action, target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # [7] 서버 실행 (개발용)
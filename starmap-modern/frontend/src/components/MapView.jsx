@@ -74,8 +74,9 @@ function MapView({ stores, visitedStores, currentGu, onSelectGu, onShowProfile,
     };
 
     const getDongStyle = (feature) => {
-        const dongName = feature.properties.adm_nm.split(' ').pop();
-        const dongStores = stores.filter(s => s.gu === currentGu && s.dong === dongName);
+        // 행정동 코드로 매장을 찾음 (API 의 adm_cd = GeoJSON 의 adm_cd, 동 이름 정규화 없음)
+        const admCd = Number(feature.properties.adm_cd);
+        const dongStores = stores.filter(s => s.adm_cd === admCd);
         const total = dongStores.length;
         const visited = dongStores.filter(s => visitedStores.has(s.store_name)).length;
         const ratio = total > 0 ? visited / total : 0;
@@ -0,0 +1,177 @@
+"""
+stores 테이블 스냅샷 캐시 (/api/dong-stats, /api/stores 용)
+
+stores 는 db_3 / db_granular 실행이나 방문 기록 업데이트 때만 바뀌므로
+필터 조합(전체 / 구 / 구+동)별로 직렬화된 JSON bytes 와 압축 variant(http_cache) 를
+메모리에 들고 있다가 그대로 응답한다.
+
+- 무효화: db_pool 의 'stores' 세대 번호가 바뀌면 캐시 전체를 비움
+  - 같은 프로세스에서 쓴 경우: db_pool.local_generation 으로 즉시 감지
+  - 다른 프로세스(ingest 스크립트, 다른 gunicorn 워커): CHECK_INTERVAL 마다 DB 의 세대 번호 확인
+- 필터 조합이 많아져도 메모리가 커지지 않도록 LRU 로 MAX_ENTRIES 개만 유지
+- cached(key, build) 로 다른 형식(store_columnar 의 컬럼형 페이지 등)도 같은 무효화 규칙으로 캐시
+- 서빙 번들(bundle.py)이 있고 세대 번호가 같으면 SQLite 대신 번들의 mmap 영역을 그대로 사용
+  (preload() 로 서버 시작 때 전체 / 구별 스냅샷을 미리 채움)
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import bundle
+import db_pool
+import http_cache
+
+CHECK_INTERVAL = 1.0  # 초
+MAX_ENTRIES = 512
+
+# body: 직렬화된 JSON (bytes), count: 포함된 매장 수, http: ETag + gzip/brotli variant
+Snapshot = namedtuple('Snapshot', ['body', 'count', 'http'])
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_generation = None
+_local_generation = None
+_checked_at = 0.0
+
+
+def _is_fresh(now):
+    # _lock 을 잡은 상태에서 호출: DB 의 세대 번호를 다시 확인하지 않아도 되는지
+    return (_generation is not None and _local_generation == db_pool.local_generation
+            and now - _checked_at < CHECK_INTERVAL)
+
+
+def _sync_generation():
+    """세대 번호가 바뀌었으면 캐시를 비우고 현재 세대 번호를 반환"""
+    global _generation, _local_generation, _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _is_fresh(now):
+            return _generation
+
+    local_gen = db_pool.local_generation
+    gen = db_pool.read_generation('stores')
+    with _lock:
+        if gen != _generation:
+            _entries.clear()
+            _generation = gen
+        _local_generation = local_gen
+        _checked_at = now
+        return _generation
+
+
+def generation():
+    """현재 stores 세대 번호 (다른 캐시가 같은 무효화 주기를 따를 때 사용)"""
+    return _sync_generation()
+
+
+def invalidate():
+    """캐시를 강제로 비움 (다음 요청에서 다시 만듦)"""
+    global _generation
+    with _lock:
+        _entries.clear()
+        _generation = None
+
+
+def select_rows(gu=None, dong=None):
+    """필터 조합에 해당하는 stores 행 (gu, dong, store_name 순서)"""
+    args = []
+    where_clause = []
+    query = "SELECT * FROM stores"
+
+    if gu:
+        where_clause.append("gu = ?")
+        args.append(gu)
+    if dong:
+        where_clause.append("dong = ?")
+        args.append(dong)
+    if where_clause:
+        query += " WHERE " + " AND ".join(where_clause)
+    query += " ORDER BY gu, dong, store_name"
+    return db_pool.query(query, args)
+
+
+def serialize(rows):
+    """행 dict 목록 -> Snapshot (bundle.py 빌드도 같은 바이트를 만들도록 이 함수를 씀)"""
+    body = json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return Snapshot(body, len(rows), http_cache.build_variants(body))
+
+
+def _build(gu, dong, generation):
+    mapped = bundle.stores(gu, dong, generation)
+    if mapped is not None:
+        return Snapshot(*mapped)
+    return serialize([dict(row) for row in select_rows(gu, dong)])
+
+
+def peek_key(key):
+    """SQLite 를 전혀 건드리지 않고 캐시에서만 찾음 (없거나 세대 확인이 필요하면 None)
+
+    async 서버가 이벤트 루프에서 바로 응답할 수 있는지 판단할 때 사용
+    """
+    with _lock:
+        if not _is_fresh(time.monotonic()):
+            return None
+        value = _entries.get(key)
+        if value is not None:
+            _entries.move_to_end(key)
+        return value
+
+
+def cached(key, build):
+    """key 별로 build() 결과를 캐시 (stores 세대가 바뀌면 같이 비워짐)
+
+    key 는 다른 사용처와 겹치지 않도록 첫 원소에 이름을 넣음 (예: ('columnar', ...))
+    """
+    generation = _sync_generation()
+
+    with _lock:
+        value = _entries.get(key)
+        if value is not None:
+            _entries.move_to_end(key)
+            return value
+
+    value = build()
+
+    with _lock:
+        # 만드는 도중 무효화됐다면 이전 세대 데이터이므로 캐시에 넣지 않음
+        if generation == _generation:
+            _entries[key] = value
+            _entries.move_to_end(key)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return value
+
+
+def peek(gu=None, dong=None):
+    """get_stores() 의 캐시 버전 (캐시에 없으면 None)"""
+    return peek_key((gu or None, dong or None))
+
+
+def get_stores(gu=None, dong=None):
+    """필터 조합에 해당하는 매장 목록 스냅샷 반환 (캐시에 없을 때만 SQLite 조회)"""
+    key = (gu or None, dong or None)
+    # _generation: cached() 가 방금 확인한 세대 (만드는 도중 바뀌면 cached() 가 결과를 캐시에 넣지 않음)
+    return cached(key, lambda: _build(*key, _generation))
+
+
+def preload():
+    """서빙 번들의 전체 / 구별 스냅샷을 캐시에 미리 넣음 (서버 시작 시), 넣은 개수 반환
+
+    번들이 없거나 DB 와 세대 번호가 다르면 아무것도 하지 않음 (첫 요청에서 평소처럼 만듦)
+    """
+    current = bundle.current()
+    if current is None:
+        return 0
+    generation = _sync_generation()
+    keys = [(gu, dong) for gu, dong in map(json.loads, current.header['stores']) if dong is None]
+    loaded = 0
+    for gu, dong in keys:
+        mapped = bundle.stores(gu, dong, generation)
+        if mapped is None:
+            break
+        with _lock:
+            if generation == _generation:
+                _entries[(gu, dong)] = Snapshot(*mapped)
+                loaded += 1
+    return loaded
@@ -0,0 +1,142 @@
+"""
+매장 목록 컴팩트 응답 (/api/stores, /api/dong-stats 의 format=columnar | msgpack)
+
+행(dict) 배열 대신 컬럼별 배열로 보내서 키 이름 반복을 없애고,
+gu / dong 은 페이지 안의 사전(dictionaries) 번호로 보낸다.
+
+    {"fields": ["id", "lat", "lng", "gu"], "count": 2, "total": 612,
+     "columns": {"id": [1, 2], "lat": [...], "lng": [...], "gu": [0, 0]},
+     "dictionaries": {"gu": ["강남구"]}, "next_cursor": "..."}
+
+- fields=id,lat,lng : 필요한 컬럼만 (기본은 전체)
+- limit=500 / cursor=... : 정렬 순서(gu, dong, store_name) 기준 keyset 페이지네이션
+  cursor 는 마지막 행의 정렬 키라서 페이지를 넘기는 사이 데이터가 바뀌어도 중복/누락 없이 이어짐
+- 필터 조합별 컬럼 테이블과 인코딩된 페이지는 store_cache 에 함께 캐시 (stores 가 바뀌면 같이 무효화)
+- msgpack 은 선택 의존성 (설치되어 있을 때만 format=msgpack 지원)
+"""
+import base64
+import json
+from bisect import bisect_right
+from collections import namedtuple
+
+try:
+    import msgpack
+except ImportError:  # msgpack 은 선택 의존성 (없으면 columnar JSON 만 제공)
+    msgpack = None
+
+import http_cache
+import store_cache
+
+FIELDS = ('id', 'store_name', 'store_code', 'gu', 'dong', 'adm_cd', 'lat', 'lng', 'address', 'visited')
+DICTIONARY_FIELDS = ('gu', 'dong')
+MAX_LIMIT = 5000
+MEDIA_TYPES = {'columnar': 'application/json', 'msgpack': 'application/x-msgpack'}
+
+# columns: {컬럼: 값 목록}, keys: 정렬 키 (gu, dong, store_name) 목록
+StoreTable = namedtuple('StoreTable', ['columns', 'keys'])
+
+
+def formats():
+    return [fmt for fmt in MEDIA_TYPES if fmt != 'msgpack' or msgpack is not None]
+
+
+def _sort_key(row):
+    # SQLite ORDER BY 와 같은 순서 (NULL 이 맨 앞, 문자열은 코드 포인트 순)
+    return (row['gu'] or '', row['dong'] or '', row['store_name'])
+
+
+def build_table(rows):
+    """stores 행 목록 (gu, dong, store_name 순서) -> StoreTable"""
+    columns = {field: [row[field] for row in rows] for field in FIELDS}
+    return StoreTable(columns, [_sort_key(row) for row in rows])
+
+
+def encode_cursor(key):
+    raw = json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except ValueError:
+        raise ValueError('invalid cursor')
+    if not (isinstance(key, list) and len(key) == 3 and all(isinstance(v, str) for v in key)):
+        raise ValueError('invalid cursor')
+    return tuple(key)
+
+
+def parse_fields(fields):
+    """'id,lat,lng' -> ('id', 'lat', 'lng'), 없으면 전체 컬럼"""
+    if not fields:
+        return FIELDS
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown or not names:
+        raise ValueError(f"unknown fields: {', '.join(unknown)} (available: {', '.join(FIELDS)})")
+    return names
+
+
+def page_payload(table, fields=FIELDS, cursor=None, limit=None):
+    """컬럼형 페이지 dict (직렬화 전)"""
+    total = len(table.keys)
+    start = bisect_right(table.keys, decode_cursor(cursor)) if cursor else 0
+    end = total if limit is None else min(total, start + limit)
+
+    columns, dictionaries = {}, {}
+    for field in fields:
+        values = table.columns[field][start:end]
+        if field in DICTIONARY_FIELDS:
+            # 페이지 안에서 처음 나온 순서대로 번호 (gu, dong 순으로 정렬돼 있으므로 거의 연속된 번호)
+            codes = {}
+            columns[field] = [codes.setdefault(value, len(codes)) for value in values]
+            dictionaries[field] = list(codes)
+        else:
+            columns[field] = values
+    return {
+        'fields': list(fields),
+        'count': end - start,
+        'total': total,
+        'columns': columns,
+        'dictionaries': dictionaries,
+        'next_cursor': encode_cursor(table.keys[end - 1]) if end < total else None,
+    }
+
+
+def encode(payload, fmt='columnar'):
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _table(gu, dong):
+    return store_cache.cached(('table', gu, dong), lambda: build_table(store_cache.select_rows(gu, dong)))
+
+
+def _key(gu, dong, fmt, fields, cursor, limit):
+    return ('columnar', gu or None, dong or None, fmt, fields, cursor, limit)
+
+
+def validate(fmt, fields=None, cursor=None, limit=None):
+    """요청 파라미터 확인 -> (fmt, fields tuple, cursor, limit), 잘못된 값이면 ValueError"""
+    if fmt not in formats():
+        raise ValueError(f"unsupported format: {fmt} (available: json, {', '.join(formats())})")
+    if limit is not None and not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    if cursor:
+        decode_cursor(cursor)
+    return fmt, parse_fields(fields), cursor or None, limit
+
+
+def peek(gu, dong, fmt, fields, cursor, limit):
+    """캐시에 있는 페이지 (validate() 를 거친 값으로 호출, 없으면 None)"""
+    return store_cache.peek_key(_key(gu, dong, fmt, fields, cursor, limit))
+
+
+def get_page(gu, dong, fmt, fields, cursor, limit):
+    """인코딩된 페이지의 http_cache.Variants (validate() 를 거친 값으로 호출)"""
+    def build():
+        payload = page_payload(_table(gu or None, dong or None), fields, cursor, limit)
+        return http_cache.build_variants(encode(payload, fmt))
+    return store_cache.cached(_key(gu, dong, fmt, fields, cursor, limit), build)
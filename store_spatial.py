@@ -0,0 +1,107 @@
+"""
+매장 좌표 공간 인덱스 (SQLite R*Tree: stores_rtree)
+
+stores 에 INSERT / DELETE / UPDATE(lat, lng) 가 일어나면 트리거가 stores_rtree 를 같이 고치므로
+ingest(db_3.py, db_granular.py)가 끝난 시점에 인덱스도 항상 최신이다.
+테이블과 트리거 정의(DDL)는 migrations.py 의 3 단계에 있다.
+
+- in_bbox(): 화면(viewport) 사각형 안의 매장만 조회
+- nearest(): 좌표에서 가까운 k 개 매장 + 거리(m)
+  R*Tree 는 "사각형 겹침" 만 알기 때문에 작은 사각형부터 검색하고,
+  k 번째 거리가 사각형에 내접하는 원의 반지름보다 크면 사각형을 두 배로 키워 다시 검색한다.
+
+python store_spatial.py --check : stores_rtree 와 stores 좌표 비교
+"""
+import math
+import sys
+
+import db_pool
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = math.pi * EARTH_RADIUS_M / 180
+MAX_BBOX_RESULTS = 5000
+MAX_NEAREST = 100
+START_RADIUS_M = 500
+
+# R*Tree 는 좌표를 32비트 float 로 저장(바깥쪽으로 반올림)하므로 stores 의 실제 좌표로 다시 거름
+BBOX_SQL = """
+    SELECT s.id, s.store_name, s.store_code, s.gu, s.dong, s.adm_cd, s.lat, s.lng, s.address, s.visited
+    FROM stores_rtree r JOIN stores s ON s.id = r.id
+    WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?
+      AND s.lat BETWEEN ? AND ? AND s.lng BETWEEN ? AND ?
+    LIMIT ?
+"""
+
+def rebuild(conn):
+    """stores_rtree 를 현재 stores 좌표로 다시 채움 (호출한 쪽 트랜잭션 안에서)"""
+    conn.execute("DELETE FROM stores_rtree")
+    conn.execute("""
+        INSERT INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT id, lat, lat, lng, lng FROM stores WHERE lat IS NOT NULL AND lng IS NOT NULL
+    """)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _box_query(conn, min_lat, max_lat, min_lng, max_lng, limit=-1):
+    return conn.execute(BBOX_SQL, (min_lat, max_lat, min_lng, max_lng,
+                                   min_lat, max_lat, min_lng, max_lng, limit)).fetchall()
+
+
+def in_bbox(min_lat, min_lng, max_lat, max_lng, limit=MAX_BBOX_RESULTS):
+    """사각형 안의 매장 목록과 잘렸는지 여부 (limit 개 초과면 truncated=True)"""
+    conn = db_pool.get_conn()
+    rows = _box_query(conn, min_lat, max_lat, min_lng, max_lng, limit + 1)
+    return rows[:limit], len(rows) > limit
+
+
+def nearest(lat, lng, k=10, max_distance_m=None):
+    """(lat, lng) 에서 가까운 순서로 k 개 매장 [(row, distance_m), ...]"""
+    conn = db_pool.get_conn()
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    radius = START_RADIUS_M if max_distance_m is None else min(START_RADIUS_M, max_distance_m)
+    while True:
+        d_lat = radius / METERS_PER_DEG_LAT
+        d_lng = min(180.0, d_lat / cos_lat)
+        rows = _box_query(conn, lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng)
+        found = sorted(((row, haversine_m(lat, lng, row['lat'], row['lng'])) for row in rows),
+                       key=lambda item: item[1])
+        # 사각형 안의 원(반지름 radius) 안쪽 결과만 확정: 원 밖의 매장은 사각형 밖에 더 가까운 게 있을 수 있음
+        within = [item for item in found if item[1] <= radius]
+        if max_distance_m is not None and radius >= max_distance_m:
+            return [item for item in within if item[1] <= max_distance_m][:k]
+        if len(within) >= k or d_lat >= 180:
+            return (within if len(within) >= k else found)[:k]
+        radius *= 2
+        if max_distance_m is not None:
+            radius = min(radius, max_distance_m)
+
+
+def check_index(conn):
+    """stores 좌표와 stores_rtree 가 다른 id 목록 (비어 있으면 일치)"""
+    return [row[0] for row in conn.execute("""
+        SELECT s.id FROM stores s LEFT JOIN stores_rtree r ON r.id = s.id
+        WHERE s.lat IS NOT NULL AND s.lng IS NOT NULL
+          AND (r.id IS NULL OR s.lat NOT BETWEEN r.min_lat AND r.max_lat
+               OR s.lng NOT BETWEEN r.min_lng AND r.max_lng)
+        UNION ALL
+        SELECT r.id FROM stores_rtree r LEFT JOIN stores s ON s.id = r.id
+        WHERE s.id IS NULL OR s.lat IS NULL OR s.lng IS NULL
+    """)]
+
+
+if __name__ == '__main__':
+    import migrations
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    bad = check_index(conn)
+    print(f"R*Tree check: {'OK' if not bad else f'{len(bad)} mismatched ids {bad[:20]}'}")
+    conn.close()
+    sys.exit(1 if bad else 0)
@@ -0,0 +1,117 @@
+"""
+구/동별 매장 수 집계 테이블 (gu_stats, dong_stats)
+
+stores 에 INSERT / DELETE / UPDATE(gu, dong, visited) 가 일어날 때마다 SQLite 트리거가
+두 테이블의 total_stores / visited_stores 를 바로 고쳐주므로 /api/gu-stats 는 GROUP BY 없이
+집계 테이블만 읽으면 된다.
+
+대량 적재(ingest) 때는 bulk_maintenance() 안에서 트리거를 잠시 빼고 쓴 뒤 한 번에 다시 집계한다.
+테이블과 트리거 정의(DDL)는 migrations.py 의 2, 8 단계에 있다.
+
+python store_stats.py --check   : 집계 테이블과 실제 GROUP BY 결과 비교
+python store_stats.py --rebuild : 집계 테이블 다시 만들기
+"""
+import sys
+from contextlib import contextmanager
+
+import db_pool
+
+UNKNOWN = '미분류'
+
+
+GU_GROUP_BY = f"""
+    SELECT COALESCE(gu, '{UNKNOWN}') AS gu, COUNT(*) AS total_stores,
+           SUM(CASE WHEN visited = 1 THEN 1 ELSE 0 END) AS visited_stores
+    FROM stores GROUP BY 1
+"""
+DONG_GROUP_BY = f"""
+    SELECT COALESCE(gu, '{UNKNOWN}') AS gu, COALESCE(dong, '{UNKNOWN}') AS dong, COUNT(*) AS total_stores,
+           SUM(CASE WHEN visited = 1 THEN 1 ELSE 0 END) AS visited_stores
+    FROM stores GROUP BY 1, 2
+"""
+# 동별 통계 + 행정동 코드 (지도는 GeoJSON 의 adm_cd 로 바로 찾음, 코드 표는 admin_codes.py)
+DONG_STATS_SQL = """
+    SELECT d.gu, d.dong, a.adm_cd, d.total_stores, d.visited_stores
+    FROM dong_stats d LEFT JOIN admin_areas a ON a.gu = d.gu AND a.dong = d.dong
+    WHERE d.gu = ? ORDER BY d.dong
+"""
+
+
+def drop_triggers(conn):
+    """집계 트리거를 빼고 그 CREATE 문 목록을 반환 (create_triggers 로 그대로 되돌림)"""
+    rows = conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name = 'stores' AND name GLOB 'trg_stores_stats_*'
+    """).fetchall()
+    for name, _ in rows:
+        conn.execute(f"DROP TRIGGER {name}")
+    return [ddl for _, ddl in rows]
+
+
+def create_triggers(conn, ddls):
+    for ddl in ddls:
+        conn.execute(ddl)
+
+
+def rebuild(conn):
+    """stores 전체를 GROUP BY 해서 집계 테이블을 다시 채움 (호출한 쪽 트랜잭션 안에서)"""
+    conn.execute("DELETE FROM gu_stats")
+    conn.execute("DELETE FROM dong_stats")
+    conn.execute(f"INSERT INTO gu_stats (gu, total_stores, visited_stores) {GU_GROUP_BY}")
+    conn.execute(f"INSERT INTO dong_stats (gu, dong, total_stores, visited_stores) {DONG_GROUP_BY}")
+
+
+@contextmanager
+def bulk_maintenance(conn):
+    """대량 쓰기용: 트리거를 빼고 쓴 다음 한 번에 다시 집계하고 트리거를 되돌림
+
+    DDL 도 트랜잭션에 포함되므로 호출한 쪽의 트랜잭션 안에서 써야
+    다른 연결에는 트리거가 빠진 상태가 보이지 않는다.
+    되돌리는 트리거는 DB 에 있던 것 그대로 (트리거 정의는 migrations.py 에만 있음)
+    """
+    ddls = drop_triggers(conn)
+    try:
+        yield conn
+    finally:
+        rebuild(conn)
+        create_triggers(conn, ddls)
+
+
+def check_consistency(conn):
+    """집계 테이블과 실제 GROUP BY 결과가 다른 행 목록 (비어 있으면 일치)"""
+    diffs = []
+    for table, keys, group_by in (('gu_stats', ['gu'], GU_GROUP_BY),
+                                  ('dong_stats', ['gu', 'dong'], DONG_GROUP_BY)):
+        key_sql = ', '.join(keys)
+        live = {tuple(r[:-2]): tuple(r[-2:]) for r in conn.execute(group_by)}
+        stored = {tuple(r[:-2]): tuple(r[-2:]) for r in
+                  conn.execute(f"SELECT {key_sql}, total_stores, visited_stores FROM {table}")}
+        for key in sorted(set(live) | set(stored), key=str):
+            if live.get(key) != stored.get(key):
+                diffs.append((table, key, stored.get(key), live.get(key)))
+    return diffs
+
+
+def gu_stats():
+    return db_pool.query("SELECT gu, total_stores, visited_stores FROM gu_stats ORDER BY gu")
+
+
+def dong_stats(gu):
+    return db_pool.query(DONG_STATS_SQL, (gu,))
+
+
+if __name__ == '__main__':
+    import migrations
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    if '--rebuild' in sys.argv:
+        with conn:
+            rebuild(conn)
+        print("Rebuilt gu_stats / dong_stats.")
+    diffs = check_consistency(conn)
+    for table, key, stored, live in diffs[:20]:
+        print(f"MISMATCH {table} {key}: stored={stored} live={live}")
+    print(f"Consistency check: {'OK' if not diffs else f'{len(diffs)} mismatches'}")
+    conn.close()
+    sys.exit(1 if diffs else 0)
@@ -0,0 +1,217 @@
+"""
+사용자별 방문 기록 (stores.visited 하나를 모든 사용자가 같이 쓰던 문제 해결)
+
+- users: 클라이언트 uuid (action_logs.user_uuid 와 같은 값) -> 정수 user_id
+- user_visits (user_id, store_id): WITHOUT ROWID 라서 PK 순서로 저장되고 한 사용자의 방문이 한곳에 모여 있음
+- user_gu_progress / user_dong_progress: 사용자별 구/동 방문 수
+  user_visits 에 INSERT / DELETE 가 일어날 때 트리거가 +1/-1 (GROUP BY 다시 안 함)
+  매장의 구/동이 바뀌면(ingest) 그 매장을 방문한 사용자 것만 옮김
+- user_visit_changes: 사용자별 증분 동기화 로그 (visit_sync 의 사용자 버전)
+테이블과 트리거 정의(DDL)는 migrations.py 의 5 단계에 있다.
+
+한 사용자의 방문을 바꾸거나 진행률을 읽는 비용은 바뀐 매장 수 / 구·동 수에만 비례한다.
+
+python user_visits.py --check : 진행률 테이블과 실제 GROUP BY 결과 비교
+"""
+import json
+import sys
+
+import db_pool
+import visit_sync
+
+UNKNOWN = '미분류'
+
+
+# ----------------------------------------------------------------------------
+# 읽기
+# ----------------------------------------------------------------------------
+
+def find_user(conn, uuid):
+    row = conn.execute("SELECT id FROM users WHERE uuid = ?", (uuid,)).fetchone()
+    return row[0] if row else None
+
+
+def _user_version(conn, user_id):
+    row = conn.execute("SELECT MAX(version) FROM user_visit_changes WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] or 0
+
+
+def _visited_stores(conn, user_id):
+    return [dict(row) for row in conn.execute("""
+        SELECT s.store_code, s.store_name, 1 AS visited
+        FROM user_visits v JOIN stores s ON s.id = v.store_id
+        WHERE v.user_id = ? ORDER BY v.store_id
+    """, (user_id,))]
+
+
+def changes_since(uuid, since=0):
+    """visit_sync.changes_since 의 사용자별 버전 (응답 형식 같음)"""
+    conn = db_pool.get_conn()
+    user_id = find_user(conn, uuid)
+    if user_id is None:
+        return {'version': 0, 'full': since > 0, 'changes': []}
+    version = _user_version(conn, user_id)
+    oldest = conn.execute("SELECT MIN(version) FROM user_visit_changes").fetchone()[0]
+    if since > version or oldest is None or since < oldest - 1:
+        return {'version': version, 'full': True, 'changes': _visited_stores(conn, user_id)}
+
+    rows = conn.execute("""
+        SELECT s.store_code, s.store_name, c.visited, c.version
+        FROM user_visit_changes c JOIN stores s ON s.id = c.store_id
+        WHERE c.version IN (
+            SELECT MAX(version) FROM user_visit_changes
+            WHERE user_id = ? AND version > ? AND version <= ? GROUP BY store_id
+        )
+        ORDER BY c.version
+        LIMIT ?
+    """, (user_id, since, version, visit_sync.MAX_CHANGES + 1)).fetchall()
+    if len(rows) > visit_sync.MAX_CHANGES:
+        return {'version': version, 'full': True, 'changes': _visited_stores(conn, user_id)}
+    return {'version': version, 'full': False, 'changes': [dict(row) for row in rows]}
+
+
+def progress(uuid, gu=None):
+    """사용자의 구별 (gu 를 주면 그 구의 동별) 전체 매장 수 / 방문한 매장 수"""
+    conn = db_pool.get_conn()
+    user_id = find_user(conn, uuid)
+    if gu is None:
+        rows = conn.execute("""
+            SELECT g.gu, g.total_stores, COALESCE(p.visited_stores, 0) AS visited_stores
+            FROM gu_stats g LEFT JOIN user_gu_progress p ON p.user_id = ? AND p.gu = g.gu
+            ORDER BY g.gu
+        """, (user_id,))
+    else:
+        rows = conn.execute("""
+            SELECT d.gu, d.dong, d.total_stores, COALESCE(p.visited_stores, 0) AS visited_stores
+            FROM dong_stats d LEFT JOIN user_dong_progress p ON p.user_id = ? AND p.gu = d.gu AND p.dong = d.dong
+            WHERE d.gu = ?
+            ORDER BY d.dong
+        """, (user_id, gu))
+    return [dict(row) for row in rows]
+
+
+# ----------------------------------------------------------------------------
+# 쓰기 (한 트랜잭션, 바뀐 매장 수만큼만 작업)
+# ----------------------------------------------------------------------------
+
+def ensure_user(conn, uuid):
+    conn.execute("INSERT INTO users (uuid) VALUES (?) ON CONFLICT(uuid) DO NOTHING", (uuid,))
+    return find_user(conn, uuid)
+
+
+def _write(func):
+    conn = db_pool.get_conn(readonly=False)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = func(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def write_visit(conn, uuid, store_code, visited):
+    """쓰기 트랜잭션 안에서 호출: set_visit 과 같지만 commit 하지 않음 (visit_writer 가 여러 건을 묶을 때)"""
+    store = conn.execute("SELECT id FROM stores WHERE store_code = ?", (store_code,)).fetchone()
+    if store is None:
+        return None
+    if visited:
+        user_id = ensure_user(conn, uuid)
+        cur = conn.execute("INSERT INTO user_visits (user_id, store_id) VALUES (?, ?) "
+                           "ON CONFLICT DO NOTHING", (user_id, store[0]))
+    else:
+        # 방문 해제는 사용자를 만들지 않음 (처음 보는 uuid 면 지울 기록도 없음)
+        user_id = find_user(conn, uuid)
+        if user_id is None:
+            return {'updated': 0, 'version': 0}
+        cur = conn.execute("DELETE FROM user_visits WHERE user_id = ? AND store_id = ?", (user_id, store[0]))
+    return {'updated': cur.rowcount, 'version': _user_version(conn, user_id)}
+
+
+def set_visit(uuid, store_code, visited):
+    """한 매장의 방문 여부를 바꾸고 {'updated': 0/1, 'version'} 반환 (없는 매장이면 None)"""
+    return _write(lambda conn: write_visit(conn, uuid, store_code, visited))
+
+
+def apply_visits(uuid, store_names=(), store_codes=(), replace=False):
+    """visit_sync.apply_visits 의 사용자별 버전 (응답 형식 같음)"""
+    names = sorted(set(store_names))
+    codes = sorted(set(store_codes))
+    if len(names) + len(codes) > visit_sync.MAX_BULK:
+        raise ValueError(f"at most {visit_sync.MAX_BULK} stores per request")
+
+    def write(conn):
+        found = conn.execute("""
+            SELECT id, store_name, store_code FROM stores
+            WHERE store_name IN (SELECT value FROM json_each(?)) OR store_code IN (SELECT value FROM json_each(?))
+        """, (json.dumps(names, ensure_ascii=False), json.dumps(codes))).fetchall()
+        ids = json.dumps([row['id'] for row in found])
+        # 넣을 매장이 없으면 사용자를 만들지 않음 (처음 보는 uuid 면 지울 기록도 없음)
+        user_id = ensure_user(conn, uuid) if found else find_user(conn, uuid)
+        if user_id is None:
+            return found, 0, 0
+        updated = 0
+        if replace:
+            updated += conn.execute("""
+                DELETE FROM user_visits WHERE user_id = ? AND store_id NOT IN (SELECT value FROM json_each(?))
+            """, (user_id, ids)).rowcount
+        # rowcount 는 트리거가 쓴 행을 빼고 이 문장이 직접 바꾼 행 수
+        updated += conn.execute("""
+            INSERT INTO user_visits (user_id, store_id)
+            SELECT ?, value FROM json_each(?) WHERE true
+            ON CONFLICT DO NOTHING
+        """, (user_id, ids)).rowcount
+        return found, updated, _user_version(conn, user_id)
+
+    found, updated, version = _write(write)
+    found_names = {row['store_name'] for row in found}
+    found_codes = {row['store_code'] for row in found}
+    return {
+        'version': version,
+        'updated': updated,
+        'unknown': {'store_names': [n for n in names if n not in found_names],
+                    'store_codes': [c for c in codes if c not in found_codes]},
+    }
+
+
+# ----------------------------------------------------------------------------
+# 점검
+# ----------------------------------------------------------------------------
+
+USER_GU_GROUP_BY = f"""
+    SELECT v.user_id, COALESCE(s.gu, '{UNKNOWN}'), COUNT(*)
+    FROM user_visits v JOIN stores s ON s.id = v.store_id GROUP BY 1, 2
+"""
+USER_DONG_GROUP_BY = f"""
+    SELECT v.user_id, COALESCE(s.gu, '{UNKNOWN}'), COALESCE(s.dong, '{UNKNOWN}'), COUNT(*)
+    FROM user_visits v JOIN stores s ON s.id = v.store_id GROUP BY 1, 2, 3
+"""
+
+
+def check_consistency(conn):
+    """진행률 테이블과 실제 GROUP BY 결과가 다른 행 목록 (비어 있으면 일치)"""
+    diffs = []
+    for table, columns, group_by in (('user_gu_progress', 'user_id, gu', USER_GU_GROUP_BY),
+                                     ('user_dong_progress', 'user_id, gu, dong', USER_DONG_GROUP_BY)):
+        live = {tuple(r[:-1]): r[-1] for r in conn.execute(group_by)}
+        stored = {tuple(r[:-1]): r[-1] for r in conn.execute(f"SELECT {columns}, visited_stores FROM {table}")}
+        for key in sorted(set(live) | set(stored), key=str):
+            if live.get(key) != stored.get(key):
+                diffs.append((table, key, stored.get(key), live.get(key)))
+    return diffs
+
+
+if __name__ == '__main__':
+    import migrations
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    diffs = check_consistency(conn)
+    for table, key, stored, live in diffs[:20]:
+        print(f"MISMATCH {table} {key}: stored={stored} live={live}")
+    users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    visits = conn.execute("SELECT COUNT(*) FROM user_visits").fetchone()[0]
+    print(f"{users} users, {visits} visits. Consistency check: {'OK' if not diffs else f'{len(diffs)} mismatches'}")
+    conn.close()
+    sys.exit(1 if diffs else 0)
@@ -0,0 +1,530 @@
+"""
+지도 벡터 타일 (Mapbox Vector Tile, /tiles/{z}/{x}/{y}.mvt) - Flask app.py / FastAPI backend 공용
+
+전체 GeoJSON 과 매장 목록을 처음에 한 번에 받는 대신, 지도 클라이언트가 화면에 보이는 타일만
+그 줌에 맞는 상세도로 받아 가도록 한다.
+
+- 레이어: gu (구 경계 + 매장 수), dong (행정동 경계 + 매장 수), stores (매장 점)
+- 원본: static/seoul_gu_map.geojson, static/seoul_map.geojson (geo_cache 경유), stores / gu_stats / dong_stats
+- 방문 여부 / 방문 수는 타일에 넣지 않음: 클릭 한 번마다 바뀌고 (넣으면 클릭마다 타일 캐시 전체를 버려야 함)
+  uuid 가 있으면 사용자마다 다름 (타일은 모든 사용자가 같이 씀). 클라이언트가 /api/gu-stats, /api/dong-stats,
+  /api/users/{uuid}/progress, /api/visits/changes 에서 받아 feature 속성 (code / adm_cd / store_code) 으로 합침
+  (TileJSON vector_layers 의 description 에도 적어 둠)
+- stores 레이어는 타일마다 최대 store_spatial.MAX_BBOX_RESULTS 개: 넘으면 그 타일의 매장 feature 에 truncated=true
+  (클라이언트는 더 확대하거나 /api/stores/bbox 로 받아야 함)
+- 타일마다: 타일 범위(+BUFFER)로 자르기 -> 타일 좌표(0..EXTENT)로 변환 -> 1 단위 단순화 -> 정수 격자에 맞춤
+- 만든 타일은 MBTiles 형식 SQLite(tiles.mbtiles, gzip 압축 PBF)에 저장해서 다시 만들지 않음
+  원본 GeoJSON 이 바뀌거나 매장 위치 세대 번호 ('store_locations', ingest / db_granular 가 올림) 가 바뀌면
+  저장된 타일을 모두 버림 (방문 기록은 타일 캐시를 건드리지 않음)
+- MVT 인코딩(protobuf)은 필요한 부분만 직접 구현 (추가 의존성 없음)
+
+python vector_tiles.py --seed 14 : z0..14 의 서울 타일을 미리 만들어 둠
+python vector_tiles.py --bench   : 줌별 타일 생성 시간 / 크기
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import shapely
+
+import db_pool
+import geo_cache
+import http_cache
+import store_spatial
+import store_stats
+
+TILES_PATH = os.path.abspath(os.environ.get('STARMAP_TILES') or os.path.join(db_pool.BASE_DIR, 'tiles.mbtiles'))
+SOURCES = ('gu', 'dong')  # geo_cache layer
+GENERATION = 'store_locations'  # db_pool 세대 번호 이름 (방문 여부가 바뀌어도 올라가지 않음)
+CHECK_INTERVAL = 1.0  # 초 (다른 프로세스의 ingest 를 확인하는 주기)
+MEDIA_TYPE = 'application/vnd.mapbox-vector-tile'
+TILE_FORMAT = 2  # 타일에 넣는 속성 / 레이어가 바뀌면 올림 (저장된 타일을 모두 다시 만듦)
+
+EXTENT = 4096      # 타일 한 변의 좌표 단위 수
+BUFFER = 64        # 타일 이음새에서 경계선이 끊겨 보이지 않도록 타일 밖으로 더 포함하는 폭
+SIMPLIFY = 1.0     # 단순화 허용 오차 (타일 좌표 단위)
+MIN_ZOOM = 0
+MAX_ZOOM = 16      # 더 큰 줌은 클라이언트가 z16 타일을 확대해서 사용 (overzoom)
+LAYER_MIN_ZOOM = {'gu': 0, 'dong': 11, 'stores': 12}
+LAYER_FIELDS = {
+    'gu': {'code': 'String', 'name': 'String', 'total_stores': 'Number'},
+    'dong': {'adm_cd': 'String', 'name': 'String', 'gu': 'String', 'total_stores': 'Number'},
+    'stores': {'id': 'Number', 'store_name': 'String', 'store_code': 'Number', 'truncated': 'Boolean'},
+}
+LAYER_DESCRIPTIONS = {
+    'gu': 'Seoul districts with total_stores. Visit counts are not in tiles: join /api/gu-stats or '
+          '/api/users/{{uuid}}/progress on code.',
+    'dong': 'Administrative dongs with total_stores. Visit counts are not in tiles: join /api/dong-stats or '
+            '/api/users/{{uuid}}/progress on adm_cd.',
+    'stores': 'Store points. Visit state is not in tiles: join /api/visits/changes on store_code. '
+              'At most {limit} stores per tile; when a tile has more, every store feature in it has truncated=true.',
+}
+MAX_MEMORY_TILES = 1024
+GZIP_LEVEL = 6
+
+EARTH_RADIUS = 6378137.0                  # Web Mercator (EPSG:3857)
+ORIGIN = math.pi * EARTH_RADIUS
+MAX_LAT = 85.0511287798
+
+# MVT geometry 명령 / 타입
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+POINT, POLYGON = 1, 3
+
+
+# ----------------------------------------------------------------------------
+# 좌표 변환
+# ----------------------------------------------------------------------------
+
+def lnglat_to_mercator(coords):
+    coords = np.asarray(coords, dtype=float)
+    lat = np.clip(coords[:, 1], -MAX_LAT, MAX_LAT)
+    return np.column_stack((np.radians(coords[:, 0]) * EARTH_RADIUS,
+                            np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * EARTH_RADIUS))
+
+
+def mercator_to_lnglat(x, y):
+    return math.degrees(x / EARTH_RADIUS), math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS)) - math.pi / 2)
+
+
+def tile_bounds(z, x, y):
+    """타일의 Web Mercator 범위 (minx, miny, maxx, maxy)"""
+    size = 2 * ORIGIN / (1 << z)
+    minx = -ORIGIN + x * size
+    maxy = ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tile_range(z, bounds):
+    """경위도 범위 (west, south, east, north) 를 덮는 타일 x, y 범위"""
+    def tile_xy(lng, lat):
+        n = 1 << z
+        lat = math.radians(max(-MAX_LAT, min(MAX_LAT, lat)))
+        tx = int((lng + 180) / 360 * n)
+        ty = int((1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2 * n)
+        return min(max(tx, 0), n - 1), min(max(ty, 0), n - 1)
+    west, south, east, north = bounds
+    x0, y0 = tile_xy(west, north)
+    x1, y1 = tile_xy(east, south)
+    return range(x0, x1 + 1), range(y0, y1 + 1)
+
+
+def _to_tile_coords(geoms, bounds):
+    # Web Mercator -> 타일 좌표 (왼쪽 위가 0,0 이고 y 는 아래로 증가)
+    minx, _, maxx, maxy = bounds
+    scale = EXTENT / (maxx - minx)
+    return shapely.transform(geoms, lambda c: np.column_stack(((c[:, 0] - minx) * scale, (maxy - c[:, 1]) * scale)))
+
+
+# ----------------------------------------------------------------------------
+# 원본 폴리곤 (파일이 바뀌면 다시 읽음)
+# ----------------------------------------------------------------------------
+
+# geoms: Web Mercator 폴리곤 배열, tree: STRtree, features: [(feature id, 속성 dict)]
+PolygonLayer = namedtuple('PolygonLayer', ['geoms', 'tree', 'features'])
+Sources = namedtuple('Sources', ['digest', 'layers', 'bounds'])
+
+_sources = (None, None)  # (원본 sha256 목록, Sources)
+_sources_lock = threading.Lock()
+
+
+def _feature_info(layer, props):
+    # props: geo_cache.normalize() 결과 (코드는 정수, 타일 속성은 문자열로)
+    if layer == 'gu':
+        return props['code'], {'code': str(props['code']), 'name': props['name']}
+    return props['adm_cd'], {'adm_cd': str(props['adm_cd']), 'name': props['dong'], 'gu': props['gu']}
+
+
+def load_sources():
+    global _sources
+    # 폴리곤은 geo_cache 에서 (원본 GeoJSON 이 바뀌었을 때만 다시 파싱)
+    polygons = {layer: geo_cache.load(layer) for layer in SOURCES}
+    hashes = tuple(polygons[layer].sha256 for layer in SOURCES)
+    if _sources[0] == hashes:
+        return _sources[1]
+    with _sources_lock:
+        if _sources[0] == hashes:
+            return _sources[1]
+        layers = {}
+        for layer, polygon in polygons.items():
+            if layer == 'gu':
+                bounds = tuple(float(v) for v in shapely.total_bounds(polygon.geoms))
+            geoms = shapely.transform(polygon.geoms, lnglat_to_mercator)
+            layers[layer] = PolygonLayer(geoms, shapely.STRtree(geoms),
+                                         [_feature_info(layer, props) for props in polygon.features])
+        digest = hashlib.sha256(''.join(hashes + (str(TILE_FORMAT),)).encode('ascii')).hexdigest()[:16]
+        _sources = (hashes, Sources(digest, layers, bounds))
+        return _sources[1]
+
+
+# ----------------------------------------------------------------------------
+# MVT (protobuf) 인코딩
+# ----------------------------------------------------------------------------
+
+def _varint(n):
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, data):
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _packed(field, values):
+    return _bytes_field(field, b''.join(_varint(int(v)) for v in values))
+
+
+def _zigzag(values):
+    # 부호 있는 정수 -> 부호 없는 정수 (0, -1, 1, -2 ... -> 0, 1, 2, 3 ...)
+    return (values << 1) ^ (values >> 63)
+
+
+def _value(v):
+    if isinstance(v, bool):
+        return _key(7, 0) + _varint(int(v))
+    if isinstance(v, int):
+        return _key(5, 0) + _varint(v) if v >= 0 else _key(6, 0) + _varint(int(_zigzag(np.int64(v))))
+    if isinstance(v, float):
+        return _key(3, 1) + struct.pack('<d', v)
+    return _bytes_field(1, str(v).encode('utf-8'))
+
+
+def _polygon_commands(geom):
+    """(Multi)Polygon -> MVT geometry 명령 목록, 그릴 링이 없으면 빈 목록"""
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for part in shapely.get_parts(geom):
+        if part.geom_type != 'Polygon' or part.is_empty:
+            continue
+        for i, ring in enumerate([part.exterior, *part.interiors]):
+            coords = np.asarray(ring.coords, dtype=np.int64)[:-1]
+            if len(coords) > 1:
+                keep = np.any(np.diff(coords, axis=0, prepend=coords[-1:]) != 0, axis=1)
+                coords = coords[keep]
+            if len(coords) < 3:
+                if i == 0:
+                    break  # 바깥 링이 없어졌으면 구멍도 그리지 않음
+                continue
+            deltas = _zigzag(np.diff(coords, axis=0, prepend=cursor[None, :]))
+            cursor = coords[-1]
+            commands.append(MOVE_TO | (1 << 3))
+            commands.extend(deltas[0])
+            commands.append(LINE_TO | ((len(coords) - 1) << 3))
+            commands.extend(deltas[1:].ravel())
+            commands.append(CLOSE_PATH | (1 << 3))
+    return commands
+
+
+def encode_layer(name, features):
+    """features: [(id, geom_type, geometry 명령 목록, 속성 dict)] -> Tile.layers 필드 bytes"""
+    keys, values, encoded = {}, {}, []
+    for fid, geom_type, geometry, props in features:
+        tags = []
+        for k, v in props.items():
+            if v is None:
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault((type(v).__name__, v), len(values)))
+        body = b''
+        if fid is not None:
+            body += _key(1, 0) + _varint(fid)
+        if tags:
+            body += _packed(2, tags)
+        body += _key(3, 0) + _varint(geom_type) + _packed(4, geometry)
+        encoded.append(_bytes_field(2, body))
+
+    layer = _key(15, 0) + _varint(2) + _bytes_field(1, name.encode('utf-8')) + b''.join(encoded)
+    layer += b''.join(_bytes_field(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_bytes_field(4, _value(v)) for _, v in values)
+    layer += _key(5, 0) + _varint(EXTENT)
+    return _bytes_field(3, layer)
+
+
+# ----------------------------------------------------------------------------
+# 타일 만들기
+# ----------------------------------------------------------------------------
+
+def _polygon_features(layer, clip, bounds, stats_for):
+    idx = np.sort(layer.tree.query(shapely.box(*clip)))
+    if not len(idx):
+        return []
+    parts = shapely.clip_by_rect(layer.geoms[idx], *clip)
+    parts = shapely.simplify(_to_tile_coords(parts, bounds), SIMPLIFY, preserve_topology=True)
+    # 정수 격자에 맞추면서 유효한 폴리곤 유지, MVT 규칙대로 바깥 링은 타일 좌표에서 양의 넓이
+    parts = shapely.orient_polygons(shapely.set_precision(parts, 1.0), exterior_cw=False)
+
+    features = []
+    for i, geom in zip(idx, parts):
+        if geom is None or geom.is_empty:
+            continue
+        commands = _polygon_commands(geom)
+        if commands:
+            fid, props = layer.features[i]
+            features.append((fid, POLYGON, commands, dict(props, **stats_for(props))))
+    return features
+
+
+def _stats(row):
+    return {'total_stores': row['total_stores'] if row is not None else 0}
+
+
+def _store_features(clip, bounds):
+    west, south = mercator_to_lnglat(clip[0], clip[1])
+    east, north = mercator_to_lnglat(clip[2], clip[3])
+    rows, truncated = store_spatial.in_bbox(south, west, north, east, limit=store_spatial.MAX_BBOX_RESULTS)
+    if not rows:
+        return []
+    if truncated:
+        print(f"Vector tile: stores layer truncated to {len(rows)} points")
+    minx, _, maxx, maxy = bounds
+    scale = EXTENT / (maxx - minx)
+    xy = lnglat_to_mercator([(row['lng'], row['lat']) for row in rows])
+    px = np.rint((xy[:, 0] - minx) * scale).astype(np.int64)
+    py = np.rint((maxy - xy[:, 1]) * scale).astype(np.int64)
+    features = []
+    for row, x, y in zip(rows, _zigzag(px), _zigzag(py)):
+        props = {'id': row['id'], 'store_name': row['store_name'], 'store_code': row['store_code'],
+                 'truncated': True if truncated else None}
+        features.append((row['id'], POINT, [MOVE_TO | (1 << 3), x, y], props))
+    return features
+
+
+def build_tile(z, x, y):
+    """타일 하나를 만들어 MVT bytes 로 반환 (보이는 게 없으면 빈 bytes)"""
+    sources = load_sources()
+    bounds = tile_bounds(z, x, y)
+    pad = (bounds[2] - bounds[0]) * BUFFER / EXTENT
+    clip = (bounds[0] - pad, bounds[1] - pad, bounds[2] + pad, bounds[3] + pad)
+
+    out = []
+    if z >= LAYER_MIN_ZOOM['gu']:
+        stats = {row['gu']: row for row in store_stats.gu_stats()}
+        features = _polygon_features(sources.layers['gu'], clip, bounds,
+                                     lambda props: _stats(stats.get(props['name'])))
+        if features:
+            out.append(encode_layer('gu', features))
+    if z >= LAYER_MIN_ZOOM['dong']:
+        stats = {(row['gu'], row['dong']): row for row in
+                 db_pool.query("SELECT gu, dong, total_stores FROM dong_stats")}
+        features = _polygon_features(sources.layers['dong'], clip, bounds,
+                                     lambda props: _stats(stats.get((props['gu'], props['name']))))
+        if features:
+            out.append(encode_layer('dong', features))
+    if z >= LAYER_MIN_ZOOM['stores']:
+        features = _store_features(clip, bounds)
+        if features:
+            out.append(encode_layer('stores', features))
+    return b''.join(out)
+
+
+# ----------------------------------------------------------------------------
+# MBTiles 캐시 (디스크) + 최근 타일 LRU (메모리)
+# ----------------------------------------------------------------------------
+
+_local = threading.local()
+_memory = OrderedDict()
+_memory_version = None
+_memory_lock = threading.Lock()
+_generation = (None, None, 0.0)  # (db_pool.local_generation, 세대 번호, 확인한 시각)
+
+
+def generation():
+    """현재 매장 위치 세대 번호 (CHECK_INTERVAL 마다, 이 프로세스에서 쓴 경우는 바로 다시 읽음)"""
+    global _generation
+    local, value, checked_at = _generation
+    now = time.monotonic()
+    if value is not None and local == db_pool.local_generation and now - checked_at < CHECK_INTERVAL:
+        return value
+    local = db_pool.local_generation
+    value = db_pool.read_generation(GENERATION)
+    _generation = (local, value, now)
+    return value
+
+
+def open_cache(path=None):
+    conn = db_pool.connect(path=path or TILES_PATH)
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+            )
+        """)
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    return conn
+
+
+def _cache_conn():
+    # 스레드별 연결 (fork 된 워커는 새로 연결)
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        _local.pid = pid
+        _local.conn = open_cache()
+        _local.version = None
+    return _local.conn
+
+
+def _metadata(sources):
+    west, south, east, north = sources.bounds
+    return {
+        'name': 'starmap', 'format': 'pbf', 'type': 'overlay',
+        'minzoom': str(MIN_ZOOM), 'maxzoom': str(MAX_ZOOM),
+        'bounds': f'{west:.6f},{south:.6f},{east:.6f},{north:.6f}',
+        'center': f'{(west + east) / 2:.6f},{(south + north) / 2:.6f},{LAYER_MIN_ZOOM["dong"]}',
+        'json': json.dumps({'vector_layers': vector_layers()}, ensure_ascii=False),
+    }
+
+
+def _sync_version(conn, sources, generation):
+    """저장된 타일이 다른 원본/세대로 만든 것이면 모두 지움, 이 프로세스가 타일을 저장해도 되면 True"""
+    version = (sources.digest, generation)
+    if _local.version == version:
+        return True
+    # 이 프로세스가 본 세대 번호가 이미 지난 것이면 (다른 프로세스의 ingest 를 아직 모름) 캐시를 건드리지 않음
+    if db_pool.read_generation(GENERATION) != generation:
+        return False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stored = dict(conn.execute(
+            "SELECT name, value FROM metadata WHERE name IN ('source_hash', 'locations_generation')").fetchall())
+        # 크든 작든 다르면 다시 만듦 (예전 DB 를 복원해서 세대 번호가 줄어든 경우도)
+        if stored.get('source_hash') != sources.digest or stored.get('locations_generation') != str(generation):
+            conn.execute("DELETE FROM tiles")
+            conn.execute("DELETE FROM metadata")
+            meta = dict(_metadata(sources), source_hash=sources.digest, locations_generation=str(generation))
+            conn.executemany("INSERT INTO metadata (name, value) VALUES (?, ?)", meta.items())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _local.version = version
+    return True
+
+
+def get_tile(z, x, y):
+    """타일의 http_cache.Variants (없는 타일 좌표면 None)"""
+    global _memory_version
+    if not (MIN_ZOOM <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        return None
+    sources = load_sources()
+    current = generation()
+    version = (sources.digest, current)
+    key = (z, x, y)
+    with _memory_lock:
+        if _memory_version != version:
+            _memory.clear()
+            _memory_version = version
+        cached = _memory.get(key)
+        if cached is not None:
+            _memory.move_to_end(key)
+            return cached
+
+    conn = _cache_conn()
+    writable = _sync_version(conn, sources, current)
+    tile_row = (1 << z) - 1 - y  # MBTiles 는 TMS 방식 (y 가 아래에서 위로)
+    row = conn.execute("SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                       (z, x, tile_row)).fetchone() if writable else None
+    if row is not None:
+        gz = row[0]
+        body = gzip.decompress(gz)
+    else:
+        body = build_tile(z, x, y)
+        gz = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        if writable:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) "
+                             "VALUES (?, ?, ?, ?)", (z, x, tile_row, gz))
+
+    cached = http_cache.build_variants(body, gz)
+    with _memory_lock:
+        if _memory_version == version:
+            _memory[key] = cached
+            while len(_memory) > MAX_MEMORY_TILES:
+                _memory.popitem(last=False)
+    return cached
+
+
+def vector_layers():
+    return [{'id': layer, 'fields': LAYER_FIELDS[layer], 'minzoom': LAYER_MIN_ZOOM[layer], 'maxzoom': MAX_ZOOM,
+             'description': LAYER_DESCRIPTIONS[layer].format(limit=store_spatial.MAX_BBOX_RESULTS)}
+            for layer in ('gu', 'dong', 'stores')]
+
+
+def tilejson(tile_url):
+    """TileJSON 3.0 (tile_url 예: https://host/tiles/{z}/{x}/{y}.mvt)"""
+    west, south, east, north = load_sources().bounds
+    return {
+        'tilejson': '3.0.0',
+        'name': 'starmap',
+        'tiles': [tile_url],
+        'minzoom': MIN_ZOOM,
+        'maxzoom': MAX_ZOOM,
+        'bounds': [west, south, east, north],
+        'center': [(west + east) / 2, (south + north) / 2, LAYER_MIN_ZOOM['dong']],
+        'vector_layers': vector_layers(),
+    }
+
+
+# ----------------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------------
+
+def seed(max_zoom=14, min_zoom=MIN_ZOOM):
+    """원본 범위를 덮는 타일을 min_zoom..max_zoom 까지 미리 만들어 MBTiles 에 저장"""
+    bounds = load_sources().bounds
+    total = 0
+    start = time.perf_counter()
+    for z in range(min_zoom, max_zoom + 1):
+        xs, ys = tile_range(z, bounds)
+        for x in xs:
+            for y in ys:
+                get_tile(z, x, y)
+        total += len(xs) * len(ys)
+        print(f"z{z}: {len(xs) * len(ys)} tiles")
+    print(f"Seeded {total} tiles in {time.perf_counter() - start:.1f}s -> {TILES_PATH}")
+
+
+def bench(zooms=(10, 12, 14, 16)):
+    bounds = load_sources().bounds
+    print(f"{'zoom':>5}{'tiles':>7}{'avg ms':>9}{'max ms':>9}{'avg KB':>9}{'max KB':>9}{'gz KB':>8}")
+    for z in zooms:
+        xs, ys = tile_range(z, bounds)
+        coords = [(x, y) for x in xs for y in ys]
+        # 높은 줌은 타일 수가 많으므로 고르게 최대 200개만
+        coords = coords[::max(1, len(coords) // 200)]
+        times, sizes, gz_sizes = [], [], []
+        for x, y in coords:
+            start = time.perf_counter()
+            body = build_tile(z, x, y)
+            times.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(body))
+            gz_sizes.append(len(gzip.compress(body, compresslevel=GZIP_LEVEL)))
+        print(f"{z:>5}{len(coords):>7}{sum(times) / len(times):>9.2f}{max(times):>9.2f}"
+              f"{sum(sizes) / len(sizes) / 1024:>9.1f}{max(sizes) / 1024:>9.1f}{sum(gz_sizes) / len(gz_sizes) / 1024:>8.1f}")
+    full = sum(os.path.getsize(geo_cache.SOURCES[layer]) for layer in SOURCES)
+    print(f"(full GeoJSON download: {full / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        bench()
+    elif '--seed' in sys.argv:
+        i = sys.argv.index('--seed')
+        seed(int(sys.argv[i + 1]) if len(sys.argv) > i + 1 else 14)
+    else:
+        print(__doc__)
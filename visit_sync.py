@@ -0,0 +1,135 @@
+"""
+방문 상태 동기화 (변경 로그 + 증분 조회 + 일괄 반영)
+
+stores.visited 가 바뀔 때마다 트리거가 visit_changes 에 한 줄씩 남기고,
+그 줄의 version(AUTOINCREMENT, 재사용되지 않음)이 단조 증가하는 동기화 버전이 된다.
+테이블과 트리거 정의(DDL)는 migrations.py 의 4 단계에 있다.
+
+- changes_since(N): 버전 N 이후 바뀐 매장만 (매장별 마지막 상태) + 현재 버전
+  로그가 정리(prune)돼서 N 이후를 알 수 없거나 변경이 너무 많으면 full=True 와 전체 방문 목록
+- apply_visits(): localStorage 의 방문 목록 전체를 트랜잭션 하나로 반영 (replace=True 면 목록에 없는 매장은 미방문)
+- set_visited(): 매장 하나의 방문 여부 (visit_writer 가 여러 요청을 트랜잭션 하나로 묶을 때)
+
+python visit_sync.py --prune 100000 : 최근 100000 버전만 남기고 오래된 로그 삭제
+"""
+import json
+import sys
+
+import db_pool
+
+MAX_CHANGES = 5000   # 이보다 많이 바뀌었으면 증분 대신 전체 목록
+MAX_BULK = 5000      # 일괄 반영 요청 하나에 담을 수 있는 매장 수
+
+def current_version(conn):
+    # AUTOINCREMENT 의 마지막 발급 번호 (로그를 지워도 줄어들지 않음)
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'visit_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def _visited_stores(conn):
+    return [dict(row) for row in conn.execute(
+        "SELECT store_code, store_name, visited FROM stores WHERE visited = 1 ORDER BY id")]
+
+
+def changes_since(since=0):
+    """{'version': 현재 버전, 'full': 전체 목록인지, 'changes': [{store_code, store_name, visited, version}]}"""
+    conn = db_pool.get_conn()
+    version = current_version(conn)
+    oldest = conn.execute("SELECT MIN(version) FROM visit_changes").fetchone()[0]
+    # since 가 현재보다 크면 (DB 가 바뀐 경우 등) 또는 since 이후 로그가 지워졌으면 전체 목록
+    if since > version or (oldest is not None and since < oldest - 1) or (oldest is None and since < version):
+        return {'version': version, 'full': True, 'changes': _visited_stores(conn)}
+
+    rows = conn.execute("""
+        SELECT s.store_code, s.store_name, c.visited, c.version
+        FROM visit_changes c JOIN stores s ON s.id = c.store_id
+        WHERE c.version IN (
+            SELECT MAX(version) FROM visit_changes WHERE version > ? AND version <= ? GROUP BY store_id
+        )
+        ORDER BY c.version
+        LIMIT ?
+    """, (since, version, MAX_CHANGES + 1)).fetchall()
+    if len(rows) > MAX_CHANGES:
+        return {'version': version, 'full': True, 'changes': _visited_stores(conn)}
+    return {'version': version, 'full': False, 'changes': [dict(row) for row in rows]}
+
+
+def set_visited(conn, visited, store_code=None, store_name=None):
+    """쓰기 트랜잭션 안에서 호출: store_code (없으면 store_name) 매장의 stores.visited 를 바꾸고
+    {'updated': 바뀐 매장 수, 'version': 바꾼 뒤의 동기화 버전} 반환 (세대 번호는 호출한 쪽에서 올림)
+    없는 매장이면 None (이미 같은 상태라서 안 바뀐 것은 updated 0)
+    """
+    if store_code is not None:
+        cur = conn.execute("UPDATE stores SET visited = ? WHERE store_code = ? AND visited IS NOT ?",
+                           (visited, store_code, visited))
+    else:
+        cur = conn.execute("UPDATE stores SET visited = ? WHERE store_name = ? AND visited IS NOT ?",
+                           (visited, store_name, visited))
+    if cur.rowcount == 0:
+        column, value = ('store_code', store_code) if store_code is not None else ('store_name', store_name)
+        if conn.execute(f"SELECT 1 FROM stores WHERE {column} = ?", (value,)).fetchone() is None:
+            return None
+    return {'updated': cur.rowcount, 'version': current_version(conn)}
+
+
+def apply_visits(store_names=(), store_codes=(), replace=False):
+    """방문한 매장 목록을 한 트랜잭션으로 반영하고 {'version', 'updated', 'unknown'} 반환
+
+    replace=True 면 목록에 없는 매장은 모두 미방문으로 바꿈 (기기의 목록으로 서버 상태를 맞출 때)
+    """
+    names = sorted(set(store_names))
+    codes = sorted(set(store_codes))
+    if len(names) + len(codes) > MAX_BULK:
+        raise ValueError(f"at most {MAX_BULK} stores per request")
+
+    conn = db_pool.get_conn(readonly=False)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        found = conn.execute("""
+            SELECT id, store_name, store_code FROM stores
+            WHERE store_name IN (SELECT value FROM json_each(?)) OR store_code IN (SELECT value FROM json_each(?))
+        """, (json.dumps(names, ensure_ascii=False), json.dumps(codes))).fetchall()
+        ids = json.dumps([row['id'] for row in found])
+        before = current_version(conn)
+        if replace:
+            conn.execute("UPDATE stores SET visited = 0 WHERE visited != 0 AND id NOT IN (SELECT value FROM json_each(?))",
+                         (ids,))
+        conn.execute("UPDATE stores SET visited = 1 WHERE visited != 1 AND id IN (SELECT value FROM json_each(?))",
+                     (ids,))
+        # 실제로 바뀐 매장마다 트리거가 로그를 한 줄씩 남기므로 버전 차이 = 바뀐 매장 수
+        updated = current_version(conn) - before
+        if updated:
+            db_pool.bump_generation(conn, 'stores')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    found_names = {row['store_name'] for row in found}
+    found_codes = {row['store_code'] for row in found}
+    return {
+        'version': current_version(conn),
+        'updated': updated,
+        'unknown': {'store_names': [n for n in names if n not in found_names],
+                    'store_codes': [c for c in codes if c not in found_codes]},
+    }
+
+
+def prune(conn, keep=100000):
+    """최근 keep 개 버전만 남기고 오래된 로그 삭제 (삭제한 줄 수 반환)"""
+    with conn:
+        cur = conn.execute("DELETE FROM visit_changes WHERE version <= ?", (current_version(conn) - keep,))
+    return cur.rowcount
+
+
+if __name__ == '__main__':
+    import migrations
+
+    conn = db_pool.connect()
+    migrations.migrate(conn)
+    if '--prune' in sys.argv:
+        i = sys.argv.index('--prune')
+        keep = int(sys.argv[i + 1]) if len(sys.argv) > i + 1 else 100000
+        print(f"Pruned {prune(conn, keep)} visit_changes rows (kept last {keep} versions)")
+    print(f"Current visit version: {current_version(conn)}")
+    conn.close()
@@ -0,0 +1,330 @@
+"""
+방문 상태 쓰기 모으기 (/api/update-visit, /api/toggle 용, write coalescing)
+
+요청마다 UPDATE -> commit 을 따로 하면 매장을 연달아 체크하거나 "초기화" 를 누를 때
+요청 수만큼의 트랜잭션이 SQLite 쓰기 락 하나를 두고 줄을 선다 (워커가 여럿이면 database is locked).
+요청은 변경을 큐에 넣고 기다리기만 하고, 백그라운드 스레드 하나가 모인 변경을
+트랜잭션 하나 + commit 한 번으로 반영한 뒤 각 요청에 결과를 돌려준다 (log_writer 와 같은 group commit).
+
+- 묶음: 앞의 commit 을 하는 동안 큐에 쌓인 변경 + (동시에 쓰는 요청이 있으면) WINDOW 동안 더 들어온 변경
+
+- 같은 대상 (사용자, 매장) 을 여러 번 바꾸면 마지막 값만 기록 (last write wins, 앞의 요청도 같은 결과를 받음)
+- commit 이 끝난 뒤에만 응답: 응답의 version 은 그 변경이 들어 있는 동기화 버전
+  (uuid 없음: visit_sync 버전, uuid 있음: 그 사용자의 user_visit_changes 버전, /api/visits/changes?since= 와 같은 번호)
+- 묶음마다 commit 이 한 번이므로 writer 연결은 synchronous=FULL (응답을 받은 쓰기는 전원이 꺼져도 남음)
+- 한 변경이 실패하면 SAVEPOINT 로 그 변경만 되돌리고 나머지는 같이 commit
+- 큐가 가득 차면 ENQUEUE_TIMEOUT 만큼만 기다리고 QueueFull (라우트에서 503)
+- STARMAP_VISIT_COALESCE=0 이면 모으지 않고 요청 스레드에서 한 건씩 기록 (비교 / 문제가 생겼을 때)
+- 기다리던 요청이 취소된 변경 (async 서버에서 클라이언트가 끊김) 은 기록하지 않음 (응답하지 않은 변경)
+
+점검 (writer 스레드가 취소 / 실패한 묶음 뒤에도 계속 기록하는지, DB 는 바꾸지 않음):
+python visit_writer.py --check
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+import db_pool
+import user_visits
+import visit_sync
+
+COALESCE = os.environ.get('STARMAP_VISIT_COALESCE', '1') != '0'
+SYNCHRONOUS = 'FULL'    # 응답한 쓰기가 commit 과 함께 디스크에 남도록 (WAL + NORMAL 은 마지막 commit 을 잃을 수 있음)
+MAX_QUEUE = 10000
+BATCH_SIZE = 500
+WINDOW = 0.002          # 초 (동시에 쓰는 요청이 있을 때 첫 변경을 받은 뒤 같은 묶음에 넣을 변경을 기다리는 시간)
+ENQUEUE_TIMEOUT = 0.05  # 초 (큐가 가득 찼을 때 요청이 기다리는 최대 시간)
+WAIT_TIMEOUT = 30.0     # 초 (set_visit 이 commit 을 기다리는 최대 시간)
+WRITE_RETRIES = 2       # 쓰기 락을 못 잡았을 때 다시 시도하는 횟수
+
+# uuid 가 없으면 stores.visited (모두가 같이 쓰는 방문 상태), store_code 가 없으면 store_name 으로 찾음
+Change = namedtuple('Change', ['uuid', 'store_code', 'store_name', 'visited'])
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """큐가 가득 차서 변경을 받지 못함"""
+
+
+def _key(change):
+    return (change.uuid, change.store_code, None if change.store_code is not None else change.store_name)
+
+
+def connect():
+    conn = db_pool.connect()
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    return conn
+
+
+def apply(conn, changes):
+    """changes 를 트랜잭션 하나로 반영하고 변경마다 결과 목록 반환
+
+    결과: {'updated', 'version'} / 없는 매장이면 None / 그 변경만 실패했으면 예외 객체
+    commit 이 실패하면 전체를 되돌리고 예외를 그대로 올림
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        results = []
+        stores_changed = False
+        for change in changes:
+            visited = 1 if change.visited else 0
+            conn.execute("SAVEPOINT visit_change")
+            try:
+                if change.uuid:
+                    result = user_visits.write_visit(conn, change.uuid, change.store_code, visited)
+                else:
+                    result = visit_sync.set_visited(conn, visited, change.store_code, change.store_name)
+                    stores_changed = stores_changed or bool(result and result['updated'])
+                conn.execute("RELEASE visit_change")
+            except sqlite3.DatabaseError as e:
+                conn.execute("ROLLBACK TO visit_change")
+                conn.execute("RELEASE visit_change")
+                result = e
+            results.append(result)
+        if stores_changed:
+            # 묶음 전체에 세대 번호를 한 번만 올림 (스냅샷 캐시 무효화도 한 번)
+            db_pool.bump_generation(conn, 'stores')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return results
+
+
+class VisitWriter:
+    def __init__(self, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE, window=WINDOW):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.window = window
+        self.counters = {'submitted': 0, 'coalesced': 0, 'written': 0, 'failed': 0, 'batches': 0, 'rejected': 0,
+                         'cancelled': 0}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='visit-writer', daemon=True)
+        self._thread.start()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def submit(self, change):
+        """변경 하나를 큐에 넣고 commit 뒤에 결과가 채워질 Future 반환 (가득 차면 QueueFull)"""
+        future = Future()
+        try:
+            self.queue.put((change, future), timeout=ENQUEUE_TIMEOUT)
+        except queue.Full:
+            self._count('rejected')
+            raise QueueFull("visit write queue is full") from None
+        self._count('submitted')
+        return future
+
+    def _write(self, batch):
+        # 이미 취소된 요청의 변경은 빼고, 나머지는 RUNNING 으로 바꿔서 결과를 채우기 전에 취소되지 않게 함
+        running = [(change, future) for change, future in batch if future.set_running_or_notify_cancel()]
+        self._count('cancelled', len(batch) - len(running))
+        batch = running
+        if not batch:
+            return
+        # 같은 대상은 마지막 변경만 남기되 순서는 마지막 변경 위치로 (store_name / store_code 로 같은 매장을
+        # 섞어서 바꿔도 나중 요청이 나중에 반영됨)
+        latest = {}
+        for change, future in batch:
+            _, waiters = latest.pop(_key(change), (None, []))
+            waiters.append(future)
+            latest[_key(change)] = (change, waiters)
+        entries = list(latest.values())
+
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                results = apply(self._conn, [change for change, _ in entries])
+                break
+            except sqlite3.OperationalError as e:
+                # busy_timeout 동안에도 쓰기 락을 못 잡은 경우 (database is locked) 다시 시도
+                if attempt == WRITE_RETRIES:
+                    self._fail(batch, e)
+                    return
+            except Exception as e:
+                self._fail(batch, e)
+                return
+
+        for (change, waiters), result in zip(entries, results):
+            for future in waiters:
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        self._count('written', len(entries))
+        self._count('coalesced', len(batch) - len(entries))
+        self._count('batches')
+
+    def _fail(self, batch, error):
+        print(f"Visit writer error ({len(batch)} changes not written): {error}")
+        self._count('failed', len(batch))
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _safe_write(self, batch):
+        # 묶음 하나가 어떤 예외로 실패해도 스레드는 계속 (스레드가 죽으면 이후 모든 쓰기가 WAIT_TIMEOUT 까지 기다림)
+        try:
+            self._write(batch)
+        except Exception as e:
+            self._fail(batch, e)
+
+    def _run(self):
+        self._conn = connect()
+        stopping = False
+        last_size = 1
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # 직전 묶음이 한 건이었으면 (혼자 쓰는 중) 기다리지 않고 큐에 있는 것만 모음
+            # -> 요청이 드물 때는 지연이 늘지 않고, 몰릴 때만 WINDOW 동안 모아서 commit 횟수를 줄임
+            deadline = time.monotonic() + (self.window if last_size > 1 else 0)
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            last_size = len(batch)
+            self._safe_write(batch)
+
+        # 종료: 큐에 남은 것 모두 기록 (기다리는 요청이 없어도 받은 변경은 반영)
+        rest = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        for i in range(0, len(rest), self.batch_size):
+            self._safe_write(rest[i:i + self.batch_size])
+        self._conn.close()
+
+    def close(self, timeout=5.0):
+        """남은 변경을 모두 기록하고 스레드를 멈춤"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=self.queue.qsize())
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_writer():
+    """프로세스별 VisitWriter (gunicorn 워커가 fork 된 뒤 처음 쓸 때 시작)"""
+    global _writer, _writer_pid
+    pid = os.getpid()
+    if _writer is None or _writer_pid != pid:
+        with _writer_lock:
+            if _writer is None or _writer_pid != pid:
+                _writer = VisitWriter()
+                _writer_pid = pid
+    return _writer
+
+
+def submit(visited, store_code=None, store_name=None, uuid=None):
+    """변경을 writer 큐에 넣고 Future 반환 (async 서버는 asyncio.wrap_future 로 기다림)"""
+    return get_writer().submit(Change(uuid or None, store_code, store_name, bool(visited)))
+
+
+def _direct_conn():
+    # COALESCE=False 일 때 요청 스레드가 직접 쓰는 연결 (writer 와 같은 synchronous 설정)
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        _local.pid = pid
+        _local.conn = connect()
+    return _local.conn
+
+
+def set_visit(visited, store_code=None, store_name=None, uuid=None):
+    """방문 여부를 바꾸고 commit 된 뒤 결과 반환 ({'updated', 'version'}, 없는 매장이면 None)"""
+    if COALESCE:
+        return submit(visited, store_code, store_name, uuid).result(WAIT_TIMEOUT)
+    result = apply(_direct_conn(), [Change(uuid or None, store_code, store_name, bool(visited))])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def stats():
+    """이 프로세스의 writer 통계 (아직 시작하지 않았으면 빈 dict)"""
+    if _writer is None or _writer_pid != os.getpid():
+        return {}
+    return _writer.stats()
+
+
+@atexit.register
+def shutdown():
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.close()
+
+
+def check():
+    """취소된 요청 / 실패한 묶음 뒤에도 writer 가 계속 기록하는지 점검하고 문제 목록 반환
+
+    처음 보는 uuid 의 방문 해제만 보내므로 (사용자를 만들지 않고 updated 0) DB 는 바뀌지 않음
+    """
+    global apply
+    conn = db_pool.connect(readonly=True)
+    store_code = conn.execute("SELECT store_code FROM stores LIMIT 1").fetchone()[0]
+    conn.close()
+    change = Change('visit-writer-check', store_code, None, False)
+    writer = VisitWriter()
+    problems = []
+    try:
+        # 1. 기록하기 전에 취소된 Future (FastAPI 에서 클라이언트가 끊긴 경우)
+        cancelled = Future()
+        cancelled.cancel()
+        writer.queue.put((change, cancelled))
+        if writer.submit(change).result(5) != {'updated': 0, 'version': 0}:
+            problems.append('unexpected result after a cancelled change')
+
+        # 2. 묶음 하나가 DB 오류가 아닌 예외로 실패
+        original, apply = apply, lambda conn, changes: 1 / 0
+        try:
+            failed = writer.submit(change)
+            try:
+                failed.result(5)
+                problems.append('failing batch did not report its error')
+            except ZeroDivisionError:
+                pass
+        finally:
+            apply = original
+        writer.submit(change).result(5)
+    except Exception as e:
+        problems.append(f'{type(e).__name__}: {e}')
+    if not writer._thread.is_alive():
+        problems.append('writer thread died')
+    writer.close()
+    return problems
+
+
+if __name__ == '__main__':
+    if '--check' in sys.argv:
+        problems = check()
+        for problem in problems:
+            print(f"FAIL {problem}")
+        print(f"Visit writer check: {'OK' if not problems else f'{len(problems)} failures'}")
+        sys.exit(1 if problems else 0)